@@ -0,0 +1,113 @@
+"""
+Counts the ScrollValues a scroll asks for, and how many of them had to be
+allocated rather than taken from the shared booleans and small integers.
+
+    python benchmarks/allocations.py [SCROLL ...] [--engine ENGINE]
+
+Without a scroll, a small arithmetic workload is measured.
+"""
+import io
+import time
+import tempfile
+import contextlib
+from collections import Counter
+from argparse import ArgumentParser
+
+from common import parse, parse_file
+import datatypes
+from datatypes import ScrollBool, ScrollInt, ScrollFloat, ScrollString
+from scrollscript import ENGINES
+
+WORKLOAD = """
+incantation collatz ~n {
+    rune steps = 0;
+    cycle (lest n == 1) {
+        foretell (n % 2 == 0) { n = n // 2; } resolve { n = 3 * n + 1; }
+        steps++;
+    }
+    proclaim steps;
+}
+
+rune longest = 0;
+cycle (i 1 -> 300) {
+    rune steps = cast collatz ~:i:~;
+    foretell (steps > longest) { longest = steps; }
+    dispel steps;
+}
+
+rune mean = 0.0;
+cycle (i 1 -> 2000) { mean += i / 2000; }
+reveal $"{longest} {mean}\\n";
+"""
+
+@contextlib.contextmanager
+def counting(counts):
+    """Counts constructions of every value type while the block runs."""
+    shared = {id(value) for value in datatypes.SMALL_INTS + (datatypes.TRUTHSUNG, datatypes.FALSEHOOD)}
+    patched = []
+
+    def count_new(cls):
+        original = cls.__dict__["__new__"]
+        def new(cls, value):
+            instance = original(cls, value)
+            counts[cls.__name__, "requested"] += 1
+            counts[cls.__name__, "allocated"] += id(instance) not in shared
+            return instance
+        patched.append((cls, "__new__", original))
+        cls.__new__ = new
+
+    def count_init(cls):
+        original = cls.__dict__["__init__"]
+        def init(self, value):
+            counts[cls.__name__, "requested"] += 1
+            counts[cls.__name__, "allocated"] += 1
+            original(self, value)
+        patched.append((cls, "__init__", original))
+        cls.__init__ = init
+
+    count_new(ScrollBool)
+    count_new(ScrollInt)
+    count_init(ScrollFloat)
+    count_init(ScrollString)
+    try:
+        yield
+    finally:
+        for cls, name, original in patched:
+            setattr(cls, name, original)
+
+def measure(label, tree, engine):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ENGINES[engine]().start(tree)
+    elapsed = time.perf_counter() - start
+
+    counts = Counter()
+    with counting(counts), contextlib.redirect_stdout(io.StringIO()):
+        ENGINES[engine]().start(tree)
+
+    requested = sum(count for (_, kind), count in counts.items() if kind == "requested")
+    allocated = sum(count for (_, kind), count in counts.items() if kind == "allocated")
+    print(f"{label} ({engine}): {elapsed * 1000:.1f}ms, {requested} values requested, "
+          f"{allocated} allocated ({100 * (1 - allocated / max(requested, 1)):.0f}% shared)")
+    for cls in (ScrollBool, ScrollInt, ScrollFloat, ScrollString):
+        name = cls.__name__
+        print(f"    {name:12}{counts[name, 'requested']:>10}{counts[name, 'allocated']:>10}")
+
+def main():
+    arg_parser = ArgumentParser(description="Count the values a scroll allocates.")
+    arg_parser.add_argument("scrolls", nargs="*")
+    arg_parser.add_argument("--engine", choices=ENGINES, action="append")
+    args = arg_parser.parse_args()
+    engines = args.engine or list(ENGINES)
+
+    if args.scrolls:
+        scrolls = [(path, parse_file(path, cache=False)) for path in args.scrolls]
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            scrolls = [("workload", parse(WORKLOAD, directory, cache=False))]
+
+    for label, tree in scrolls:
+        for engine in engines:
+            measure(label, tree, engine)
+
+if __name__ == '__main__': main()
@@ -0,0 +1,56 @@
+"""
+What the benchmark scripts share.
+
+Importing this module puts the repository root first on sys.path and makes
+it the working directory, so a benchmark run from anywhere imports the
+interpreter's modules and finds the grammar. Import it before any of them.
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from parser import ScrollScriptParser
+from scrollscript import ENGINES, GRAMMAR_PATH
+from memo import DEFAULT_MEMO_SIZE
+from sinks import MemorySink
+
+def write_scroll(source, directory, name="workload.ssc"):
+    """Writes a scroll into a directory, returning its path."""
+    program_path = os.path.join(directory, name)
+    with open(program_path, "w") as file:
+        file.write(source)
+    return program_path
+
+def parse_file(program_path, cache=True):
+    return ScrollScriptParser(GRAMMAR_PATH, cache).parse(program_path)
+
+def parse(source, directory, cache=True):
+    """The parse tree of a scroll's source, written into a directory and parsed like any scroll."""
+    return parse_file(write_scroll(source, directory), cache)
+
+def fresh_interpreter(engine, memo_size=DEFAULT_MEMO_SIZE, **runes):
+    """An interpreter revealing into memory, with the given runes already written."""
+    interpreter = ENGINES[engine](memo_size, sink=MemorySink())
+    for name, value in runes.items():
+        interpreter.write_rune(name, value, False)
+    return interpreter
+
+def time_runs(prepare, run, warmup, repeat):
+    """Runs what prepare() returns warmup times untimed, then repeat times timed, preparing each run off the clock."""
+    for _ in range(warmup):
+        run(prepare())
+    times = []
+    for _ in range(repeat):
+        subject = prepare()
+        start = time.perf_counter()
+        run(subject)
+        times.append(time.perf_counter() - start)
+    return times
+
+def best_time(tree, prepare, repeat):
+    """The shortest of repeat runs of a parsed scroll, each on a fresh interpreter from prepare()."""
+    return min(time_runs(prepare, lambda interpreter: interpreter.start(tree), 0, repeat))
@@ -0,0 +1,59 @@
+"""
+Compares counting cycles run on a native range with cycles that re-read their rune.
+
+    python benchmarks/counting_cycles.py [--turns N] [--engine ENGINE] [--repeat N]
+
+Each scroll runs a counting cycle whose body never writes its rune: one
+with an empty body, showing what the cycle itself costs, and one that
+tallies its rune. Each is timed once as it is, and once with every cycle
+treated as one whose body might write its rune, which is how all counting
+cycles used to run.
+"""
+import tempfile
+from argparse import ArgumentParser
+
+from common import parse, fresh_interpreter, best_time
+import ranges
+from scrollscript import ENGINES
+from datatypes import ScrollInt
+
+WORKLOADS = {
+    "empty": """
+cycle (i 1 -> turns) {
+}
+""",
+    "tally": """
+rune total = 0;
+cycle (i 1 -> turns) {
+    total += i % 7;
+}
+reveal total;
+""",
+}
+
+def measure(tree, engine, turns, repeat):
+    return best_time(tree, lambda: fresh_interpreter(engine, turns=ScrollInt(turns)), repeat)
+
+def main():
+    arg_parser = ArgumentParser(description="Time steady counting cycles against cycles that re-read their rune.")
+    arg_parser.add_argument("--turns", type=int, default=200000)
+    arg_parser.add_argument("--engine", choices=ENGINES, action="append")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+    engines = args.engine or list(ENGINES)
+
+    print(f"{args.turns} turns")
+    is_steady = ranges.is_steady
+    with tempfile.TemporaryDirectory() as directory:
+        trees = {name: parse(source, directory) for name, source in WORKLOADS.items()}
+        for engine in engines:
+            for name, tree in trees.items():
+                ranges.is_steady = is_steady
+                steady_time = measure(tree, engine, args.turns, args.repeat)
+                ranges.is_steady = lambda loop, incantation_writes: False
+                reread_time = measure(tree, engine, args.turns, args.repeat)
+                ranges.is_steady = is_steady
+                print(f"{engine:8} {name:6} steady {steady_time * 1000:>9.1f}ms   re-read {reread_time * 1000:>9.1f}ms"
+                      f"   ({reread_time / steady_time:.2f}x)")
+
+if __name__ == '__main__': main()
@@ -0,0 +1,66 @@
+"""
+Compares reading many small scrolls with run_program against one embedding engine.
+
+    python benchmarks/embedded_requests.py [--requests N] [--engine ENGINE] [--repeat N]
+
+Each request reads the same short scroll, as a service would, given a
+different customer rune each time. run_program builds a parser and an
+interpreter per request and reads the scroll from a file written with the
+rune; the engine is built once,
+before the clock starts, and is handed the scroll as source text.
+"""
+import os
+import tempfile
+from argparse import ArgumentParser
+
+from common import time_runs
+from embedding import ScrollScriptEngine
+from scrollscript import ENGINES, run_program
+from sinks import MemorySink
+
+WORKLOAD = """
+incantation price ~quantity {
+    foretell (quantity > 10) {
+        proclaim quantity * 9;
+    }
+    proclaim quantity * 10;
+}
+rune total = 0;
+cycle (i 1 -> 5) {
+    total += cast price ~:i * 3:~;
+}
+reveal $"customer {customer}: {total}\\n";
+"""
+
+def per_program(program_path, engine, requests):
+    for customer in range(requests):
+        with open(program_path, "w") as file:
+            file.write(f"rune customer = {customer};\n" + WORKLOAD)
+        run_program(program_path, engine, sink=MemorySink())
+
+def per_engine(scroll_engine, requests):
+    for customer in range(requests):
+        scroll_engine.run_source(WORKLOAD, runes={"customer": customer})
+
+def best_of(repeat, run, *args):
+    return min(time_runs(lambda: args, lambda args: run(*args), 0, repeat))
+
+def main():
+    arg_parser = ArgumentParser(description="Time run_program per request against a reused embedding engine.")
+    arg_parser.add_argument("--requests", type=int, default=200)
+    arg_parser.add_argument("--engine", choices=ENGINES, action="append")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+    engines = args.engine or list(ENGINES)
+
+    print(f"{args.requests} requests")
+    with tempfile.TemporaryDirectory() as directory:
+        program_path = os.path.join(directory, "workload.ssc")
+        for engine in engines:
+            program_time = best_of(args.repeat, per_program, program_path, engine, args.requests)
+            scroll_engine = ScrollScriptEngine(engine)
+            engine_time = best_of(args.repeat, per_engine, scroll_engine, args.requests)
+            print(f"{engine:8} run_program {program_time / args.requests * 1e6:>9.0f}us   "
+                  f"engine {engine_time / args.requests * 1e6:>9.0f}us   ({program_time / engine_time:.0f}x)")
+
+if __name__ == '__main__': main()
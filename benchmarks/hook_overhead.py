@@ -0,0 +1,63 @@
+"""
+Compares reading a scroll with no hooks, after its hooks were removed, and with a hook.
+
+    python benchmarks/hook_overhead.py [--turns N] [--repeat N]
+
+The scroll casts a small incantation on every turn of a cycle with the
+tree engine. It is timed on a fresh interpreter, on one whose only hook
+was added and removed again, which should cost nothing, and on one
+counting every statement with a before_instruction hook.
+"""
+import tempfile
+from argparse import ArgumentParser
+
+from common import parse, fresh_interpreter, best_time
+from datatypes import ScrollInt
+
+WORKLOAD = """
+incantation double ~n {
+    proclaim n * 2;
+}
+rune total = 0;
+cycle (i 1 -> turns) {
+    total += cast double ~:i:~;
+}
+reveal total;
+"""
+
+def measure(tree, turns, repeat, prepare):
+    def hooked_interpreter():
+        interpreter = fresh_interpreter("tree", 0, turns=ScrollInt(turns))
+        prepare(interpreter)
+        return interpreter
+    return best_time(tree, hooked_interpreter, repeat)
+
+def unhooked(interpreter):
+    pass
+
+def removed(interpreter):
+    interpreter.add_hook("before_instruction", unhooked)
+    interpreter.remove_hook("before_instruction", unhooked)
+
+def counting(interpreter):
+    count = [0]
+    def hook(node):
+        count[0] += 1
+    interpreter.add_hook("before_instruction", hook)
+
+def main():
+    arg_parser = ArgumentParser(description="Time the tree engine with and without hooks.")
+    arg_parser.add_argument("--turns", type=int, default=20000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(f"{args.turns} turns")
+    with tempfile.TemporaryDirectory() as directory:
+        tree = parse(WORKLOAD, directory)
+        plain_time = measure(tree, args.turns, args.repeat, unhooked)
+        removed_time = measure(tree, args.turns, args.repeat, removed)
+        hooked_time = measure(tree, args.turns, args.repeat, counting)
+    print(f"no hooks {plain_time * 1000:>9.1f}ms   removed {removed_time * 1000:>9.1f}ms"
+          f"   hooked {hooked_time * 1000:>9.1f}ms   ({hooked_time / plain_time:.1f}x)")
+
+if __name__ == '__main__': main()
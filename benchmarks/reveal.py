@@ -0,0 +1,71 @@
+"""
+Measures how fast reveal-heavy scrolls run with each kind of output sink.
+
+    python benchmarks/reveal.py [SCROLL ...] [--engine ENGINE] [--repeat N]
+
+Without a scroll, a loop revealing one short line per iteration is
+measured. Output goes to os.devnull, so only the cost of getting it there
+is timed. "print" writes every reveal with print(), as reveal used to.
+"""
+import os
+import time
+import tempfile
+from argparse import ArgumentParser
+
+from common import parse, parse_file
+from scrollscript import ENGINES
+from sinks import OutputSink, FileSink, MemorySink
+
+WORKLOAD = """
+cycle (i 1 -> 50000) {
+    reveal i;
+    reveal "\\n";
+}
+"""
+
+class PrintSink(OutputSink):
+    def write(self, text):
+        print(text, end='', file=self.stream)
+
+def sinks(devnull):
+    return {
+        "print": lambda: PrintSink(devnull),
+        "always": lambda: OutputSink(devnull, flush_policy="always"),
+        "line": lambda: OutputSink(devnull, flush_policy="line"),
+        "size": lambda: OutputSink(devnull),
+        "file": lambda: FileSink(os.devnull),
+        "memory": MemorySink,
+    }
+
+def measure(label, tree, engine, repeat, devnull):
+    print(f"{label} ({engine}):")
+    for name, make_sink in sinks(devnull).items():
+        best = float("inf")
+        for _ in range(repeat):
+            sink = make_sink()
+            start = time.perf_counter()
+            ENGINES[engine](sink=sink).start(tree)
+            sink.close()
+            best = min(best, time.perf_counter() - start)
+        print(f"    {name:8}{best * 1000:>9.1f}ms")
+
+def main():
+    arg_parser = ArgumentParser(description="Time reveal-heavy scrolls with each output sink.")
+    arg_parser.add_argument("scrolls", nargs="*")
+    arg_parser.add_argument("--engine", choices=ENGINES, action="append")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+    engines = args.engine or list(ENGINES)
+
+    if args.scrolls:
+        scrolls = [(path, parse_file(path)) for path in args.scrolls]
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            scrolls = [("workload", parse(WORKLOAD, directory))]
+
+    with open(os.devnull, "w") as devnull:
+        for label, tree in scrolls:
+            for engine in engines:
+                measure(label, tree, engine, args.repeat, devnull)
+
+if __name__ == '__main__': main()
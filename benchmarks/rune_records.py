@@ -0,0 +1,86 @@
+"""
+Compares slotted Rune records with the dict records they replaced, then
+times a scroll that declares and updates many runes in loops.
+
+    python benchmarks/rune_records.py [--runes N] [--engine ENGINE]
+"""
+import io
+import time
+import tempfile
+import timeit
+import tracemalloc
+import contextlib
+from argparse import ArgumentParser
+
+from common import parse
+from runes import Rune
+from datatypes import ScrollInt
+from scrollscript import ENGINES
+
+def dict_record(value):
+    return {"value": value, "type": "int", "const": False, "previous": None}
+
+def rune_record(value):
+    return Rune(value, "int")
+
+def allocated(make_record, count):
+    value = ScrollInt(1)
+    tracemalloc.start()
+    records = [make_record(value) for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return size / count
+
+def compare_records(count):
+    print(f"{'record':8}{'bytes':>8}{'update':>12}")
+    setups = {
+        "dict": ("r = dict_record(ScrollInt(1)); one = ScrollInt(1)",
+                 "r['previous'] = r['value']; r['value'] = r['value'] + one"),
+        "Rune": ("r = rune_record(ScrollInt(1)); one = ScrollInt(1)",
+                 "r.previous = r.value; r.value = r.value + one"),
+    }
+    for label, make_record in (("dict", dict_record), ("Rune", rune_record)):
+        setup, statement = setups[label]
+        seconds = min(timeit.repeat(statement, setup, number=200000, repeat=5, globals=globals()))
+        print(f"{label:8}{allocated(make_record, count):>8.0f}{seconds / 200000 * 1e9:>10.0f}ns")
+
+def many_runes_scroll(count):
+    lines = [f"rune r{i} = {i};" for i in range(count)]
+    lines.append("cycle (k 1 -> 20) {")
+    lines += [f"    r{i} += k;" for i in range(count)]
+    lines.append("}")
+    lines.append(f"reveal r{count - 1};")
+    return "\n".join(lines)
+
+def time_scroll(count, engines):
+    with tempfile.TemporaryDirectory() as directory:
+        tree = parse(many_runes_scroll(count), directory, cache=False)
+
+    print(f"\n{count} runes, each updated 20 times")
+    for engine in engines:
+        start = time.perf_counter()
+        run_scroll(engine, tree)
+        elapsed = time.perf_counter() - start
+
+        # Tracing slows everything down, so memory is measured on a second run.
+        tracemalloc.start()
+        run_scroll(engine, tree)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{engine:8}{elapsed * 1000:>8.1f}ms{peak / 1024:>10.0f}KiB peak")
+
+def run_scroll(engine, tree):
+    with contextlib.redirect_stdout(io.StringIO()):
+        ENGINES[engine]().start(tree)
+
+def main():
+    arg_parser = ArgumentParser(description="Measure the cost of rune records.")
+    arg_parser.add_argument("--runes", type=int, default=2000)
+    arg_parser.add_argument("--engine", choices=ENGINES, action="append")
+    args = arg_parser.parse_args()
+
+    compare_records(args.runes)
+    time_scroll(args.runes, args.engine or list(ENGINES))
+
+if __name__ == '__main__': main()
@@ -0,0 +1,55 @@
+"""
+Measures how long it takes to build the ScrollScript parser, with and
+without the cached grammar tables.
+
+    python benchmarks/startup.py [--repeat N]
+
+Each measurement runs in a fresh interpreter process, so module imports and
+Lark's own start-up are included just as they are for a real scroll.
+"""
+import os
+import sys
+import shutil
+import statistics
+import subprocess
+from argparse import ArgumentParser
+
+from common import ROOT
+from parser import CACHE_DIR
+
+BUILD_PARSER = """
+import time
+start = time.perf_counter()
+from parser import ScrollScriptParser
+ScrollScriptParser("ScrollScript.gmr", cache={cache})
+print(time.perf_counter() - start)
+"""
+
+def build_time(cache):
+    result = subprocess.run(
+        [sys.executable, "-c", BUILD_PARSER.format(cache=cache)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout)
+
+def clear_cache():
+    shutil.rmtree(os.path.join(ROOT, CACHE_DIR), ignore_errors=True)
+
+def main():
+    arg_parser = ArgumentParser(description="Compare cold and warm parser start-up.")
+    arg_parser.add_argument("--repeat", type=int, default=10)
+    args = arg_parser.parse_args()
+
+    uncached, cold, warm = [], [], []
+    for _ in range(args.repeat):
+        uncached.append(build_time(False))
+        clear_cache()
+        cold.append(build_time(True))
+        warm.append(build_time(True))
+
+    print(f"{'':10}{'median':>10}{'min':>10}")
+    for label, times in (("uncached", uncached), ("cold", cold), ("warm", warm)):
+        print(f"{label:10}{statistics.median(times) * 1000:>8.1f}ms{min(times) * 1000:>8.1f}ms")
+    print(f"\nwarm start is {statistics.median(uncached) / statistics.median(warm):.1f}x faster than building the tables")
+
+if __name__ == '__main__': main()
@@ -0,0 +1,54 @@
+"""
+Compares building a string by appending to it with copying it on every append.
+
+    python benchmarks/string_building.py [--appends N] [--engine ENGINE] [--repeat N]
+
+The scroll appends a digit to a rune on every turn of a cycle and measures
+the string once at the end. It is timed once as it is, and once with every
+interpolated string formatted into a fresh string, which is how strings
+used to be built.
+"""
+import tempfile
+from argparse import ArgumentParser
+
+from common import parse, fresh_interpreter, best_time
+from literals import Template
+from scrollscript import ENGINES
+from datatypes import ScrollInt, ScrollString
+
+WORKLOAD = """
+rune text = "";
+cycle (i 1 -> appends) {
+    text = $"{text}{i % 10}";
+}
+reveal measure text;
+"""
+
+def copying_fill(template, values):
+    return ScrollString(template.format(*values))
+
+def measure(tree, engine, appends, repeat):
+    return best_time(tree, lambda: fresh_interpreter(engine, appends=ScrollInt(appends)), repeat)
+
+def main():
+    arg_parser = ArgumentParser(description="Time appending to a string against copying it on every append.")
+    arg_parser.add_argument("--appends", type=int, default=200000)
+    arg_parser.add_argument("--engine", choices=ENGINES, action="append")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+    engines = args.engine or list(ENGINES)
+
+    print(f"{args.appends} appends")
+    fill = Template.fill
+    with tempfile.TemporaryDirectory() as directory:
+        tree = parse(WORKLOAD, directory)
+        for engine in engines:
+            Template.fill = fill
+            appended_time = measure(tree, engine, args.appends, args.repeat)
+            Template.fill = copying_fill
+            copied_time = measure(tree, engine, args.appends, args.repeat)
+            Template.fill = fill
+            print(f"{engine:8} appended {appended_time * 1000:>9.1f}ms   copied {copied_time * 1000:>9.1f}ms"
+                  f"   ({copied_time / appended_time:.1f}x)")
+
+if __name__ == '__main__': main()
@@ -0,0 +1,279 @@
+"""
+Times a suite of representative scrolls, and compares the results to a baseline.
+
+    python benchmarks/suite.py [--engine ENGINE] [--workload NAME] [--warmup N] [--repeat N]
+                               [--scale X] [--save FILE] [--baseline FILE] [--threshold FRACTION]
+
+Every workload is a scroll doing one kind of work many times: casting a
+recursive incantation, turning nested cycles, counting a lest loop,
+building a string, revealing lines, updating runes with compound
+increments, or just parsing a long scroll. Each is run --warmup times
+untimed and then --repeat times, on a fresh interpreter every time, and is
+reported in operations (casts, turns, lines...) per second: the rate of the
+best run, the median run and the spread between runs. Memoization is off,
+so every cast is really made.
+
+--save writes the results as JSON. --baseline reads results saved earlier
+and compares every workload to them by its best rate, exiting with status 1
+if any has slowed down by more than --threshold (0.15, or 15%, by default).
+Baselines are only meaningful on the machine they were saved on.
+
+The vm engine exists to read scrolls faster than the tree walker, so
+whenever both are timed every workload is also compared across the two, and
+the suite exits with status 1 if the vm is slower than the tree engine by
+more than --threshold on any of them.
+"""
+import sys
+import json
+import platform
+import tempfile
+import statistics
+from argparse import ArgumentParser
+
+from common import write_scroll, fresh_interpreter, time_runs
+from parser import ScrollScriptParser
+from scrollscript import ENGINES, GRAMMAR_PATH
+from datatypes import ScrollInt
+
+DEFAULT_THRESHOLD = 0.15
+
+# Engines that must keep up with another on every workload: (engine, the engine it is compared to).
+ENGINE_COMPARISONS = [("vm", "tree")]
+
+FIB = """
+incantation fib ~n {
+    foretell (n <= 1) {
+        proclaim n;
+    }
+    proclaim cast fib ~:n - 1:~ + cast fib ~:n - 2:~;
+}
+reveal cast fib ~:size:~;
+"""
+
+NESTED_CYCLES = """
+rune total = 0;
+cycle (i 1 -> size) {
+    cycle (j 1 -> size) {
+        total += j;
+    }
+}
+reveal total;
+"""
+
+LEST_LOOP = """
+rune count = 0;
+cycle (lest count == size) {
+    count++;
+}
+reveal count;
+"""
+
+STRING_BUILDING = """
+rune text = "";
+cycle (i 1 -> size) {
+    text = $"{text}{i % 10}";
+}
+reveal measure text;
+"""
+
+REVEALS = """
+cycle (i 1 -> size) {
+    reveal $"line {i} of {size}\\n";
+}
+"""
+
+COMPOUND_ARITHMETIC = """
+rune total = 0;
+rune scale = 1.0;
+cycle (i 1 -> size) {
+    total += i;
+    total -= 1;
+    scale *= 1.0001;
+    total %= 1000003;
+}
+reveal total;
+reveal scale;
+"""
+
+# One stanza of the long scroll parsed by the parsing workload, written size times over.
+STANZA = """
+rune value_{index} = {index} * 2 + 1;
+foretell (value_{index} > 10) {{
+    reveal $"{{value_{index}}} is large\\n";
+}} resolve {{
+    value_{index} += 3;
+}}
+cycle (i 1 -> 3) {{
+    reveal i;
+}}
+"""
+STANZA_LINES = STANZA.count("\n")
+
+def fib_casts(n):
+    """How many casts computing fib(n) takes: one for each call, fib(n + 1) * 2 - 1 in all."""
+    a, b = 0, 1
+    for _ in range(n + 1):
+        a, b = b, a + b
+    return 2 * a - 1
+
+
+class Workload:
+    """
+    A scroll timed by the suite.
+
+    Args:
+        name (str): How the workload is named in reports and baselines.
+        unit (str): What one operation of the workload is.
+        size (int): The value of the size rune the scroll is given.
+        ops (callable): How many operations a run with a given size makes.
+        source (str): The scroll, or None for the parsing workload.
+    """
+    def __init__(self, name, unit, size, ops, source=None):
+        self.name = name
+        self.unit = unit
+        self.size = size
+        self.ops = ops
+        self.source = source
+
+WORKLOADS = [
+    Workload("fib", "casts", 18, fib_casts, FIB),
+    Workload("nested_cycles", "turns", 150, lambda size: size * size, NESTED_CYCLES),
+    Workload("lest_loop", "turns", 20000, lambda size: size, LEST_LOOP),
+    Workload("string_building", "appends", 20000, lambda size: size, STRING_BUILDING),
+    Workload("reveals", "reveals", 20000, lambda size: size, REVEALS),
+    Workload("compound_arithmetic", "increments", 10000, lambda size: size * 4, COMPOUND_ARITHMETIC),
+    Workload("parse", "lines", 500, lambda size: size * STANZA_LINES),
+]
+
+def measure(parser, workload, engine, size, directory, warmup, repeat):
+    """
+    Times a workload.
+
+    Returns:
+        list: The time each timed run took, in seconds.
+    """
+    if workload.source is None:
+        # Parsing skips the .sscc cache, so every run really parses the scroll.
+        program = "".join(STANZA.format(index=index) for index in range(size))
+        return time_runs(lambda: program, parser.parse_source, warmup, repeat)
+
+    tree = parser.parse(write_scroll(workload.source, directory))
+    prepare = lambda: fresh_interpreter(engine, 0, size=ScrollInt(size))
+    return time_runs(prepare, lambda interpreter: interpreter.start(tree), warmup, repeat)
+
+def summarize(workload, size, times):
+    ops = workload.ops(size)
+    return {
+        "unit": workload.unit,
+        "ops": ops,
+        "best": ops / min(times),
+        "median": ops / statistics.median(times),
+        "spread": (statistics.stdev(times) / statistics.mean(times)) if len(times) > 1 else 0.0,
+        "runs": len(times),
+    }
+
+def compare(results, baseline, threshold):
+    """
+    Compares results to a baseline by their best rates.
+
+    Returns:
+        list: The keys of the workloads that slowed down by more than the threshold.
+    """
+    print(f"\n{'workload':32} {'baseline':>14} {'now':>14} {'change':>8}")
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            print(f"{key:32} {'-':>14} {result['best']:>14,.0f} {'new':>8}")
+            continue
+        change = result["best"] / before["best"] - 1
+        slower = change < -threshold
+        if slower:
+            regressions.append(key)
+        print(f"{key:32} {before['best']:>14,.0f} {result['best']:>14,.0f} {change:>+8.1%}"
+              f"{'  SLOWER' if slower else ''}")
+    return regressions
+
+def compare_engines(results, engine, other, threshold):
+    """
+    Compares an engine to another on every workload both were timed on, by their best rates.
+
+    Returns:
+        list: The keys of the workloads on which the engine was slower than the other by more than the threshold.
+    """
+    print(f"\n{'workload':32} {other:>14} {engine:>14} {'change':>8}")
+    slower = []
+    for key, result in results.items():
+        prefix = f"{engine}/"
+        if not key.startswith(prefix):
+            continue
+        name = key[len(prefix):]
+        theirs = results.get(f"{other}/{name}")
+        if theirs is None:
+            continue
+        change = result["best"] / theirs["best"] - 1
+        behind = change < -threshold
+        if behind:
+            slower.append(key)
+        print(f"{name:32} {theirs['best']:>14,.0f} {result['best']:>14,.0f} {change:>+8.1%}"
+              f"{'  SLOWER' if behind else ''}")
+    return slower
+
+def main():
+    arg_parser = ArgumentParser(description="Time the benchmark scrolls and compare them to a baseline.")
+    arg_parser.add_argument("--engine", choices=ENGINES, action="append")
+    arg_parser.add_argument("--workload", choices=[workload.name for workload in WORKLOADS], action="append")
+    arg_parser.add_argument("--warmup", type=int, default=1)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--scale", type=float, default=1.0,
+                            help="multiply the size of every workload, for quicker or steadier runs")
+    arg_parser.add_argument("--save", metavar="FILE", help="write the results to FILE as JSON")
+    arg_parser.add_argument("--baseline", metavar="FILE", help="compare the results to those saved in FILE")
+    arg_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="the slowdown, as a fraction, past which a workload fails against the baseline")
+    args = arg_parser.parse_args()
+    if args.repeat < 1:
+        arg_parser.error("--repeat must be at least 1")
+    engines = args.engine or list(ENGINES)
+    workloads = [workload for workload in WORKLOADS if args.workload is None or workload.name in args.workload]
+
+    parser = ScrollScriptParser(GRAMMAR_PATH)
+    results = {}
+    print(f"{'workload':32} {'best':>14} {'median':>14} {'spread':>8}  unit")
+    with tempfile.TemporaryDirectory() as directory:
+        for workload in workloads:
+            size = max(1, round(workload.size * args.scale))
+            for engine in ([None] if workload.source is None else engines):
+                key = workload.name if engine is None else f"{engine}/{workload.name}"
+                times = measure(parser, workload, engine, size, directory, args.warmup, args.repeat)
+                result = results[key] = summarize(workload, size, times)
+                print(f"{key:32} {result['best']:>14,.0f} {result['median']:>14,.0f} {result['spread']:>8.1%}"
+                      f"  {workload.unit}/s")
+
+    if args.save:
+        document = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+        with open(args.save, "w") as file:
+            json.dump(document, file, indent=2)
+
+    failed = False
+    for engine, other in ENGINE_COMPARISONS:
+        if engine in engines and other in engines:
+            slower = compare_engines(results, engine, other, args.threshold)
+            if slower:
+                print(f"\nThe {engine} engine was slower than the {other} engine by more than "
+                      f"{args.threshold:.0%} on {len(slower)} workload(s): {', '.join(slower)}")
+                failed = True
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} workload(s) slowed down by more than {args.threshold:.0%}: "
+                  f"{', '.join(regressions)}")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__': main()
@@ -0,0 +1,51 @@
+"""
+Compares whole-tome arithmetic with working through a tome page by page.
+
+    python benchmarks/tome_maths.py [--pages N] [--engine ENGINE] [--repeat N]
+
+Both scrolls scale every page of a tome of floats, add an offset to it and
+tally the result. The tome is built before the clock starts.
+"""
+import tempfile
+from argparse import ArgumentParser
+
+from common import parse, fresh_interpreter, best_time
+import vectors
+from scrollscript import ENGINES
+from datatypes import ScrollTome, ScrollFloat
+
+WHOLE = """
+reveal tally (readings * 1.5 + 2);
+"""
+
+PAGED = """
+rune total = 0.0;
+cycle (reading betwixt readings) {
+    total += reading * 1.5 + 2;
+}
+reveal total;
+"""
+
+def measure(tree, engine, pages, repeat):
+    def prepare():
+        return fresh_interpreter(engine, readings=ScrollTome(ScrollFloat(i * 0.25) for i in range(pages)))
+    return best_time(tree, prepare, repeat)
+
+def main():
+    arg_parser = ArgumentParser(description="Time whole-tome arithmetic against a page by page cycle.")
+    arg_parser.add_argument("--pages", type=int, default=100000)
+    arg_parser.add_argument("--engine", choices=ENGINES, action="append")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+    engines = args.engine or list(ENGINES)
+
+    print(f"{args.pages} pages, NumPy {'in use' if vectors.numpy is not None else 'not installed'}")
+    with tempfile.TemporaryDirectory() as directory:
+        whole, paged = parse(WHOLE, directory), parse(PAGED, directory)
+        for engine in engines:
+            whole_time = measure(whole, engine, args.pages, args.repeat)
+            paged_time = measure(paged, engine, args.pages, args.repeat)
+            print(f"{engine:8} whole tome {whole_time * 1000:>9.1f}ms   page by page {paged_time * 1000:>9.1f}ms"
+                  f"   ({paged_time / whole_time:.0f}x)")
+
+if __name__ == '__main__': main()
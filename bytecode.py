@@ -0,0 +1,624 @@
+"""
+Bytecode for the ScrollScript virtual machine.
+
+A scroll is compiled into CodeObjects: a flat list of (opcode, argument)
+integer pairs plus a table of constants the arguments refer to. Each
+incantation body is a CodeObject of its own, stored as a constant of the
+code that declares it.
+"""
+from lark import Token, Tree
+import keywords
+import ranges
+from literals import LiteralPool
+from utils import is_keyword
+from datatypes import ScrollValue, ScrollBool, ScrollFloat, ScrollInt
+from exceptions import ScrollError, FundamentalRuneError
+from operators import (
+    resolve, chance, ADD_OPERATORS, MUL_OPERATORS, COMP_OPERATORS, ROUND_OPERATORS,
+    INCR_OPERATORS, CMP_INCR_OPERATORS
+)
+
+# ----- Runes -----
+LOAD_CONST = 0
+LOAD_RUNE = 1
+LOAD_PREVIOUS = 2
+CHECK_UNWRITTEN = 3
+DECLARE_RUNE = 4
+DECLARE_SEALED = 5
+ASSIGN = 6
+DISPEL = 7
+SEAL = 8
+CHECK_MUTABLE = 9
+INCREMENT = 10
+COMPOUND = 11
+
+# ----- Expressions -----
+BINARY_ADD = 12
+BINARY_MUL = 13
+BINARY_POW = 14
+BINARY_OR = 15
+BINARY_AND = 16
+COMPARE = 17
+NEGATE = 18
+ROUND = 19
+NOT = 20
+WRAP = 21
+LENGTH = 22
+INDEX = 23
+TRANSMUTE = 24
+INTERPOLATE = 25
+
+# ----- Input & Output -----
+REVEAL = 26
+LISTEN = 27
+LISTEN_PROMPT = 28
+POP = 29
+
+# ----- Control Flow -----
+JUMP = 30
+POP_JUMP_IF_FALSE = 31
+POP_JUMP_IF_TRUE = 32
+CHANCE = 33
+FAIL = 34
+SETUP_LOOP = 35
+POP_BLOCK = 36
+BREAK = 37
+CONTINUE = 38
+RANGE_BEGIN = 39
+RANGE_CHECK = 40
+RANGE_STEP = 41
+RANGE_END = 42
+FOREACH_BEGIN = 43
+FOREACH_NEXT = 44
+
+# ----- Incantations -----
+DEFINE_FUNCTION = 45
+FIND_FUNCTION = 46
+CALL = 47
+TAIL_CALL = 48
+RETURN = 49
+HALT = 50
+
+# ----- Collections -----
+BUILD_TOME = 51
+STORE_INDEX = 52
+APPEND = 53
+BUILD_GRIMOIRE = 54
+DISPEL_ENTRY = 55
+REDUCE = 56
+
+# ----- Lazy Sources -----
+BUILD_RANGE = 57
+INPUT_STREAM = 58
+
+# ----- Steady Ranges -----
+STEADY_RANGE_BEGIN = 59
+STEADY_RANGE_NEXT = 60
+
+OPNAMES = {
+    value: name
+    for name, value in dict(globals()).items()
+    if name.isupper() and isinstance(value, int)
+}
+
+# Opcodes whose argument is an instruction index rather than a constant.
+JUMP_OPS = {JUMP, POP_JUMP_IF_FALSE, POP_JUMP_IF_TRUE, SETUP_LOOP}
+
+# Opcodes whose argument is how many values they take from the stack.
+COUNT_OPS = {BUILD_TOME, BUILD_GRIMOIRE}
+
+# Opcodes that ignore their argument.
+NO_ARG_OPS = {
+    BINARY_POW, BINARY_OR, BINARY_AND, NEGATE, NOT, WRAP, LENGTH, REVEAL,
+    LISTEN, LISTEN_PROMPT, POP, POP_BLOCK, BREAK, CONTINUE, RETURN, HALT,
+    BUILD_RANGE, INPUT_STREAM, STEADY_RANGE_NEXT
+}
+
+
+class CodeObject:
+    """
+    A compiled block of ScrollScript.
+
+    Every loop ends with POP_BLOCK followed by a JUMP back to its head, and
+    SETUP_LOOP records the instruction just past that JUMP. A shatter leaves
+    the loop through that instruction, and a persist through the JUMP before it.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.code = []
+        self.constants = []
+        self._constant_index = {}
+
+    def __len__(self):
+        return len(self.code) // 2
+
+    def __repr__(self):
+        return f"<CodeObject {self.name}: {len(self)} instructions>"
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_constant_index"] = {}
+        return state
+
+    def add_constant(self, value):
+        try:
+            # Equal values are not always interchangeable: 0.0 and -0.0 reveal differently.
+            key = (type(value), repr(value.value) if isinstance(value, ScrollValue) else value)
+            if key in self._constant_index:
+                return self._constant_index[key]
+        except TypeError:
+            key = None
+
+        self.constants.append(value)
+        if key is not None:
+            self._constant_index[key] = len(self.constants) - 1
+        return len(self.constants) - 1
+
+    def emit(self, opcode, arg=0):
+        self.code.append(opcode)
+        self.code.append(arg)
+        return len(self) - 1
+
+    def emit_const(self, opcode, value):
+        return self.emit(opcode, self.add_constant(value))
+
+    def patch(self, position, target=None):
+        self.code[2 * position + 1] = len(self) if target is None else target
+
+    def instructions(self):
+        code = self.code
+        for i in range(0, len(code), 2):
+            yield code[i], code[i + 1]
+
+
+class BytecodeCompiler:
+    def __init__(self):
+        self.code = None
+        self.incantation_writes = set()
+        self.literals = LiteralPool()
+
+    def compile_program(self, tree):
+        self.code = CodeObject("<scroll>")
+        self.incantation_writes = ranges.incantation_writes(tree)
+        for node in tree.children:
+            if node.data == "func_declaration":
+                self.compile(node)
+        for node in tree.children:
+            if node.data != "func_declaration":
+                self.statement(node)
+        self.code.emit(HALT)
+        return self.code
+
+    def compile(self, node):
+        method_name = node.type if isinstance(node, Token) else node.data
+        handler = getattr(self, method_name, None)
+        mark = len(self.code.code)
+        try:
+            if not callable(handler):
+                raise ScrollError(f"Something is amiss in the arcane ({method_name}).")
+            handler(node)
+        except ScrollError as error:
+            # The error belongs to the point where this node would have run.
+            del self.code.code[mark:]
+            self.code.emit_const(FAIL, error)
+
+    def statement(self, node):
+        self.compile(node)
+        if node.data == "func_call":
+            self.code.emit(POP)
+
+    def rune_name(self, node):
+        token = node.children[0] if not isinstance(node, Token) else node
+        name = str(token)
+        if is_keyword(name):
+            raise FundamentalRuneError(name)
+        return name
+
+    def loop_body(self, block, head):
+        """Emits one guarded iteration of a loop body, ending with the jump back to its head."""
+        setup = self.code.emit(SETUP_LOOP)
+        self.compile(block)
+        self.code.emit(POP_BLOCK)
+        self.code.emit(JUMP, head)
+        self.code.patch(setup)
+
+
+    # ----- Assignments & Declarations ------
+
+    def var_declaration(self, tree):
+        self.declaration(tree.children[1], tree.children[2], DECLARE_RUNE)
+
+    def const_declaration(self, tree):
+        self.declaration(tree.children[2], tree.children[3], DECLARE_SEALED)
+
+    def declaration(self, name_node, value_node, opcode):
+        name = self.rune_name(name_node)
+        self.code.emit_const(CHECK_UNWRITTEN, name)
+        if value_node is not None:
+            self.compile(value_node)
+        else:
+            self.code.emit_const(LOAD_CONST, None)
+        self.code.emit_const(opcode, name)
+
+    def assignment(self, tree):
+        name = self.rune_name(tree.children[0])
+        self.compile(tree.children[1])
+        self.code.emit_const(ASSIGN, name)
+
+    def index_assignment(self, tree):
+        name = self.rune_name(tree.children[0])
+        self.compile(tree.children[1])
+        self.compile(tree.children[2])
+        self.code.emit_const(STORE_INDEX, name)
+
+    def append_statement(self, tree):
+        name = self.rune_name(tree.children[3])
+        self.compile(tree.children[1])
+        self.code.emit_const(APPEND, name)
+
+    def deletion(self, tree):
+        self.code.emit_const(DISPEL, self.rune_name(tree.children[1]))
+
+    def entry_deletion(self, tree):
+        self.compile(tree.children[2])
+        self.code.emit_const(DISPEL_ENTRY, self.rune_name(tree.children[1]))
+
+    def seal_statement(self, tree):
+        self.code.emit_const(SEAL, self.rune_name(tree.children[1]))
+
+    def simple_increment(self, tree):
+        name = self.rune_name(tree.children[0])
+        op = str(tree.children[1])
+        resolve(INCR_OPERATORS, op)
+        self.code.emit_const(CHECK_MUTABLE, name)
+        self.code.emit_const(INCREMENT, (name, op))
+
+    def compound_increment(self, tree):
+        name = self.rune_name(tree.children[0])
+        op = str(tree.children[1])
+        resolve(CMP_INCR_OPERATORS, op)
+        self.code.emit_const(CHECK_MUTABLE, name)
+        self.compile(tree.children[2])
+        self.code.emit_const(COMPOUND, (name, op))
+
+
+    # ----- Functions ------
+
+    def func_declaration(self, tree):
+        name = self.rune_name(tree.children[1])
+        params_tree = tree.children[2]
+        params = tuple(self.rune_name(node) for node in params_tree.children) if params_tree else ()
+
+        outer, self.code = self.code, CodeObject(name)
+        try:
+            self.compile(tree.children[-1])
+            self.code.emit_const(LOAD_CONST, None)
+            self.code.emit(RETURN)
+            body = self.code
+        finally:
+            self.code = outer
+
+        self.code.emit_const(DEFINE_FUNCTION, (name, params, body))
+
+    def func_call(self, tree, opcode=CALL):
+        name = self.rune_name(tree.children[1])
+        args_tree = tree.children[2]
+        args = args_tree.children if args_tree else []
+
+        self.code.emit_const(FIND_FUNCTION, name)
+        for arg in args:
+            self.compile(arg)
+        self.code.emit_const(opcode, (name, len(args)))
+
+    def return_statement(self, tree):
+        value = tree.children[1]
+        if isinstance(value, Tree) and value.data == "func_call":
+            # The proclaimed cast takes over this incantation's frame.
+            self.func_call(value, TAIL_CALL)
+            self.code.emit(RETURN)
+            return
+
+        if value is not None:
+            self.compile(value)
+        else:
+            self.code.emit_const(LOAD_CONST, None)
+        self.code.emit(RETURN)
+
+
+    # ----- Expressions ------
+
+    def binary(self, tree, opcode, table):
+        op = str(tree.children[1])
+        resolve(table, op)
+        self.compile(tree.children[0])
+        self.compile(tree.children[2])
+        self.code.emit_const(opcode, op)
+
+    def bin_expr_add(self, tree):
+        self.binary(tree, BINARY_ADD, ADD_OPERATORS)
+
+    def bin_expr_mul(self, tree):
+        self.binary(tree, BINARY_MUL, MUL_OPERATORS)
+
+    def bin_expr_comp(self, tree):
+        self.binary(tree, COMPARE, COMP_OPERATORS)
+
+    def bin_expr_pow(self, tree):
+        self.compile(tree.children[0])
+        self.compile(tree.children[1])
+        self.code.emit(BINARY_POW)
+
+    def bin_expr_or(self, tree):
+        self.compile(tree.children[0])
+        self.compile(tree.children[2])
+        self.code.emit(BINARY_OR)
+
+    def bin_expr_and(self, tree):
+        self.compile(tree.children[0])
+        self.compile(tree.children[2])
+        self.code.emit(BINARY_AND)
+
+    def group_expr(self, tree):
+        self.compile(tree.children[0])
+        self.code.emit(WRAP)
+
+    def un_expr_negate(self, tree):
+        self.compile(tree.children[0])
+        self.code.emit(NEGATE)
+
+    def un_expr_round(self, tree):
+        op = str(tree.children[0])
+        resolve(ROUND_OPERATORS, op)
+        self.compile(tree.children[1])
+        self.code.emit_const(ROUND, op)
+
+    def un_expr_not(self, tree):
+        self.compile(tree.children[1])
+        self.code.emit(NOT)
+
+    def length_expr(self, tree):
+        self.compile(tree.children[1])
+        self.code.emit(LENGTH)
+
+    def index_expr(self, tree):
+        name = self.rune_name(tree.children[0])
+        self.compile(tree.children[1])
+        self.code.emit_const(INDEX, name)
+
+    def reduction(self, tree):
+        self.compile(tree.children[1])
+        self.code.emit_const(REDUCE, str(tree.children[0]))
+
+
+    # ----- Collections ------
+
+    def collection(self, tree):
+        self.compile(tree.children[0])
+
+    def array(self, tree):
+        contents = tree.children[1]
+        items = contents.children if contents else []
+        for item in items:
+            self.compile(item)
+        self.code.emit(BUILD_TOME, len(items))
+
+    def grimoire(self, tree):
+        contents = tree.children[1]
+        entries = contents.children if contents else []
+        for entry in entries:
+            self.compile(entry.children[0])
+            self.compile(entry.children[1])
+        self.code.emit(BUILD_GRIMOIRE, len(entries))
+
+    # ----- Control Flow ------
+
+    def block(self, tree):
+        for node in tree.children:
+            self.statement(node)
+
+    def if_statement(self, tree):
+        children = tree.children
+        exits = []
+
+        i = 0
+        while i < len(children) and children[i] is not None:
+            if str(children[i]) == keywords.ELSE:
+                self.compile(children[i+1])
+                break
+            self.compile(children[i+1])
+            skip = self.code.emit(POP_JUMP_IF_FALSE)
+            self.compile(children[i+2])
+            exits.append(self.code.emit(JUMP))
+            self.code.patch(skip)
+            i += 3
+
+        for position in exits:
+            self.code.patch(position)
+
+    def maybe_statement(self, tree):
+        ratio = tree.children[1]
+        ratio = self.ratio(ratio) if ratio is not None else 0.5
+        self.code.emit_const(CHANCE, ratio)
+        skip = self.code.emit(POP_JUMP_IF_FALSE)
+        self.compile(tree.children[2])
+        self.code.patch(skip)
+
+    def ratio(self, tree):
+        left, right = int(tree.children[0].value), int(tree.children[1].value)
+        return chance(left, right)
+
+    def for_range(self, tree):
+        range_tree = tree.children[1]
+        name = self.rune_name(range_tree.children[0])
+
+        self.compile(range_tree.children[1])
+        self.compile(range_tree.children[2])
+        if range_tree.children[3] is not None:
+            self.compile(range_tree.children[3])
+        else:
+            self.code.emit_const(LOAD_CONST, ScrollInt(1))
+
+        if ranges.is_steady(tree, self.incantation_writes):
+            self.code.emit_const(STEADY_RANGE_BEGIN, name)
+            head = self.code.emit(STEADY_RANGE_NEXT)
+            done = self.code.emit(POP_JUMP_IF_FALSE)
+            self.loop_body(tree.children[2], head)
+            self.code.patch(done)
+            self.code.emit(POP)
+            self.code.emit_const(RANGE_END, name)
+            return
+
+        self.code.emit_const(RANGE_BEGIN, name)
+
+        first = self.code.emit(JUMP)
+        head = self.code.emit_const(RANGE_STEP, name)
+        self.code.patch(first)
+        self.code.emit_const(RANGE_CHECK, name)
+        done = self.code.emit(POP_JUMP_IF_FALSE)
+        self.loop_body(tree.children[2], head)
+        self.code.patch(done)
+        self.code.emit(POP)
+        self.code.emit_const(RANGE_END, name)
+
+    def while_loop(self, tree):
+        head = len(self.code)
+        self.compile(tree.children[2])
+        done = self.code.emit(POP_JUMP_IF_TRUE)
+        self.loop_body(tree.children[3], head)
+        self.code.patch(done)
+
+    def foreach_loop(self, tree):
+        name = self.rune_name(tree.children[1])
+        self.compile(tree.children[3])
+        self.code.emit_const(FOREACH_BEGIN, name)
+        head = self.code.emit_const(FOREACH_NEXT, name)
+        done = self.code.emit(POP_JUMP_IF_FALSE)
+        self.loop_body(tree.children[4], head)
+        self.code.patch(done)
+        self.code.emit(POP)
+
+    def range_value(self, tree):
+        self.compile(tree.children[0])
+        self.compile(tree.children[1])
+        if tree.children[2] is not None:
+            self.compile(tree.children[2])
+        else:
+            self.code.emit_const(LOAD_CONST, ScrollInt(1))
+        self.code.emit(BUILD_RANGE)
+
+    def input_stream(self, tree):
+        self.code.emit(INPUT_STREAM)
+
+    def infinite_loop(self, tree):
+        self.loop_body(tree.children[3], len(self.code))
+
+    def loop_interrupt(self, tree):
+        self.compile(tree.children[0])
+
+    def BREAK(self, token):
+        self.code.emit(BREAK)
+
+    def CONTINUE(self, token):
+        self.code.emit(CONTINUE)
+
+
+    # ----- Variables ------
+
+    def var_expr(self, tree):
+        self.code.emit_const(LOAD_RUNE, self.rune_name(tree.children[0]))
+
+    def value_cast(self, tree):
+        self.compile(tree.children[1])
+        self.code.emit_const(TRANSMUTE, str(tree.children[3]))
+
+
+    # ----- Data Types ------
+
+    def INTEGER(self, token):
+        self.code.emit_const(LOAD_CONST, ScrollInt(int(token)))
+
+    def FLOAT(self, token):
+        self.code.emit_const(LOAD_CONST, ScrollFloat(float(token)))
+
+    def BOOLEAN(self, token):
+        self.code.emit_const(LOAD_CONST, ScrollBool(str(token)))
+
+    def STRING(self, token):
+        self.code.emit_const(LOAD_CONST, self.literals.string(str(token)[1:-1]))
+
+    def constant(self, tree):
+        self.code.emit_const(LOAD_CONST, tree.children[0])
+
+
+    # ----- Input & Output ------
+
+    def print_statement(self, tree):
+        self.compile(tree.children[1])
+        self.code.emit(REVEAL)
+
+    def input_statement(self, tree):
+        self.code.emit(LISTEN)
+
+    def prompted_input(self, tree):
+        self.compile(tree.children[1])
+        self.code.emit(LISTEN_PROMPT)
+
+
+    # ----- Features ------
+
+    def interpolated_string(self, tree):
+        parts = tree.children[1:-1]
+        template = self.literals.template(parts)
+        if not template.slots:
+            self.code.emit_const(LOAD_CONST, template.constant)
+            return
+        for part in parts:
+            if len(part.children) > 1:
+                self.compile(part.children[1])
+        self.code.emit_const(INTERPOLATE, template)
+
+
+    # ----- Unique Features ------
+
+    def previous(self, tree):
+        self.code.emit_const(LOAD_PREVIOUS, self.rune_name(tree.children[0]))
+
+
+# ----- Disassembly ------
+
+def describe_argument(code, opcode, arg):
+    if opcode in NO_ARG_OPS:
+        return ""
+    if opcode in JUMP_OPS:
+        return f"to {arg}"
+    if opcode == BUILD_TOME:
+        return f"{arg} (values)"
+    if opcode == BUILD_GRIMOIRE:
+        return f"{arg} (entries)"
+    value = code.constants[arg]
+    if opcode == DEFINE_FUNCTION:
+        name, params, body = value
+        return f"{arg} ({name} ~{' ~'.join(params)})" if params else f"{arg} ({name})"
+    return f"{arg} ({value!r})"
+
+def disassemble(code):
+    """
+    Renders a CodeObject, and every incantation declared in it, as text.
+
+    Args:
+        code (CodeObject): The compiled code.
+
+    Returns:
+        str: One line per instruction, grouped by code object.
+    """
+    lines = [f"Disassembly of {code.name}:"]
+    nested = []
+    for position, (opcode, arg) in enumerate(code.instructions()):
+        lines.append(f"{position:>6} {OPNAMES[opcode]:<18}{describe_argument(code, opcode, arg)}".rstrip())
+        if opcode == DEFINE_FUNCTION:
+            nested.append(code.constants[arg][2])
+
+    for body in nested:
+        lines.append("")
+        lines.append(disassemble(body))
+    return "\n".join(lines)
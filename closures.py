@@ -0,0 +1,565 @@
+"""
+Closure compilation for ScrollScript.
+
+The parse tree is compiled once into nested Python closures, so running a
+script no longer looks up a handler by node name or re-reads Lark children
+for every node it visits.
+"""
+import random
+from lark import Token
+import keywords
+from utils import is_keyword
+from datatypes import wrap_primitive, ScrollBool, ScrollFloat, ScrollInt, ScrollTome, ScrollGrimoire, ScrollRange, ScrollStream
+from interpreter import ScrollScriptInterpreter
+from exceptions import *
+from signals import SHATTER, PERSIST, SIGNAL_TYPES, Proclamation, escape
+import operators
+import ranges
+from operators import (
+    resolve, ADD_OPERATORS, MUL_OPERATORS, COMP_OPERATORS, ROUND_OPERATORS,
+    INCR_OPERATORS, CMP_INCR_OPERATORS
+)
+
+
+def constant(value):
+    return lambda: value
+
+def deferred(error):
+    """Builds a closure that raises a compile-time error once it is reached."""
+    def run():
+        raise error.with_traceback(None)
+    return run
+
+
+class CompiledInterpreter(ScrollScriptInterpreter):
+    """An interpreter that compiles the whole scroll to closures before running it."""
+    hookable = False
+
+    def start(self, tree):
+        try:
+            self.learn_incantations(tree)
+            program = ScrollScriptCompiler(self).compile(tree)
+            program()
+        finally:
+            self.sink.flush()
+
+    def run_block(self, block):
+        return block()
+
+
+class ScrollScriptCompiler:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.incantation_writes = set()
+
+    def compile(self, node):
+        method_name = node.type if isinstance(node, Token) else node.data
+        handler = getattr(self, method_name, None)
+        try:
+            if not callable(handler):
+                raise ScrollError(f"Something is amiss in the arcane ({method_name}).")
+            return handler(node)
+        except ScrollError as error:
+            return deferred(error)
+
+    def rune_name(self, node):
+        token = node.children[0] if not isinstance(node, Token) else node
+        name = str(token)
+        if is_keyword(name):
+            raise FundamentalRuneError(name)
+        return name
+
+    def start(self, tree):
+        self.incantation_writes = ranges.incantation_writes(tree)
+        declarations = [self.compile(node) for node in tree.children if node.data == "func_declaration"]
+        instructions = [self.compile(node) for node in tree.children if node.data != "func_declaration"]
+
+        def run():
+            for declaration in declarations:
+                declaration()
+            for instruction in instructions:
+                signal = instruction()
+                if signal.__class__ in SIGNAL_TYPES:
+                    escape(signal)
+        return run
+
+
+    # ----- Assignments & Declarations ------
+
+    def var_declaration(self, tree):
+        return self.declaration(tree.children[1], tree.children[2], False)
+
+    def const_declaration(self, tree):
+        return self.declaration(tree.children[2], tree.children[3], True)
+
+    def declaration(self, name_node, value_node, const):
+        interp = self.interpreter
+        name = self.rune_name(name_node)
+        value = self.compile(value_node) if value_node is not None else None
+
+        def run():
+            interp.check_unwritten(name)
+            interp.write_rune(name, value() if value is not None else None, const)
+        return run
+
+    def assignment(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[0])
+        value = self.compile(tree.children[1])
+        return lambda: interp.assign_rune(name, value())
+
+    def index_assignment(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[0])
+        index = self.compile(tree.children[1])
+        value = self.compile(tree.children[2])
+
+        def run():
+            i = index()
+            interp.store_index(name, i, value())
+        return run
+
+    def append_statement(self, tree):
+        interp = self.interpreter
+        value = self.compile(tree.children[1])
+        name = self.rune_name(tree.children[3])
+        return lambda: interp.append_rune(name, value())
+
+    def deletion(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[1])
+        return lambda: interp.dispel_rune(name)
+
+    def entry_deletion(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[1])
+        index = self.compile(tree.children[2])
+        return lambda: interp.dispel_entry(name, index())
+
+    def seal_statement(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[1])
+        return lambda: interp.seal_rune(name)
+
+    def simple_increment(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[0])
+        op = str(tree.children[1])
+        operation = resolve(INCR_OPERATORS, op)
+
+        def run():
+            interp.check_mutable(name)
+            interp.increment_rune(name, op, operation)
+        return run
+
+    def compound_increment(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[0])
+        op = str(tree.children[1])
+        operation = resolve(CMP_INCR_OPERATORS, op)
+        value = self.compile(tree.children[2])
+
+        def run():
+            interp.check_mutable(name)
+            interp.compound_rune(name, op, operation, value())
+        return run
+
+
+    # ----- Functions ------
+
+    def func_declaration(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[1])
+        params_tree = tree.children[2]
+        params = [self.rune_name(node) for node in params_tree.children] if params_tree else []
+        block = self.compile(tree.children[-1])
+        return lambda: interp.define_function(name, params, block)
+
+    def func_call(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[1])
+        args_tree = tree.children[2]
+        args = [self.compile(node) for node in args_tree.children] if args_tree else []
+
+        def run():
+            func_info = interp.find_function(name)
+            return interp.invoke(name, func_info, [arg() for arg in args])
+        return run
+
+    def return_statement(self, tree):
+        value = self.compile(tree.children[1]) if tree.children[1] is not None else constant(None)
+
+        return lambda: Proclamation(value())
+
+
+    # ----- Expressions ------
+
+    def bin_expr_add(self, tree):
+        left, right = self.compile(tree.children[0]), self.compile(tree.children[2])
+        operation = resolve(ADD_OPERATORS, str(tree.children[1]))
+        add_values = operators.add_values
+        return lambda: add_values(operation, left(), right())
+
+    def bin_expr_mul(self, tree):
+        left, right = self.compile(tree.children[0]), self.compile(tree.children[2])
+        operation = resolve(MUL_OPERATORS, str(tree.children[1]))
+        mul_values = operators.mul_values
+        return lambda: mul_values(operation, left(), right())
+
+    def bin_expr_pow(self, tree):
+        left, right = self.compile(tree.children[0]), self.compile(tree.children[1])
+        pow_values = operators.pow_values
+        return lambda: pow_values(left(), right())
+
+    def bin_expr_or(self, tree):
+        left, right = self.compile(tree.children[0]), self.compile(tree.children[2])
+        or_values = operators.or_values
+        return lambda: or_values(left(), right())
+
+    def bin_expr_and(self, tree):
+        left, right = self.compile(tree.children[0]), self.compile(tree.children[2])
+        and_values = operators.and_values
+        return lambda: and_values(left(), right())
+
+    def bin_expr_comp(self, tree):
+        left, right = self.compile(tree.children[0]), self.compile(tree.children[2])
+        operation = resolve(COMP_OPERATORS, str(tree.children[1]))
+        compare_values = operators.compare_values
+        return lambda: compare_values(operation, left(), right())
+
+    def group_expr(self, tree):
+        value = self.compile(tree.children[0])
+        return lambda: wrap_primitive(value())
+
+    def un_expr_negate(self, tree):
+        value = self.compile(tree.children[0])
+        negate_value = operators.negate_value
+        return lambda: negate_value(value())
+
+    def un_expr_round(self, tree):
+        operation = resolve(ROUND_OPERATORS, str(tree.children[0]))
+        value = self.compile(tree.children[1])
+        round_value = operators.round_value
+        return lambda: round_value(operation, value())
+
+    def un_expr_not(self, tree):
+        value = self.compile(tree.children[1])
+        not_value = operators.not_value
+        return lambda: not_value(value())
+
+    def length_expr(self, tree):
+        value = self.compile(tree.children[1])
+        length_of = operators.length_of
+        return lambda: length_of(value())
+
+    def index_expr(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[0])
+        index = self.compile(tree.children[1])
+        return lambda: interp.index_rune(name, index())
+
+    def reduction(self, tree):
+        keyword = str(tree.children[0])
+        value = self.compile(tree.children[1])
+        reduce_values = operators.reduce_values
+        return lambda: reduce_values(keyword, value())
+
+
+    # ----- Collections ------
+
+    def collection(self, tree):
+        return self.compile(tree.children[0])
+
+    def array(self, tree):
+        contents = tree.children[1]
+        items = tuple(self.compile(node) for node in contents.children) if contents else ()
+        return lambda: ScrollTome([wrap_primitive(item()) for item in items])
+
+    def grimoire(self, tree):
+        contents = tree.children[1]
+        entries = tuple(
+            (self.compile(entry.children[0]), self.compile(entry.children[1]))
+            for entry in contents.children
+        ) if contents else ()
+        return lambda: ScrollGrimoire([(wrap_primitive(key()), wrap_primitive(value())) for key, value in entries])
+
+    # ----- Control Flow ------
+
+    def block(self, tree):
+        instructions = tuple(self.compile(node) for node in tree.children)
+
+        def run():
+            for instruction in instructions:
+                signal = instruction()
+                if signal.__class__ in SIGNAL_TYPES:
+                    return signal
+        return run
+
+    def if_statement(self, tree):
+        children = tree.children
+        branches = []
+        otherwise = None
+
+        i = 0
+        while i < len(children) and children[i] is not None:
+            if str(children[i]) == keywords.ELSE:
+                otherwise = self.compile(children[i+1])
+                break
+            branches.append((self.compile(children[i+1]), self.compile(children[i+2])))
+            i += 3
+        branches = tuple(branches)
+
+        def run():
+            for condition, block in branches:
+                if condition():
+                    return block()
+            if otherwise is not None:
+                return otherwise()
+        return run
+
+    def maybe_statement(self, tree):
+        ratio = tree.children[1]
+        ratio = self.ratio(ratio) if ratio is not None else 0.5
+        block = self.compile(tree.children[2])
+        uniform = random.uniform
+
+        def run():
+            if uniform(0, 1) < ratio:
+                return block()
+        return run
+
+    def ratio(self, tree):
+        left, right = int(tree.children[0].value), int(tree.children[1].value)
+        return operators.chance(left, right)
+
+    def for_range(self, tree):
+        interp = self.interpreter
+        bounds = self.range_expression(tree.children[1])
+        block = self.compile(tree.children[2])
+
+        if ranges.is_steady(tree, self.incantation_writes):
+            return self.steady_range(bounds, block)
+
+        def run():
+            var_name, var_type, start, stop, step = bounds()
+            variables = interp.variables
+
+            interp.bind_rune(var_name, start, var_type, False)
+
+            while variables[var_name].value <= stop:
+                try:
+                    signal = block()
+                except ShatterError:
+                    break
+                except PersistenceError:
+                    signal = None
+                if signal is SHATTER:
+                    break
+                if signal.__class__ is Proclamation:
+                    return signal
+                rune = variables[var_name]
+                rune.previous = rune.value
+                rune.value += step
+
+            interp.unbind_rune(var_name)
+        return run
+
+    def steady_range(self, bounds, block):
+        interp = self.interpreter
+        range_steps = ranges.range_steps
+
+        def run():
+            var_name, var_type, start, stop, step = bounds()
+
+            interp.bind_rune(var_name, start, var_type, False)
+            rune = interp.variables[var_name]
+
+            for value in range_steps(start, stop, step):
+                try:
+                    signal = block()
+                except ShatterError:
+                    break
+                except PersistenceError:
+                    signal = None
+                if signal is SHATTER:
+                    break
+                if signal.__class__ is Proclamation:
+                    return signal
+                rune.previous = rune.value
+                rune.value = value
+
+            interp.unbind_rune(var_name)
+        return run
+
+    def while_loop(self, tree):
+        condition = self.compile(tree.children[2])
+        block = self.compile(tree.children[3])
+
+        def run():
+            while not condition():
+                try:
+                    signal = block()
+                except ShatterError:
+                    break
+                except PersistenceError:
+                    signal = None
+                if signal is SHATTER:
+                    break
+                if signal.__class__ is Proclamation:
+                    return signal
+        return run
+
+    def foreach_loop(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[1])
+        collection = self.compile(tree.children[3])
+        block = self.compile(tree.children[4])
+
+        def run():
+            expr = collection()
+            variables = interp.variables
+
+            if name in variables:
+                raise RuneAlreadyWrittenError(name)
+
+            items = iter(wrap_primitive(expr))
+            item = next(items, None)
+            if item is None:
+                return
+
+            interp.bind_rune(name, None, item.type_name, False)
+
+            while item is not None:
+                rune = variables[name]
+                rune.previous = rune.value
+                rune.value = item
+
+                try:
+                    signal = block()
+                except ShatterError:
+                    break
+                except PersistenceError:
+                    signal = None
+                if signal is SHATTER:
+                    break
+                if signal.__class__ is Proclamation:
+                    return signal
+                item = next(items, None)
+        return run
+
+    def infinite_loop(self, tree):
+        block = self.compile(tree.children[3])
+
+        def run():
+            while True:
+                try:
+                    signal = block()
+                except ShatterError:
+                    break
+                except PersistenceError:
+                    signal = None
+                if signal is SHATTER:
+                    break
+                if signal.__class__ is Proclamation:
+                    return signal
+        return run
+
+    def range_expression(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[0])
+        start = self.compile(tree.children[1])
+        stop = self.compile(tree.children[2])
+        step = self.compile(tree.children[3]) if tree.children[3] is not None else constant(1)
+        return lambda: interp.range_bounds(name, start(), stop(), step())
+
+    def range_value(self, tree):
+        interp = self.interpreter
+        start = self.compile(tree.children[0])
+        stop = self.compile(tree.children[1])
+        step = self.compile(tree.children[2]) if tree.children[2] is not None else constant(1)
+        return lambda: ScrollRange(*interp.check_bounds(start(), stop(), step()))
+
+    def input_stream(self, tree):
+        interp = self.interpreter
+        return lambda: ScrollStream(interp.listen)
+
+    def loop_interrupt(self, tree):
+        return self.compile(tree.children[0])
+
+    def BREAK(self, token):
+        return constant(SHATTER)
+
+    def CONTINUE(self, token):
+        return constant(PERSIST)
+
+
+    # ----- Variables ------
+
+    def var_expr(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[0])
+        return lambda: interp.read_rune(name)
+
+    def value_cast(self, tree):
+        interp = self.interpreter
+        value = self.compile(tree.children[1])
+        target_type = str(tree.children[3])
+        return lambda: interp.cast_value(value(), target_type)
+
+
+    # ----- Data Types ------
+
+    def INTEGER(self, token):
+        return constant(ScrollInt(int(token)))
+
+    def FLOAT(self, token):
+        return constant(ScrollFloat(float(token)))
+
+    def BOOLEAN(self, token):
+        return constant(ScrollBool(str(token)))
+
+    def STRING(self, token):
+        return constant(self.interpreter.literals.string(str(token)[1:-1]))
+
+    def constant(self, tree):
+        return constant(tree.children[0])
+
+
+    # ----- Input & Output ------
+
+    def print_statement(self, tree):
+        interp = self.interpreter
+        text = self.compile(tree.children[1])
+        return lambda: interp.reveal(text())
+
+    def input_statement(self, tree):
+        interp = self.interpreter
+        return lambda: interp.listen()
+
+    def prompted_input(self, tree):
+        interp = self.interpreter
+        text = self.compile(tree.children[1])
+        return lambda: interp.listen(text())
+
+
+    # ----- Features ------
+
+    def interpolated_string(self, tree):
+        parts = tree.children[1:-1]
+        fill = self.interpreter.literals.template(parts).fill
+        expressions = tuple(self.compile(part.children[1]) for part in parts if len(part.children) > 1)
+
+        if not expressions:
+            return constant(fill(()))
+        if len(expressions) == 1:
+            expression = expressions[0]
+            return lambda: fill((expression(),))
+        return lambda: fill([expression() for expression in expressions])
+
+
+    # ----- Unique Features ------
+
+    def previous(self, tree):
+        interp = self.interpreter
+        name = self.rune_name(tree.children[0])
+        return lambda: interp.read_previous(name)
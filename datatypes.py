@@ -1,8 +1,18 @@
 from math import log10
-from keywords import INTEGER, FLOAT, STRING, BOOLEAN, TRUE, FALSE
-from exceptions import MeasureError
+from array import array
+from itertools import islice
+from keywords import INTEGER, FLOAT, STRING, BOOLEAN, TRUE, FALSE, ARRAY, DICT
+from exceptions import MeasureError, CarelessSpellError, SilenceError
 
 class ScrollValue:
+    __slots__ = ("value",)
+
+    # Whether the value can change in place, so that it must not be shared behind a rune's back.
+    mutable = False
+
+    def __getnewargs__(self):
+        return (self.value,)
+
     def cast_to(self, target_type: str):
         raise NotImplementedError("Casting not implemented for this type.")
 
@@ -15,16 +25,20 @@ class ScrollValue:
     def __len__(self):
         raise MeasureError(f"'{self.__class__.type_name}' runes cannot be measured.")
 
+    def __iter__(self):
+        raise CarelessSpellError(f"'{self.__class__.type_name}' runes cannot be walked.")
+
 
 class ScrollBool(ScrollValue):
     
     type_name = BOOLEAN
+    __slots__ = ()
     
-    def __init__(self, value):
+    def __new__(cls, value):
+        # There are only two truths, so every ScrollBool is one of two shared instances.
         if isinstance(value, str):
-            self.value = value == TRUE
-        else:
-            self.value = bool(value)
+            value = value == TRUE
+        return TRUTHSUNG if value else FALSEHOOD
 
     def __bool__(self):
         return self.value
@@ -35,10 +49,13 @@ class ScrollBool(ScrollValue):
     def __repr__(self):
         return f"<ScrollBool: {TRUE if self.value else FALSE}>"
 
+    # A truth is only ever equal to another truth, so Truthsung and 1 are different grimoire keys.
+    # Scrolls comparing them with == go through operators.equal instead.
     def __eq__(self, other):
-        if isinstance(other, ScrollBool):
-            return self.value == other.value
-        return self.value == bool(other)
+        return other.__class__ is ScrollBool and self.value == other.value
+
+    def __hash__(self):
+        return hash((BOOLEAN, self.value))
 
     def __and__(self, other):
         return ScrollBool(self.value and bool(other))
@@ -74,13 +91,22 @@ class ScrollBool(ScrollValue):
 class ScrollInt(ScrollValue):
     
     type_name = INTEGER
-    
-    def __init__(self, value: int):
-        self.value = int(value)
+    __slots__ = ()
+    
+    def __new__(cls, value: int):
+        if value.__class__ is not int:
+            value = int(value)
+        if SMALL_INT_MIN <= value <= SMALL_INT_MAX:
+            return SMALL_INTS[value - SMALL_INT_MIN]
+        self = object.__new__(cls)
+        self.value = value
+        return self
         
     def __add__(self, other):
+        if other.__class__ is ScrollInt:
+            return ScrollInt(self.value + other.value)
         other_val = wrap_primitive(other).value
-        if isinstance(other_val, str):
+        if other_val.__class__ is str:
             return ScrollString(str(self.value) + other_val)
         return ScrollInt(self.value + other_val)
 
@@ -94,13 +120,13 @@ class ScrollInt(ScrollValue):
         other_val = wrap_primitive(other).value
         if other_val == 0:
             raise ZeroDivisionError("The arcane winds forbid division by zero.")
-        return ScrollFloat(self.value / wrap_primitive(other).value)
+        return ScrollFloat(self.value / other_val)
     
     def __floordiv__(self, other):
         other_val = wrap_primitive(other).value
         if other_val == 0:
             raise ZeroDivisionError("The arcane winds forbid division by zero.")
-        return ScrollInt(self.value // wrap_primitive(other).value)
+        return ScrollInt(self.value // other_val)
 
     def __mod__(self, other):
         return ScrollInt(self.value % wrap_primitive(other).value)
@@ -115,10 +141,13 @@ class ScrollInt(ScrollValue):
         return str(self.value)
     
     def __eq__(self, other):
-        return self.value == other.value
+        return other.__class__ is not ScrollBool and self.value == other.value
     
     def __ne__(self, other):
-        return self.value != other.value
+        return other.__class__ is ScrollBool or self.value != other.value
+    
+    def __hash__(self):
+        return hash(self.value)
     
     def __lt__(self, other):
         return self.value < other.value
@@ -151,6 +180,7 @@ class ScrollInt(ScrollValue):
 class ScrollFloat(ScrollValue):
     
     type_name = FLOAT
+    __slots__ = ()
     
     def __init__(self, value: float):
         self.value = float(value)
@@ -168,13 +198,13 @@ class ScrollFloat(ScrollValue):
         other_val = wrap_primitive(other).value
         if other_val == 0:
             raise ZeroDivisionError("The arcane winds forbid division by zero.")
-        return ScrollFloat(self.value / wrap_primitive(other).value)
+        return ScrollFloat(self.value / other_val)
     
     def __floordiv__(self, other):
         other_val = wrap_primitive(other).value
         if other_val == 0:
             raise ZeroDivisionError("The arcane winds forbid division by zero.")
-        return ScrollInt(self.value // wrap_primitive(other).value)
+        return ScrollInt(self.value // other_val)
 
     def __mod__(self, other):
         return ScrollFloat(self.value % wrap_primitive(other).value)
@@ -189,10 +219,13 @@ class ScrollFloat(ScrollValue):
         return str(self.value)
     
     def __eq__(self, other):
-        return self.value == other.value
+        return other.__class__ is not ScrollBool and self.value == other.value
     
     def __ne__(self, other):
-        return self.value != other.value
+        return other.__class__ is ScrollBool or self.value != other.value
+    
+    def __hash__(self):
+        return hash(self.value)
     
     def __lt__(self, other):
         return self.value < other.value
@@ -224,14 +257,66 @@ class ScrollFloat(ScrollValue):
 
 
 class ScrollString(ScrollValue):
+    """
+    A string, kept as the pieces it was built from until its text is read.
+
+    Appending to a string shares its list of pieces with the new string
+    instead of copying its text. The new string owns the first `count`
+    pieces of the list, so a rune appended to over and over only ever
+    adds to the end of one list, while an older string sharing the list
+    still sees just the pieces it was built from. The pieces are joined
+    the first time the text is needed, such as to reveal, compare or
+    index the string.
+    """
     
     type_name = 'str'
+    __slots__ = ("text", "pieces", "count")
     
     def __init__(self, value: str):
-        self.value = str(value)
+        self.text = str(value)
+        self.pieces = None
+        self.count = 0
+
+    @property
+    def value(self):
+        text = self.text
+        if text is None:
+            pieces = self.pieces
+            text = self.text = "".join(pieces if len(pieces) == self.count else pieces[:self.count])
+            self.pieces = None
+        return text
+
+    @value.setter
+    def value(self, text):
+        self.text = text
+        self.pieces = None
+
+    def extended(self, tails):
+        """
+        This string followed by tails.
+
+        Args:
+            tails (list): The strings to append.
+
+        Returns:
+            ScrollString: The new string, sharing this one's pieces.
+        """
+        pieces = self.pieces
+        if pieces is None:
+            pieces = [self.text]
+        elif len(pieces) != self.count:
+            # Another string was already appended to these pieces.
+            pieces = pieces[:self.count]
+        pieces += tails
+
+        string = object.__new__(ScrollString)
+        string.text = None
+        string.pieces = pieces
+        string.count = len(pieces)
+        return string
     
     def __add__(self, other):
-        return ScrollString(self.value + str(other))
+        return self.extended([str(other)])
     
     def __eq__(self, other):
         return self.value == other.value
@@ -239,6 +324,9 @@ class ScrollString(ScrollValue):
     def __ne__(self, other):
         return self.value != other.value
     
+    def __hash__(self):
+        return hash(self.value)
+    
     def __lt__(self, other):
         return self.value < other.value
     
@@ -257,6 +345,9 @@ class ScrollString(ScrollValue):
     def __getitem__(self, index):
         return ScrollString(self.value[index])
 
+    def __iter__(self):
+        return map(character, self.value)
+
     def cast_to(self, target_type: str):
         if target_type == STRING:
             return self
@@ -276,6 +367,248 @@ class ScrollString(ScrollValue):
             raise ValueError(f"Cannot cast {STRING} to {target_type}")
 
 
+class ScrollTome(ScrollValue):
+    """
+    An ordered collection that can grow and be written in place.
+
+    A tome holding only ints or only floats keeps them unboxed in a typed
+    array.array; any other tome keeps a list of ScrollValues. A typed tome
+    falls back to a list the first time it is given a value its array
+    cannot hold.
+    """
+
+    type_name = ARRAY
+    mutable = True
+    __slots__ = ()
+
+    def __init__(self, values=()):
+        self.value = tome_storage(values)
+
+    @classmethod
+    def unboxed(cls, typecode, values):
+        """A tome of raw ints ("q") or floats ("d"), kept boxed if they do not fit the array."""
+        tome = cls.__new__(cls)
+        try:
+            tome.value = array(typecode, values)
+        except OverflowError:
+            tome.value = [TOME_ELEMENTS[typecode](value) for value in values]
+        return tome
+
+    def __len__(self):
+        return len(self.value)
+
+    def __getitem__(self, index):
+        items = self.value
+        if items.__class__ is list:
+            return items[index]
+        return TOME_ELEMENTS[items.typecode](items[index])
+
+    def __iter__(self):
+        # Pages inscribed or dispelled while the tome is walked are seen by
+        # the walk, so it picks up where it was if the array gives way to a list.
+        index = 0
+        items = self.value
+        while True:
+            pages = items if items.__class__ is list else map(TOME_ELEMENTS[items.typecode], items)
+            for item in islice(pages, index, None):
+                index += 1
+                yield item
+                if self.value is not items:
+                    break
+            else:
+                return
+            items = self.value
+
+    def __str__(self):
+        return "[" + ", ".join(str(item) for item in self.boxed()) + "]"
+
+    def boxed(self):
+        """The values of the tome as a list of ScrollValues."""
+        items = self.value
+        if items.__class__ is list:
+            return list(items)
+        return list(map(TOME_ELEMENTS[items.typecode], items))
+
+    def append(self, value):
+        items = self.value
+        if items.__class__ is list:
+            if items:
+                items.append(value)
+            else:
+                self.value = tome_storage((value,))
+            return
+
+        if value.__class__ is TOME_ELEMENTS[items.typecode]:
+            try:
+                items.append(value.value)
+                return
+            except OverflowError:
+                pass
+        self.value = self.boxed() + [value]
+
+    def store(self, index, value):
+        items = self.value
+        if items.__class__ is list:
+            items[index] = value
+            return
+
+        if value.__class__ is TOME_ELEMENTS[items.typecode]:
+            try:
+                items[index] = value.value
+                return
+            except OverflowError:
+                pass
+        items = self.boxed()
+        items[index] = value
+        self.value = items
+
+    def remove(self, index):
+        del self.value[index]
+
+    def cast_to(self, target_type: str):
+        if target_type == STRING:
+            return ScrollString(str(self))
+        elif target_type == BOOLEAN:
+            return ScrollBool(len(self.value) > 0)
+        else:
+            raise ValueError(f"Cannot cast {ARRAY} to {target_type}")
+
+
+class ScrollGrimoire(ScrollValue):
+    """
+    A mapping from keys to values, found by hash rather than by searching.
+
+    Any value that cannot change in place may be a key: ints, floats,
+    strings and bools. An int and a float of equal value are the same key,
+    but Truthsung and Falsehood are keys of their own, apart from 1 and 0.
+    """
+
+    type_name = DICT
+    mutable = True
+    __slots__ = ()
+
+    def __init__(self, entries=()):
+        self.value = {}
+        for key, value in entries:
+            self.store(key, value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __iter__(self):
+        # The keys are walked as they were when the walk began.
+        return iter(tuple(self.value))
+
+    def __str__(self):
+        return "{" + ", ".join(f"{key}: {value}" for key, value in self.value.items()) + "}"
+
+    def store(self, key, value):
+        if key.mutable:
+            raise CarelessSpellError(f"'{key.type_name}' runes cannot be grimoire keys.")
+        self.value[key] = value
+
+    def cast_to(self, target_type: str):
+        if target_type == STRING:
+            return ScrollString(str(self))
+        elif target_type == BOOLEAN:
+            return ScrollBool(len(self.value) > 0)
+        else:
+            raise ValueError(f"Cannot cast {DICT} to {target_type}")
+
+
+# The array typecode used for tomes of each numeric type, and back.
+TOME_TYPECODES = {ScrollInt: "q", ScrollFloat: "d"}
+TOME_ELEMENTS = {typecode: cls for cls, typecode in TOME_TYPECODES.items()}
+
+def tome_storage(values):
+    """Stores values in a typed array if they are all ints or all floats, and in a list otherwise."""
+    values = list(values)
+    if values:
+        cls = values[0].__class__
+        typecode = TOME_TYPECODES.get(cls)
+        if typecode is not None and all(value.__class__ is cls for value in values):
+            try:
+                return array(typecode, [value.value for value in values])
+            except OverflowError:
+                pass
+    return values
+
+
+class ScrollRange(ScrollValue):
+    """
+    The numbers from start up to and including stop, counting by step.
+
+    Each number is only worked out when a cycle asks for it, the same way
+    a counting cycle adds its step after every turn.
+    """
+
+    type_name = "range"
+    __slots__ = ()
+
+    def __init__(self, start, stop, step):
+        self.value = (start, stop, step)
+
+    def __iter__(self):
+        current, stop, step = self.value
+        while current <= stop:
+            yield current
+            current = current + step
+
+    def __str__(self):
+        start, stop, step = self.value
+        return f"{start} -> {stop} | {step}"
+
+
+class ScrollStream(ScrollValue):
+    """The lines of input, each read only when a cycle asks for it, until input runs out."""
+
+    type_name = "stream"
+    __slots__ = ()
+
+    def __init__(self, read_line):
+        self.value = read_line
+
+    def __iter__(self):
+        read_line = self.value
+        while True:
+            try:
+                line = read_line()
+            except (EOFError, SilenceError):
+                return
+            yield wrap_primitive(line)
+
+    def __str__(self):
+        return "listen ad infinitum"
+
+
+# ----- Shared Values ------
+
+def make_shared(cls, value):
+    self = object.__new__(cls)
+    self.value = value
+    return self
+
+TRUTHSUNG = make_shared(ScrollBool, True)
+FALSEHOOD = make_shared(ScrollBool, False)
+
+# Small integers are shared, like Python's own, so counters and loop
+# runes stop allocating a new ScrollInt at every step.
+SMALL_INT_MIN = -128
+SMALL_INT_MAX = 1024
+SMALL_INTS = tuple(make_shared(ScrollInt, value) for value in range(SMALL_INT_MIN, SMALL_INT_MAX + 1))
+
+# Walking a string hands out each of its characters, so they are shared rather than made anew.
+CHARACTERS = {}
+
+def character(char):
+    value = CHARACTERS.get(char)
+    if value is None:
+        value = CHARACTERS[char] = ScrollString(char)
+    return value
+
+SCROLL_TYPES = (ScrollBool, ScrollInt, ScrollFloat, ScrollString, ScrollTome, ScrollGrimoire)
+
+
 def wrap_primitive(value):
     if value is None:
         raise TypeError("Cannot wrap a dormant rune (None) into a ScrollValue.")
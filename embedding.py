@@ -0,0 +1,220 @@
+"""
+Reading scrolls from a Python program, many times over.
+
+run_program builds a parser and an interpreter for every scroll it reads,
+and writes what the scroll reveals to stdout. A ScrollScriptEngine is built
+once and read many scrolls with: it keeps one parser, remembers the parse
+trees of the scroll sources and files it was given, and hands every scroll
+an interpreter from a pool, reset from the last scroll it read. Each read
+returns a ScrollResult with the runes the scroll left, what it revealed,
+the error it failed with, if any, and how long it took.
+
+    engine = ScrollScriptEngine(engine="closure")
+    result = engine.run_source('rune total = 6 * 7; reveal total;')
+    result.output            # "42"
+    result.runes["total"]    # ScrollInt(42)
+
+An engine may be shared between threads. Every read has an interpreter to
+itself, and the remembered trees are only ever read: the strings the
+optimizer folds into them are joined before they are kept, so appending to
+one makes a new string rather than growing the shared one.
+"""
+import io
+import os
+import threading
+from collections import OrderedDict
+from time import perf_counter
+from parser import ScrollScriptParser
+from optimizer import ScrollScriptOptimizer
+from scrollscript import ENGINES, GRAMMAR_PATH
+from vm import DEFAULT_MEMORY_LIMIT
+from memo import DEFAULT_MEMO_SIZE
+from sinks import MemorySink
+from sources import BatchSource
+
+# The grammar beside this module, so engines can be built from any working directory.
+DEFAULT_GRAMMAR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), GRAMMAR_PATH)
+
+# How many idle interpreters an engine keeps for its next scrolls.
+DEFAULT_POOL_SIZE = 8
+
+# How many parse trees of scroll sources and files an engine remembers.
+DEFAULT_TREE_CACHE_SIZE = 128
+
+
+class ScrollResult:
+    """
+    How reading a scroll went.
+
+    Attributes:
+        runes (dict): The value of every rune written when the scroll ended, by name.
+        output (str): Everything the scroll revealed.
+        error (Exception): What the scroll failed with, or None if it ran to its end.
+        parse_time (float): Seconds spent parsing the scroll, or finding its parse tree.
+        run_time (float): Seconds spent reading the parsed scroll.
+    """
+    __slots__ = ("runes", "output", "error", "parse_time", "run_time")
+
+    def __init__(self, runes, output, error, parse_time, run_time):
+        self.runes = runes
+        self.output = output
+        self.error = error
+        self.parse_time = parse_time
+        self.run_time = run_time
+
+    def __repr__(self):
+        status = "ok" if self.error is None else f"error={self.error!r}"
+        return f"<ScrollResult {status} output={len(self.output)} chars in {self.total_time:.6f}s>"
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def total_time(self):
+        return self.parse_time + self.run_time
+
+
+class ScrollScriptEngine:
+    """
+    A parser and a pool of interpreters, built once and used to read many scrolls.
+
+    Args:
+        engine (str): How scrolls are executed: "tree", "closure" or "vm".
+        cache (bool): Whether scrolls read from files use their .sscc cache files.
+        optimize (bool): Whether parse trees are optimized before they are read.
+        memo_size (int): How many results of pure incantations each interpreter remembers.
+        memory_limit (int): How many bytes the vm engine's call stack may take.
+        pool_size (int): How many idle interpreters are kept for later scrolls.
+        tree_cache_size (int): How many parse trees of scroll sources and files are remembered; 0 remembers none.
+        grammar_path (str): The ScrollScript grammar.
+    """
+    def __init__(self, engine="tree", cache=True, optimize=False, memo_size=DEFAULT_MEMO_SIZE,
+                 memory_limit=DEFAULT_MEMORY_LIMIT, pool_size=DEFAULT_POOL_SIZE,
+                 tree_cache_size=DEFAULT_TREE_CACHE_SIZE, grammar_path=DEFAULT_GRAMMAR_PATH):
+        if engine not in ENGINES:
+            raise ValueError(f"There is no '{engine}' engine. The engines are: {', '.join(ENGINES)}.")
+        self.engine = engine
+        self.optimize = optimize
+        self.memo_size = memo_size
+        self.memory_limit = memory_limit
+        self.pool_size = pool_size
+        self.tree_cache_size = tree_cache_size
+
+        self.parser = ScrollScriptParser(grammar_path, cache)
+        self.trees = OrderedDict()
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def run_source(self, program, input=None, runes=None):
+        """
+        Reads a scroll given as source text.
+
+        Args:
+            program (str): The scroll's source.
+            input (str): The lines listen reads, or None for none.
+            runes (dict): Runes written before the scroll starts, by name, as Python or Scroll values.
+
+        Returns:
+            ScrollResult: How reading the scroll went. A scroll that cannot be parsed, or
+                fails while it is read, has its error in the result rather than raised.
+        """
+        start = perf_counter()
+        try:
+            tree = self.parse_source(program)
+        except Exception as e:
+            return ScrollResult({}, "", e, perf_counter() - start, 0.0)
+        return self.run_tree(tree, input, runes, perf_counter() - start)
+
+    def run_file(self, program_path, input=None, runes=None):
+        """
+        Reads a scroll from a .ssc file. Arguments and result are as for run_source.
+        """
+        start = perf_counter()
+        try:
+            tree = self.parse_file(program_path)
+        except Exception as e:
+            return ScrollResult({}, "", e, perf_counter() - start, 0.0)
+        return self.run_tree(tree, input, runes, perf_counter() - start)
+
+    def parse_source(self, program):
+        """The parse tree of a scroll's source, parsed the first time it is met."""
+        return self.cached_tree(program, lambda: self.parser.parse_source(program))
+
+    def parse_file(self, program_path):
+        """The parse tree of a .ssc file, parsed again only once the file has changed."""
+        stat = os.stat(program_path)
+        key = (os.path.abspath(program_path), stat.st_mtime_ns, stat.st_size)
+        return self.cached_tree(key, lambda: self.parser.parse(program_path))
+
+    def cached_tree(self, key, parse):
+        """
+        The remembered tree for a key, or the tree parse() returns, optimized if the engine optimizes.
+
+        Args:
+            key: What the tree is remembered by: a scroll's source, or a file's path and stamp.
+            parse (callable): Parses the scroll the first time it is met.
+        """
+        trees = self.trees
+        with self.lock:
+            tree = trees.get(key)
+            if tree is not None:
+                trees.move_to_end(key)
+                return tree
+
+        tree = parse()
+        if self.optimize:
+            tree = ScrollScriptOptimizer().optimize(tree)
+        if self.tree_cache_size > 0:
+            with self.lock:
+                trees[key] = tree
+                if len(trees) > self.tree_cache_size:
+                    trees.popitem(last=False)
+        return tree
+
+    def run_tree(self, tree, input=None, runes=None, parse_time=0.0):
+        """
+        Reads a parsed scroll on an interpreter from the pool.
+
+        Returns:
+            ScrollResult: How reading the scroll went.
+        """
+        interpreter = self.acquire()
+        interpreter.source = BatchSource(io.StringIO(input or ""))
+        error = None
+        start = perf_counter()
+        try:
+            for name, value in (runes or {}).items():
+                interpreter.write_rune(name, value, False)
+            interpreter.start(tree)
+        except Exception as e:
+            error = e
+        run_time = perf_counter() - start
+
+        result = ScrollResult(
+            {name: rune.value for name, rune in interpreter.variables.items()},
+            interpreter.sink.getvalue(), error, parse_time, run_time,
+        )
+        self.release(interpreter)
+        return result
+
+
+    # ----- Interpreter Pool ------
+
+    def acquire(self):
+        """An interpreter with no runes or incantations, from the pool if one is idle."""
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        if self.engine == "vm":
+            return ENGINES["vm"](self.memo_size, self.memory_limit, sink=MemorySink())
+        return ENGINES[self.engine](self.memo_size, sink=MemorySink())
+
+    def release(self, interpreter):
+        """Resets an interpreter and returns it to the pool, unless the pool is full."""
+        interpreter.reset()
+        interpreter.sink.clear()
+        interpreter.source = None
+        with self.lock:
+            if len(self.idle) < self.pool_size:
+                self.idle.append(interpreter)
@@ -34,6 +34,14 @@ class TransmutationError(RuneError):
     def __init__(self, vfrom, vto):
         super().__init__(f"Failed to transmute from '{vfrom}' to '{vto}'.")
 
+class MissingEntryError(RuneError):
+    def __init__(self, name, key):
+        super().__init__(f"The grimoire '{name}' holds no entry for '{key}'.")
+
+class MissingPageError(RuneError):
+    def __init__(self, name, index):
+        super().__init__(f"The rune '{name}' holds no page '{index}'.")
+
 class FundamentalRuneError(RuneError):
     def __init__(self, name):
         super().__init__(f"'{name}' is fundamental to the arcane, and may not be confined to a rune.")
@@ -72,6 +80,17 @@ class ShatterError(ManaFlowError):
     def __init__(self):
         super().__init__(f"No cycle to shatter was found.")
 
+class ManaExhaustedError(ManaFlowError):
+    def __init__(self, depth):
+        super().__init__(f"The mana ran dry after {depth} nested incantations.")
+
+
+# ----- Input Errors ----- #
+
+class SilenceError(ScrollError):
+    def __init__(self):
+        super().__init__("The scroll listened, but no more words were spoken.")
+
 
 # ----- Return Errors ----- #
 class ReturnValue(Exception):
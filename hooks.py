@@ -0,0 +1,136 @@
+"""
+Hooks for instrumenting the tree-walking interpreter.
+
+A hook is a callable registered for one of the events below with
+ScrollScriptInterpreter.add_hook:
+
+    before_instruction(node)    before a statement runs
+    after_instruction(node)     after a statement has run
+    incantation_enter(name, args)
+    incantation_exit(name, value)   value is what the cast proclaimed, or None
+    rune_assignment(name, value)    after a declaration, assignment or increment writes a rune
+    loop_iteration(node)        before every turn of a loop, given the loop's node
+
+Every cast fires incantation_enter and incantation_exit, even one whose
+value is taken from the memo cache; such a cast runs no statements between
+the two.
+
+Hooks should be added before the scroll starts, which is when the
+interpreter finds its statements and loops. The interpreter only checks
+for hooks while one is registered: adding the first hook installs
+instrumented versions of execute, invoke and the rune methods on
+that one interpreter, and removing the last takes them away again, leaving
+the plain methods of its class with no checks in them at all.
+"""
+from memo import LOOPS
+
+EVENTS = (
+    "before_instruction", "after_instruction",
+    "incantation_enter", "incantation_exit",
+    "rune_assignment", "loop_iteration",
+)
+
+# The methods through which the tree engine writes runes, each taking the rune's name first.
+RUNE_WRITERS = ("write_rune", "assign_rune", "increment_rune", "compound_rune")
+
+INSTRUMENTED = ("execute", "invoke") + RUNE_WRITERS
+
+
+def find_statements(tree):
+    """The statements of a scroll: every node run directly by the scroll or by a block, except declarations."""
+    blocks = [tree] + [node for node in tree.iter_subtrees() if node.data == "block"]
+    return [
+        statement
+        for block in blocks for statement in block.children
+        if statement is not None and statement.data != "func_declaration"
+    ]
+
+
+class HookSet:
+    """The hooks registered on one interpreter."""
+    def __init__(self):
+        self.callbacks = {event: [] for event in EVENTS}
+        self.statements = set()
+        self.loop_bodies = {}
+
+    def __bool__(self):
+        return any(self.callbacks.values())
+
+    def add(self, event, callback):
+        if event not in self.callbacks:
+            raise ValueError(f"There is no '{event}' hook. The hooks are: {', '.join(EVENTS)}.")
+        self.callbacks[event].append(callback)
+
+    def remove(self, event, callback):
+        if event not in self.callbacks:
+            raise ValueError(f"There is no '{event}' hook. The hooks are: {', '.join(EVENTS)}.")
+        self.callbacks[event].remove(callback)
+
+    def learn(self, tree):
+        """Finds the statements and loop bodies of the scroll about to be read."""
+        self.statements.clear()
+        self.statements.update(id(statement) for statement in find_statements(tree))
+        self.loop_bodies.clear()
+        self.loop_bodies.update(
+            (id(node.children[-1]), node) for node in tree.iter_subtrees() if node.data in LOOPS
+        )
+
+    def install(self, interpreter):
+        """Shadows the interpreter's methods with versions that call the hooks."""
+        cls = type(interpreter)
+        callbacks = self.callbacks
+        statements, loop_bodies = self.statements, self.loop_bodies
+        before, after = callbacks["before_instruction"], callbacks["after_instruction"]
+        turns = callbacks["loop_iteration"]
+        execute = cls.execute.__get__(interpreter)
+
+        def hooked_execute(node):
+            key = id(node)
+            loop = loop_bodies.get(key)
+            if loop is not None:
+                for hook in turns:
+                    hook(loop)
+            if key not in statements:
+                return execute(node)
+            for hook in before:
+                hook(node)
+            result = execute(node)
+            for hook in after:
+                hook(node)
+            return result
+
+        # Every cast goes through invoke, including those the memo cache answers.
+        enters, exits = callbacks["incantation_enter"], callbacks["incantation_exit"]
+        invoke = cls.invoke.__get__(interpreter)
+
+        def hooked_invoke(name, func_info, args):
+            for hook in enters:
+                hook(name, args)
+            value = None
+            try:
+                value = invoke(name, func_info, args)
+                return value
+            finally:
+                for hook in exits:
+                    hook(name, value)
+
+        interpreter.execute = hooked_execute
+        interpreter.invoke = hooked_invoke
+        for method_name in RUNE_WRITERS:
+            setattr(interpreter, method_name, self.rune_writer(interpreter, getattr(cls, method_name)))
+
+    def rune_writer(self, interpreter, method):
+        method = method.__get__(interpreter)
+        assignments = self.callbacks["rune_assignment"]
+
+        def hooked(name, *args):
+            method(name, *args)
+            value = interpreter.variables[name].value
+            for hook in assignments:
+                hook(name, value)
+        return hooked
+
+    def uninstall(self, interpreter):
+        """Removes the instrumented methods, leaving those of the interpreter's class."""
+        for method_name in INSTRUMENTED:
+            interpreter.__dict__.pop(method_name, None)
@@ -1,22 +1,87 @@
 import random
-import math
 from lark import Token
 import keywords
 from utils import is_keyword, is_number
-from datatypes import wrap_primitive, ScrollBool, ScrollFloat, ScrollInt, ScrollString
+from datatypes import (
+    wrap_primitive, ScrollBool, ScrollFloat, ScrollInt, ScrollString, ScrollTome, ScrollGrimoire,
+    ScrollRange, ScrollStream, SCROLL_TYPES
+)
 from exceptions import *
+from runes import Rune
+from signals import SHATTER, PERSIST, SIGNAL_TYPES, Proclamation, escape
+from memo import IncantationCache, DEFAULT_MEMO_SIZE, MISSING
+from literals import LiteralPool
+from hooks import HookSet
+from sinks import OutputSink
+from sources import InteractiveSource
+import operators
+import ranges
+from operators import (
+    resolve, ADD_OPERATORS, MUL_OPERATORS, COMP_OPERATORS, ROUND_OPERATORS,
+    INCR_OPERATORS, CMP_INCR_OPERATORS
+)
+
+# Marks a rune that did not exist before an incantation wrote it.
+UNWRITTEN = object()
 
 class ScrollScriptInterpreter:
-    def __init__(self):
+    # Whether the engine runs the scroll through execute and so can fire hooks.
+    hookable = True
+
+    def __init__(self, memo_size=DEFAULT_MEMO_SIZE, sink=None, source=None):
         self.variables = {}
         self.functions = {}
+        self.frames = []
+        self.memo = IncantationCache(memo_size) if memo_size > 0 else None
+        self.pure = {}
+        self.steady_loops = set()
+        self.literals = LiteralPool()
+        self.templates = {}
+        self.hooks = HookSet()
+        self.sink = sink if sink is not None else OutputSink()
+        self.source = source if source is not None else InteractiveSource()
     
     
     def start(self, tree):
-        self.load_functions(tree)
-        for instruction in tree.children:
-            if instruction.data != "func_declaration":
-                self.execute(instruction)
+        try:
+            self.learn_incantations(tree)
+            self.steady_loops = ranges.steady_loops(tree)
+            self.learn_literals(tree)
+            if self.hooks:
+                self.hooks.learn(tree)
+            self.load_functions(tree)
+            for instruction in tree.children:
+                if instruction.data != "func_declaration":
+                    signal = self.execute(instruction)
+                    if signal.__class__ in SIGNAL_TYPES:
+                        escape(signal)
+        finally:
+            self.sink.flush()
+    
+    def reset(self):
+        """Forgets the runes, incantations and remembered casts of the last scroll, ready to read another."""
+        self.variables.clear()
+        self.functions.clear()
+        self.frames.clear()
+        if self.memo is not None:
+            self.memo = IncantationCache(self.memo.size)
+        self.pure = {}
+        self.steady_loops = set()
+        self.literals = LiteralPool()
+        self.templates = {}
+    
+    def learn_incantations(self, tree):
+        """Finds the incantations whose casts are memoized, unless memoization is off."""
+        if self.memo is not None:
+            self.pure = self.memo.learn(tree)
+    
+    def learn_literals(self, tree):
+        """Decodes the scroll's string literals and compiles its interpolated strings, once."""
+        self.literals.learn(tree)
+        self.templates = {
+            id(node): self.compile_template(node)
+            for node in tree.iter_subtrees() if node.data == "interpolated_string"
+        }
     
     def load_functions(self, tree):
         for instruction in tree.children:
@@ -24,149 +89,268 @@ class ScrollScriptInterpreter:
                 self.execute(instruction)
     
     
+    # ----- Hooks ------
+    
+    def add_hook(self, event, callback):
+        """
+        Calls back whenever an event happens while the scroll is read.
+
+        Args:
+            event (str): One of hooks.EVENTS, such as "rune_assignment".
+            callback (callable): Called with the details of each event.
+        """
+        if not self.hookable:
+            raise ValueError(f"{self.__class__.__name__} compiles the scroll ahead of time and fires no hooks.")
+        first = not self.hooks
+        self.hooks.add(event, callback)
+        if first:
+            self.hooks.install(self)
+    
+    def remove_hook(self, event, callback):
+        self.hooks.remove(event, callback)
+        if not self.hooks:
+            self.hooks.uninstall(self)
+    
+    
     # ----- Assignments & Declarations ------
     
     def var_declaration(self, tree):
         items = tree.children
         variable = self.execute(items[1])
-
-        if variable in self.variables:
-            raise RuneAlreadyWrittenError(variable)
+        self.check_unwritten(variable)
         
+        value = None
         if len(items) > 2 and items[2] is not None:
             value = self.execute(items[2])
-            value = wrap_primitive(value)
-            var_type = type(value).type_name
-        else:
-            value = None
-            var_type = None
 
-        self.variables[variable] = {
-            "value": value,
-            "type": var_type,
-            "const": False,
-            "previous": None
-        }
+        self.write_rune(variable, value, False)
 
     def const_declaration(self, tree):
         items = tree.children
         variable = self.execute(items[2])
+        self.check_unwritten(variable)
 
-        if variable in self.variables:
-            raise RuneAlreadyWrittenError(variable)
-
+        value = None
         if len(items) > 3 and items[3] is not None:
             value = self.execute(items[3])
+
+        self.write_rune(variable, value, True)
+    
+    def assignment(self, tree):
+        name, value = self.execute(tree.children[0]), self.execute(tree.children[1])
+        self.assign_rune(name, value)
+    
+    def deletion(self, tree):
+        variable = self.execute(tree.children[1])
+        self.dispel_rune(variable)
+    
+    def entry_deletion(self, tree):
+        name = self.execute(tree.children[1])
+        index = self.execute(tree.children[2])
+        self.dispel_entry(name, index)
+    
+    def seal_statement(self, tree):
+        name = self.execute(tree.children[1])
+        self.seal_rune(name)
+    
+    def simple_increment(self, tree):
+        name = self.execute(tree.children[0])
+        self.check_mutable(name)
+        op = self.execute(tree.children[1])
+        self.increment_rune(name, op, resolve(INCR_OPERATORS, op))
+    
+    def compound_increment(self, tree):
+        name = self.execute(tree.children[0])
+        self.check_mutable(name)
+        op = self.execute(tree.children[1])
+        value = self.execute(tree.children[2])
+        self.compound_rune(name, op, resolve(CMP_INCR_OPERATORS, op), value)
+    
+    def index_assignment(self, tree):
+        name = self.execute(tree.children[0])
+        index = self.execute(tree.children[1])
+        value = self.execute(tree.children[2])
+        self.store_index(name, index, value)
+    
+    def append_statement(self, tree):
+        value = self.execute(tree.children[1])
+        name = self.execute(tree.children[3])
+        self.append_rune(name, value)
+    
+    
+    # ----- Rune Primitives ------
+    
+    def check_unwritten(self, name):
+        if name in self.variables:
+            raise RuneAlreadyWrittenError(name)
+    
+    def check_mutable(self, name):
+        rune = self.variables.get(name)
+        if rune is None:
+            raise RuneNotWrittenError(name)
+        elif rune.const:
+            raise SealedRuneError(name)
+    
+    def write_rune(self, name, value, const):
+        if value is not None:
             value = wrap_primitive(value)
             var_type = type(value).type_name
         else:
-            value = None
             var_type = None
 
-        self.variables[variable] = {
-            "value": value,
-            "type": var_type,
-            "const": True,
-            "previous": None
-        }
+        self.bind_rune(name, value, var_type, const)
     
-    def assignment(self, tree):
-        name, value = self.execute(tree.children[0]), self.execute(tree.children[1])
-        
-        if name not in self.variables:
+    def bind_rune(self, name, value, var_type, const):
+        if self.frames:
+            self.shadow_rune(name)
+
+        self.variables[name] = Rune(value, var_type, const)
+    
+    def unbind_rune(self, name):
+        if self.frames:
+            self.shadow_rune(name)
+
+        del self.variables[name]
+    
+    def shadow_rune(self, name):
+        # The first time an incantation rebinds or removes a rune, its
+        # original binding is kept so that leaving the incantation restores it.
+        shadowed = self.frames[-1]
+        if name not in shadowed:
+            shadowed[name] = self.variables.get(name, UNWRITTEN)
+    
+    def assign_rune(self, name, value):
+        rune = self.variables.get(name)
+        if rune is None:
             raise RuneNotWrittenError(name)
         
-        if self.variables[name]['const']:
+        if rune.const:
             raise SealedRuneError(name)
         
         value = wrap_primitive(value)
         new_type = type(value).type_name
-        old_type = self.variables[name]['type']
         
-        self.variables[name]['previous'] = self.variables[name]['value'] if old_type == new_type else None
-        self.variables[name]['value'] = value 
-        self.variables[name]['type'] = new_type
+        rune.previous = rune.value if rune.type == new_type else None
+        rune.value = value 
+        rune.type = new_type
     
-    def deletion(self, tree):
-        variable = self.execute(tree.children[1])
-
-        if variable not in self.variables:
-            raise RuneNotWrittenError(variable)
-        
-        self.variables.pop(variable)
-    
-    def seal_statement(self, tree):
-        name = self.execute(tree.children[1])
-        
+    def dispel_rune(self, name):
         if name not in self.variables:
             raise RuneNotWrittenError(name)
         
-        if self.variables[name]['const']:
-            raise SealedRuneError(name)
-        
-        self.variables[name]['const'] = True
+        self.unbind_rune(name)
     
-    def simple_increment(self, tree):
-        name = self.execute(tree.children[0])
-
-        if name not in self.variables:
+    def seal_rune(self, name):
+        rune = self.variables.get(name)
+        if rune is None:
             raise RuneNotWrittenError(name)
-        elif self.variables[name]['const']:
-            raise SealedRuneError(name)
         
-        op = self.execute(tree.children[1])
+        if rune.const:
+            raise SealedRuneError(name)
         
-        if not is_number(self.variables[name]['value']):
-            raise CarelessSpellError(f"'{self.variables[name]['type']}' {op} is an invalid incantation.")
+        rune.const = True
+    
+    def increment_rune(self, name, op, operation):
+        rune = self.variables[name]
+        if not is_number(rune.value):
+            raise CarelessSpellError(f"'{rune.type}' {op} is an invalid incantation.")
         
-        match op:
-            case "++": self.variables[name]['value'] += 1
-            case "--": self.variables[name]['value'] -= 1
-            case _: raise UnknownSpellError(op)
+        rune.value = operation(rune.value)
     
-    def compound_increment(self, tree):
-        name = self.execute(tree.children[0])
+    def compound_rune(self, name, op, operation, value):
+        rune = self.variables[name]
+        if not is_number(rune.value) or not is_number(value):
+            raise CarelessSpellError(f"'{rune.type}' {op} '{value.type_name}' is an invalid incantation.")
 
-        if name not in self.variables:
+        result = operation(rune.value, value)
+        rune.value = result if result.__class__ in SCROLL_TYPES else wrap_primitive(result)
+        rune.type = rune.value.type_name
+    
+    def read_rune(self, name):
+        rune = self.variables.get(name)
+        if rune is None:
             raise RuneNotWrittenError(name)
-        elif self.variables[name]['const']:
+        elif rune.value is None:
+            raise DormantRuneError(name)
+        return rune.value
+    
+    def read_previous(self, name):
+        rune = self.variables.get(name)
+        if rune is None:
+            raise RuneNotWrittenError(name)
+        elif rune.previous is None:
+            raise NoPastError(name)
+        return rune.previous
+    
+    def index_rune(self, name, index):
+        var_value = self.read_rune(name)
+        if var_value.__class__ is ScrollGrimoire:
+            return self.lookup_entry(name, var_value, wrap_primitive(index))
+        if not isinstance(var_value, (ScrollString, ScrollTome)):
+            raise CarelessSpellError(f"'{var_value.type_name}'::{index.type_name} is an invalid incantation.")
+        try:
+            return wrap_primitive(var_value[index.value])
+        except IndexError:
+            raise MissingPageError(name, index)
+        except TypeError:
+            raise CarelessSpellError(f"'{var_value.type_name}'::{index.type_name} is an invalid incantation.")
+    
+    def lookup_entry(self, name, grimoire, key):
+        try:
+            return grimoire.value[key]
+        except KeyError:
+            raise MissingEntryError(name, key)
+        except TypeError:
+            raise CarelessSpellError(f"'{grimoire.type_name}'::{key.type_name} is an invalid incantation.")
+    
+    def writable_collection(self, name, *types):
+        rune = self.variables.get(name)
+        if rune is None:
+            raise RuneNotWrittenError(name)
+        elif rune.value is None:
+            raise DormantRuneError(name)
+        elif rune.const:
             raise SealedRuneError(name)
-        
-        op = self.execute(tree.children[1])
-        value = self.execute(tree.children[2])
-        
-        if not is_number(self.variables[name]['value']) or not is_number(value):
-            raise CarelessSpellError(f"'{self.variables[name]['type']}' {op} '{value.type_name}' is an invalid incantation.")
-
-        match op:
-            case "+=": self.variables[name]['value'] += value
-            case "-=": self.variables[name]['value'] -= value
-            case "*=": self.variables[name]['value'] *= value
-            case "/=": self.variables[name]['value'] /= value
-            case "%=": self.variables[name]['value'] %= value
-            case "^=": self.variables[name]['value'] **= value
-            case "/+=": self.variables[name]['value'] = math.floor((self.variables[name]['value'] + value).value)
-            case "/-=": self.variables[name]['value'] = math.floor((self.variables[name]['value'] - value).value)
-            case "/*=": self.variables[name]['value'] = math.floor((self.variables[name]['value'] * value).value)
-            case "//=": self.variables[name]['value'] //= value
-            case "/^=": self.variables[name]['value'] = math.floor((self.variables[name]['value'] ** value).value)
-            case "/%=": self.variables[name]['value'] = math.floor((self.variables[name]['value'] % value).value)
-            case "^+=": self.variables[name]['value'] = math.ceil((self.variables[name]['value'] + value).value)
-            case "^-=": self.variables[name]['value'] = math.ceil((self.variables[name]['value'] - value).value)
-            case "^*=": self.variables[name]['value'] = math.ceil((self.variables[name]['value'] * value).value)
-            case "^/=": self.variables[name]['value'] = math.ceil((self.variables[name]['value'] / value).value)
-            case "^^=": self.variables[name]['value'] = math.ceil((self.variables[name]['value'] ** value).value)
-            case "~%=": self.variables[name]['value'] = math.ceil((self.variables[name]['value'] % value).value)
-            case "~+=": self.variables[name]['value'] = round((self.variables[name]['value'] + value).value)
-            case "~-=": self.variables[name]['value'] = round((self.variables[name]['value'] - value).value)
-            case "~*=": self.variables[name]['value'] = round((self.variables[name]['value'] * value).value)
-            case "~/=": self.variables[name]['value'] = round((self.variables[name]['value'] / value).value)
-            case "~^=": self.variables[name]['value'] = round((self.variables[name]['value'] ** value).value)
-            case "~%=": self.variables[name]['value'] = round((self.variables[name]['value'] % value).value)
-            case _: raise UnknownSpellError(op)
-        self.variables[name]['value'] = wrap_primitive(self.variables[name]['value'])
-        self.variables[name]['type'] = self.variables[name]['value'].type_name
-            
+        elif rune.value.__class__ not in types:
+            raise CarelessSpellError(f"'{rune.type}' runes cannot be written in place.")
+        return rune.value
+    
+    def store_index(self, name, index, value):
+        collection = self.writable_collection(name, ScrollTome, ScrollGrimoire)
+        if collection.__class__ is ScrollGrimoire:
+            collection.store(wrap_primitive(index), wrap_primitive(value))
+        else:
+            try:
+                collection.store(index.value, wrap_primitive(value))
+            except IndexError:
+                raise MissingPageError(name, index)
+            except TypeError:
+                raise CarelessSpellError(f"'{collection.type_name}'::{index.type_name} is an invalid incantation.")
+    
+    def append_rune(self, name, value):
+        tome = self.writable_collection(name, ScrollTome)
+        tome.append(wrap_primitive(value))
+    
+    def dispel_entry(self, name, index):
+        collection = self.writable_collection(name, ScrollTome, ScrollGrimoire)
+        if collection.__class__ is ScrollGrimoire:
+            key = wrap_primitive(index)
+            self.lookup_entry(name, collection, key)
+            del collection.value[key]
+        else:
+            try:
+                collection.remove(index.value)
+            except IndexError:
+                raise MissingPageError(name, index)
+            except TypeError:
+                raise CarelessSpellError(f"'{collection.type_name}'::{index.type_name} is an invalid incantation.")
+    
+    def cast_value(self, value, target_type):
+        value = wrap_primitive(value)
+        try:
+            return value.cast_to(target_type)
+        except Exception:
+            raise TransmutationError(value.type_name, target_type)
     
     # ----- Functions ------
 
@@ -180,59 +364,101 @@ class ScrollScriptInterpreter:
             for param_node in params_tree.children:
                 params.append(self.execute(param_node))
 
-        if name in self.functions:
-            raise RuneAlreadyWrittenError(f"Function '{name}' already declared.")
-
-        self.functions[name] = {
-            "params": params,
-            "block": block
-        }
+        self.define_function(name, params, block)
     
     def func_call(self, tree):
         name = self.execute(tree.children[1])
         args_tree = tree.children[2] if len(tree.children) > 2 else None
-
-        if name not in self.functions:
-            raise UnknownSpellError(f"Function '{name}' not found.")
-
-        func_info = self.functions[name]
-        params = func_info["params"]
-        block = func_info["block"]
+        func_info = self.find_function(name)
 
         args = []
         if args_tree:
             for arg_node in args_tree.children:
                 args.append(self.execute(arg_node))
 
-        if len(args) != len(params):
-            raise CarelessSpellError(f"Function '{name}' expected {len(params)} arguments but got {len(args)}.")
+        return self.invoke(name, func_info, args)
+
+    def return_statement(self, tree):
+        value = None
+        if tree.children[1] is not None: # Check if an expression is present
+            value = self.execute(tree.children[1])
+        return Proclamation(value)
+    
+    def define_function(self, name, params, block):
+        if name in self.functions:
+            raise RuneAlreadyWrittenError(f"Function '{name}' already declared.")
 
-        original_variables = self.variables
-        self.variables = self.variables.copy()
+        self.functions[name] = {
+            "params": params,
+            "block": block
+        }
+    
+    def find_function(self, name):
+        if name not in self.functions:
+            raise UnknownSpellError(f"Function '{name}' not found.")
+        return self.functions[name]
+    
+    def invoke(self, name, func_info, args):
+        if name in self.pure:
+            return self.recall(name, func_info, args)
+        return self.run_incantation(name, func_info, args)
+    
+    def recall(self, name, func_info, args):
+        """Casts a pure incantation, reusing the value it proclaimed for the same arguments."""
+        memo = self.memo
+        key = memo.key(name, args, self.variables)
+        if key is None:
+            return self.run_incantation(name, func_info, args)
 
-        for i, param_name in enumerate(params):
-            self.variables[param_name] = {
-                "value": wrap_primitive(args[i]),
-                "type": type(wrap_primitive(args[i])).type_name,
-                "const": False,
-                "previous": None
-            }
+        value = memo.lookup(key)
+        if value is MISSING:
+            value = self.run_incantation(name, func_info, args)
+            memo.store(key, value)
+        return value
+    
+    def run_incantation(self, name, func_info, args):
+        self.enter_incantation(name, func_info, args)
 
-        return_value = None # Initialize return_value
         try:
-            self.execute(block)
-        except ReturnValue as e:
-            return_value = e.value # Store the value from the exception
+            signal = self.run_block(func_info["block"])
         finally:
-            self.variables = original_variables # Always restore variables
+            self.leave_incantation() # Always restore variables
 
-        return return_value
+        if signal.__class__ is Proclamation:
+            return signal.value
+        if signal is not None:
+            escape(signal)
+        return None
+    
+    def enter_incantation(self, name, func_info, args, tail=False):
+        params = func_info["params"]
 
-    def return_statement(self, tree):
-        value = None
-        if len(tree.children) > 1: # Check if an expression is present
-            value = self.execute(tree.children[1])
-        raise ReturnValue(value)
+        if len(args) != len(params):
+            raise CarelessSpellError(f"Function '{name}' expected {len(params)} arguments but got {len(args)}.")
+
+        # A tail cast shares the frame of the incantation it replaces, which
+        # restores the runes of both when the pair is left.
+        variables = self.variables
+        shadowed = self.frames[-1] if tail else {}
+        for param_name, value in zip(params, args):
+            value = wrap_primitive(value)
+            if param_name not in shadowed:
+                shadowed[param_name] = variables.get(param_name, UNWRITTEN)
+            variables[param_name] = Rune(value, type(value).type_name)
+
+        if not tail:
+            self.frames.append(shadowed)
+    
+    def leave_incantation(self):
+        variables = self.variables
+        for name, record in self.frames.pop().items():
+            if record is UNWRITTEN:
+                variables.pop(name, None)
+            else:
+                variables[name] = record
+    
+    def run_block(self, block):
+        return self.execute(block)
 
     def FUNC_CALL(self, token):
         return str(token.value)
@@ -245,71 +471,27 @@ class ScrollScriptInterpreter:
     
     def bin_expr_add(self, tree):
         left, op, right = list(map(self.execute, tree.children))
-        left, right = wrap_primitive(left), wrap_primitive(right)
-        
-        if not (is_number(left) and is_number(right)):
-            raise CarelessSpellError(f"'{left.type_name}' + '{right.type_name}' is an invalid incantation.")
-        
-        value = None
-        match op:
-            case "+": value = left + right
-            case "/+": value = math.floor((left + right).value)
-            case "^+": value = math.ceil((left + right).value)
-            case "~+": value = round((left + right).value)
-            case "-": value = left - right
-            case "/-": value = math.floor((left - right).value)
-            case "^-": value = math.ceil((left - right).value)
-            case "~-": value = round((left - right).value)
-            case _: raise UnknownSpellError(op)
-        return wrap_primitive(value)
+        return operators.add_values(resolve(ADD_OPERATORS, op), left, right)
     
     def bin_expr_mul(self, tree):
         left, op, right = list(map(self.execute, tree.children))
-        left, right = wrap_primitive(left), wrap_primitive(right)
-        
-        value = None
-        match op:
-            case "*": value = left * right
-            case "/*": value = math.floor((left * right).value)
-            case "^*": value = math.ceil((left * right).value)
-            case "~*": value = round((left * right).value)
-            case "/": value = left / right
-            case "//": value = left // right
-            case "^/": value = math.ceil((left / right).value)
-            case "~/": value = round((left / right).value)
-            case "%": value = left % right
-            case "/%": value = math.floor((left % right).value)
-            case "^%": value = math.ceil((left % right).value)
-            case "~%": value = round((left % right).value)
-            case _: value = UnknownSpellError(op)
-        return wrap_primitive(value)
+        return operators.mul_values(resolve(MUL_OPERATORS, op), left, right)
     
     def bin_expr_pow(self, tree):
         left, right = self.execute(tree.children[0]), self.execute(tree.children[1])
-        left, right = wrap_primitive(left), wrap_primitive(right)
-        return left ** right
+        return operators.pow_values(left, right)
     
     def bin_expr_or(self, tree):
         left, right = self.execute(tree.children[0]), self.execute(tree.children[2])
-        left, right = wrap_primitive(left), wrap_primitive(right)
-        return ScrollBool(left or right)
+        return operators.or_values(left, right)
     
     def bin_expr_and(self, tree):
         left, right = self.execute(tree.children[0]), self.execute(tree.children[2])
-        left, right = wrap_primitive(left), wrap_primitive(right)
-        return ScrollBool(left and right)
+        return operators.and_values(left, right)
     
     def bin_expr_comp(self, tree):
         left, op, right = list(map(self.execute, tree.children))
-        match op:
-            case "<": val = left < right
-            case ">": val = left > right
-            case "<=": val = left <= right
-            case ">=": val = left >= right
-            case "==": val = left == right
-            case "!=": val = left != right
-            case _: raise UnknownSpellError(op)
-        return ScrollBool(val)
+        return operators.compare_values(resolve(COMP_OPERATORS, op), left, right)
     
     def group_expr(self, tree):
         value = self.execute(tree.children[0])
@@ -317,54 +499,70 @@ class ScrollScriptInterpreter:
 
     def un_expr_negate(self, tree):
         value = self.execute(tree.children[0])
-        return -wrap_primitive(value)
+        return operators.negate_value(value)
     
     def un_expr_round(self, tree):
         op = self.execute(tree.children[0])
         value = self.execute(tree.children[1])
-        match op:
-            case "~": value = round(value.value)
-            case "/": value = math.floor(value.value)
-            case "^": value = math.ceil(value.value)
-            case _: raise UnknownSpellError(op)
-        return wrap_primitive(value)
+        return operators.round_value(resolve(ROUND_OPERATORS, op), value)
     
     def un_expr_not(self, tree):
         value = self.execute(tree.children[1])
-        return ScrollBool(not bool(wrap_primitive(value)))
+        return operators.not_value(value)
     
     def length_expr(self, tree):
         variable = self.execute(tree.children[1])
-        sz = len(variable)
-        return wrap_primitive(sz)
+        return operators.length_of(variable)
     
     def index_expr(self, tree):
         var_name = self.execute(tree.children[0])
         index = self.execute(tree.children[1])
-        var_value = self.variables[var_name]['value']
-        if not isinstance(var_value, ScrollString):
-            raise CarelessSpellError(f"'{var_value.type_name}'::{index.type_name} is an invalid incantation.")
-        return wrap_primitive(var_value[index.value])
+        return self.index_rune(var_name, index)
+    
+    def reduction(self, tree):
+        value = self.execute(tree.children[1])
+        return operators.reduce_values(str(tree.children[0]), value)
+    
+    
+    # ----- Collections ------
+    
+    def collection(self, tree):
+        return self.execute(tree.children[0])
+    
+    def array(self, tree):
+        contents = tree.children[1]
+        if contents is None:
+            return ScrollTome()
+        return ScrollTome([wrap_primitive(self.execute(node)) for node in contents.children])
+    
+    def grimoire(self, tree):
+        contents = tree.children[1]
+        if contents is None:
+            return ScrollGrimoire()
+        return ScrollGrimoire([
+            (wrap_primitive(self.execute(key)), wrap_primitive(self.execute(value)))
+            for key, value in (entry.children for entry in contents.children)
+        ])
     
     
     # ----- Control Flow ------
     
     def block(self, tree):
         for instruction in tree.children:
-            self.execute(instruction)
+            signal = self.execute(instruction)
+            if signal.__class__ in SIGNAL_TYPES:
+                return signal
     
     def if_statement(self, tree):
         i = 0
         while i < len(tree.children) and tree.children[i] is not None:
             if_type = self.execute(tree.children[i])
             if if_type == keywords.ELSE:
-                self.execute(tree.children[i+1])
-                break
+                return self.execute(tree.children[i+1])
             condition = self.execute(tree.children[i+1])
             if_block = tree.children[i+2]
             if condition:
-                self.execute(if_block)
-                break
+                return self.execute(if_block)
             i += 3
     
     def maybe_statement(self, tree):
@@ -376,37 +574,59 @@ class ScrollScriptInterpreter:
 
         block = tree.children[2]
         if random.uniform(0, 1) < ratio:
-            self.execute(block)
+            return self.execute(block)
     
     def ratio(self, tree):
         left, right = int(tree.children[0].value), int(tree.children[1].value)
-        if left < 0 or right < 0 or left + right == 0:
-            raise CarelessSpellError(f"'{left}' : '{right}' is an invalid incantation.")
-        return left / (left + right)
+        return operators.chance(left, right)
     
     def for_range(self, tree):
         var_name, var_type, start, stop, step = self.execute(tree.children[1])
 
-        self.variables[var_name] = {
-            "value": start,
-            "type": var_type,
-            "const": False,
-            "previous": None
-        }
+        self.bind_rune(var_name, start, var_type, False)
 
         block = tree.children[2]
 
-        while self.variables[var_name]['value'] <= stop:
+        if id(tree) in self.steady_loops:
+            return self.steady_range(var_name, block, ranges.range_steps(start, stop, step))
+
+        while self.variables[var_name].value <= stop:
+            # shatter and persist inside an incantation cast from the body
+            # still reach this loop as errors.
             try:
-                self.execute(block)
+                signal = self.execute(block)
             except ShatterError:
                 break
             except PersistenceError:
-                pass
-            self.variables[var_name]['previous'] = self.variables[var_name]['value']
-            self.variables[var_name]['value'] += step
+                signal = None
+            if signal is SHATTER:
+                break
+            if signal.__class__ is Proclamation:
+                return signal
+            rune = self.variables[var_name]
+            rune.previous = rune.value
+            rune.value += step
         
-        del self.variables[var_name]
+        self.unbind_rune(var_name)
+    
+    def steady_range(self, var_name, block, steps):
+        """Runs a counting cycle whose body cannot write its rune, drawing the rune's values from steps."""
+        rune = self.variables[var_name]
+        for value in steps:
+            try:
+                signal = self.execute(block)
+            except ShatterError:
+                break
+            except PersistenceError:
+                signal = None
+            if signal is SHATTER:
+                break
+            if signal.__class__ is Proclamation:
+                return signal
+            rune.previous = rune.value
+            rune.value = value
+
+        self.unbind_rune(var_name)
     
     def while_loop(self, tree):
         block = tree.children[3]
@@ -415,11 +635,15 @@ class ScrollScriptInterpreter:
             if expression:
                 break
             try:
-                self.execute(block)
+                signal = self.execute(block)
             except ShatterError:
                 break
             except PersistenceError:
-                pass
+                signal = None
+            if signal is SHATTER:
+                break
+            if signal.__class__ is Proclamation:
+                return signal
     
     def foreach_loop(self, tree):
         name = self.execute(tree.children[1])
@@ -428,38 +652,45 @@ class ScrollScriptInterpreter:
 
         if name in self.variables:
             raise RuneAlreadyWrittenError(name)
-        if len(expr) == 0:
+
+        # Items are only drawn from the collection as the loop reaches them.
+        items = iter(wrap_primitive(expr))
+        item = next(items, None)
+        if item is None:
             return
 
-        self.variables[name] = {
-            "value": None,
-            "type": expr[0].type_name,
-            "const": False,
-            "previous": None
-        }
+        self.bind_rune(name, None, item.type_name, False)
 
-        i = 0
-        while i < len(expr):
-            self.variables[name]['previous'] = self.variables[name]['value']
-            self.variables[name]['value'] = expr[i]
-            i += 1 
+        while item is not None:
+            rune = self.variables[name]
+            rune.previous = rune.value
+            rune.value = item
             
             try:
-                self.execute(block)
+                signal = self.execute(block)
             except ShatterError:
                 break
             except PersistenceError:
-                pass
+                signal = None
+            if signal is SHATTER:
+                break
+            if signal.__class__ is Proclamation:
+                return signal
+            item = next(items, None)
     
     def infinite_loop(self, tree):
         block = tree.children[3]
         while True:
             try:
-                self.execute(block)
+                signal = self.execute(block)
             except ShatterError:
                 break
             except PersistenceError:
-                pass
+                signal = None
+            if signal is SHATTER:
+                break
+            if signal.__class__ is Proclamation:
+                return signal
             
     
     def range_expression(self, tree):
@@ -469,12 +700,28 @@ class ScrollScriptInterpreter:
         stop = self.execute(tree.children[2])
         step = self.execute(tree.children[3]) if tree.children[3] is not None else 1
 
+        return self.range_bounds(name, start, stop, step)
+    
+    def range_value(self, tree):
+        start = self.execute(tree.children[0])
+        stop = self.execute(tree.children[1])
+        step = self.execute(tree.children[2]) if tree.children[2] is not None else 1
+        return ScrollRange(*self.check_bounds(start, stop, step))
+    
+    def input_stream(self, tree):
+        return ScrollStream(self.listen)
+    
+    def check_bounds(self, start, stop, step):
         start = wrap_primitive(start)
         stop = wrap_primitive(stop)
         step = wrap_primitive(step)
 
         if not is_number(start) or not is_number(stop) or not is_number(step):
             raise CarelessSpellError(f"'{start.type_name}' -> '{stop.type_name}' | '{step.type_name}' is an invalid incantation.")
+        return start, stop, step
+    
+    def range_bounds(self, name, start, stop, step):
+        start, stop, step = self.check_bounds(start, stop, step)
 
         var_type = 'float' if isinstance(start, ScrollFloat) or isinstance(stop, ScrollFloat) or isinstance(step, ScrollFloat) else 'int'
 
@@ -484,13 +731,13 @@ class ScrollScriptInterpreter:
         return name, var_type, start, stop, step
     
     def loop_interrupt(self, tree):
-        self.execute(tree.children[0])
+        return self.execute(tree.children[0])
     
     def BREAK(self, tree):
-        raise ShatterError()
+        return SHATTER
 
     def CONTINUE(self, tree):
-        raise PersistenceError()
+        return PERSIST
 
     def IF(self, token):
         return str(token.value)
@@ -515,12 +762,7 @@ class ScrollScriptInterpreter:
 
     def var_expr(self, tree):
         name = self.execute(tree.children[0])
-        name = str(name)
-        if name not in self.variables:
-            raise RuneNotWrittenError(name)
-        elif self.variables[name]['value'] is None:
-            raise DormantRuneError(name)
-        return self.variables[name]['value']
+        return self.read_rune(str(name))
     
     def var_name(self, tree):
         value = self.execute(tree.children[0])
@@ -534,15 +776,8 @@ class ScrollScriptInterpreter:
     
     def value_cast(self, tree):
         value = self.execute(tree.children[1])
-        value = wrap_primitive(value)
-        
         target_type = self.execute(tree.children[3])
-        target_type = str(target_type)
-
-        try:
-            return value.cast_to(target_type)
-        except Exception:
-            raise TransmutationError(value.type_name, target_type)
+        return self.cast_value(value, str(target_type))
     
     # ----- Data Types ------
     
@@ -556,9 +791,10 @@ class ScrollScriptInterpreter:
         return ScrollBool(str(token))
     
     def STRING(self, token):
-        raw = str(token)[1:-1]
-        unescaped = bytes(raw, "utf-8").decode("unicode_escape")
-        return ScrollString(str(unescaped))
+        return self.literals.string(str(token)[1:-1])
+    
+    def constant(self, tree):
+        return tree.children[0]
     
     def DATA_TYPE(self, token):
         return str(token.value)
@@ -588,52 +824,43 @@ class ScrollScriptInterpreter:
     
     def print_statement(self, tree):
         text = self.execute(tree.children[1])
-        print(str(text), end='')
+        self.reveal(text)
     
     def input_statement(self, tree):
-        return input()
+        return self.listen()
     
     def prompted_input(self, tree):
         text = self.execute(tree.children[1])
-        return input(str(text))
+        return self.listen(text)
+    
+    def reveal(self, text):
+        self.sink.write(str(text))
+    
+    def listen(self, prompt=None):
+        self.sink.flush()
+        return self.source.read_line(prompt)
 
 
     # ----- Features ------
     
     def interpolated_string(self, tree):
-        items = list(map(self.execute, tree.children[1:-1]))
-        result = "".join([str(part) for part in items])
-        return wrap_primitive(result)
-    
-    def interpolation_part(self, tree):
-        items = list(map(self.execute, tree.children))
-        if len(items) == 1 and isinstance(items[0], ScrollString):
-            return items[0]
-        else:
-            return items[1]
-
-    def INTERP_TEXT(self, token): 
-        raw = str(token)
-        unescaped = bytes(raw, "utf-8").decode("unicode_escape")
-        return ScrollString(str(unescaped))
-    
-    def INTERP_EXPR_START(self, _): 
-        pass
+        compiled = self.templates.get(id(tree))
+        if compiled is None:
+            compiled = self.compile_template(tree)
+        template, expressions = compiled
+        return template.fill([self.execute(expression) for expression in expressions])
     
-    def INTERP_EXPR_END(self, _): 
-        pass
+    def compile_template(self, tree):
+        parts = tree.children[1:-1]
+        expressions = [part.children[1] for part in parts if len(part.children) > 1]
+        return self.literals.template(parts), expressions
     
 
     # ----- Unique Features ------
     
     def previous(self, tree):
         name = self.execute(tree.children[0])
-        name = str(name)
-        if name not in self.variables:
-            raise RuneNotWrittenError(name)
-        elif self.variables[name]['previous'] is None:
-            raise NoPastError(name)
-        return self.variables[name]['previous']
+        return self.read_previous(str(name))
     
     def execute(self, node):
         method_name = node.type if isinstance(node, Token) else node.data
@@ -47,6 +47,13 @@ LENGTH = "measure"
 # ----- Collections -----
 ARRAY = "tome"
 DICT = "grimoire"
+APPEND = "inscribe"
+
+# ----- Reductions -----
+SUM = "tally"
+MIN = "least"
+MAX = "utmost"
+MEAN = "average"
 
 # ----- Unique Features -----
 FROM = "from"
@@ -0,0 +1,109 @@
+"""
+String literals and interpolated-string templates, decoded once per scroll.
+
+The text of a literal is written with escape sequences, so turning it into
+a string means decoding it. Each distinct literal is decoded the first
+time it is met and the same ScrollString is handed to every place it is
+written. An interpolated string becomes a template: its literal text with
+a slot for each expression, filled in a single pass of str.format.
+"""
+from sys import intern
+from utils import unescape
+from datatypes import ScrollString
+
+
+class Template:
+    """
+    An interpolated string, compiled to its constant text and the slots its expressions fill.
+
+    Args:
+        segments (tuple): The decoded text of each part of the string, or None for an expression.
+    """
+    __slots__ = ("text", "slots", "format", "tail", "constant")
+
+    def __init__(self, segments):
+        self.text = pattern(segments)
+        self.slots = segments.count(None)
+        self.format = self.text.format
+        self.constant = None if self.slots else ScrollString(intern("".join(segments)))
+
+        # A template starting with a string appends the rest to it, rather than copying it.
+        self.tail = None
+        if len(segments) > 1 and segments[0] is None:
+            self.tail = pattern(segments[1:]).format
+
+    def __repr__(self):
+        return f"<Template {self.text!r}>"
+
+    def fill(self, values):
+        """
+        Fills the template's slots.
+
+        Args:
+            values (list): The value of each expression, in order.
+
+        Returns:
+            ScrollString: The interpolated string.
+        """
+        if self.tail is not None:
+            first = values[0]
+            if first.__class__ is ScrollString:
+                return first.extended([self.tail(*values[1:])])
+        elif self.constant is not None:
+            return self.constant
+        return ScrollString(self.format(*values))
+
+def pattern(segments):
+    """The str.format pattern of a template's segments."""
+    return "".join("{}" if segment is None else segment.replace("{", "{{").replace("}", "}}") for segment in segments)
+
+
+class LiteralPool:
+    """The decoded string literals and templates of a scroll, each made once."""
+    def __init__(self):
+        self.strings = {}
+        self.interned = {}
+        self.templates = {}
+
+    def string(self, raw):
+        """
+        The value of a string literal.
+
+        Args:
+            raw (str): The literal as written, without its quotes.
+
+        Returns:
+            ScrollString: The decoded string, shared by every literal that decodes to the same text.
+        """
+        value = self.strings.get(raw)
+        if value is None:
+            text = intern(unescape(raw))
+            value = self.interned.get(text)
+            if value is None:
+                value = self.interned[text] = ScrollString(text)
+            self.strings[raw] = value
+        return value
+
+    def template(self, parts):
+        """
+        The template of an interpolated string.
+
+        Args:
+            parts (list): The interpolation_part nodes of the string.
+
+        Returns:
+            Template: The template, shared by every interpolated string written the same way.
+        """
+        segments = tuple(
+            self.string(str(part.children[0])).value if len(part.children) == 1 else None
+            for part in parts
+        )
+        template = self.templates.get(segments)
+        if template is None:
+            template = self.templates[segments] = Template(segments)
+        return template
+
+    def learn(self, tree):
+        """Decodes every string literal of a scroll ahead of running it."""
+        for token in tree.scan_values(lambda value: getattr(value, "type", None) == "STRING"):
+            self.string(str(token)[1:-1])
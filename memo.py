@@ -0,0 +1,194 @@
+"""
+Memoization of pure incantations.
+
+An incantation is pure when casting it can do nothing but compute a value
+from its arguments: it never reveals, listens or calls on mayhaps, it reads
+and writes no rune besides its own parameters and the runes it declares,
+its shatter and persist stay inside its own loops, and every incantation it
+casts is pure as well. The result of casting a pure incantation is cached
+per argument tuple, so a recursive incantation like fib only computes each
+value once.
+
+Runes are dynamically scoped, so declaring a rune inside an incantation
+fails if the caster already holds a rune of that name. A cached result is
+only used when none of the runes the incantation (or anything it casts)
+declares are written, so such a cast still fails as it always has.
+"""
+from collections import OrderedDict
+
+DEFAULT_MEMO_SIZE = 1024
+
+# Marks a cast whose result is not in the cache.
+MISSING = object()
+
+# Statements that make an incantation impure wherever they appear in its body.
+IMPURE_STATEMENTS = {
+    "print_statement", "input_statement", "prompted_input", "input_stream", "maybe_statement", "func_declaration"
+}
+
+LOOPS = {"for_range", "while_loop", "foreach_loop", "infinite_loop"}
+
+
+def rune_name(node):
+    return str(node.children[0])
+
+def find_pure_incantations(tree):
+    """
+    Finds the incantations of a scroll whose casts can be memoized.
+
+    Args:
+        tree (Tree): The parse tree of a whole scroll.
+
+    Returns:
+        dict: Maps the name of every pure incantation to the names of the runes
+            it, or any incantation it casts, declares.
+    """
+    declarations = {}
+    for node in tree.iter_subtrees():
+        if node.data == "func_declaration":
+            declarations.setdefault(rune_name(node.children[1]), []).append(node)
+
+    summaries = {}
+    for name, nodes in declarations.items():
+        # Which of several declarations is written first is only known at runtime.
+        if len(nodes) == 1:
+            summary = summarise(nodes[0])
+            if summary is not None:
+                summaries[name] = summary
+
+    # An incantation casting an impure one is impure too.
+    impure = True
+    while impure:
+        impure = [name for name, (_, callees) in summaries.items() if not callees <= summaries.keys()]
+        for name in impure:
+            del summaries[name]
+
+    pure = {}
+    for name in summaries:
+        declared = set()
+        seen = {name}
+        pending = [name]
+        while pending:
+            local_runes, callees = summaries[pending.pop()]
+            declared |= local_runes
+            pending += callees - seen
+            seen |= callees
+        pure[name] = tuple(sorted(declared))
+    return pure
+
+def summarise(declaration):
+    """
+    Collects the runes an incantation declares and the incantations it casts.
+
+    Args:
+        declaration (Tree): A func_declaration node.
+
+    Returns:
+        tuple: The set of runes declared in the body and the set of incantations
+            it casts, or None if the incantation is impure.
+    """
+    params_tree = declaration.children[2]
+    params = {rune_name(param) for param in params_tree.children} if params_tree else set()
+    declared = set()
+    used = set()
+    callees = set()
+
+    def scan(node, in_loop):
+        if node is None or not hasattr(node, "data"):
+            return True
+        data = node.data
+        if data in IMPURE_STATEMENTS:
+            return False
+        if data == "loop_interrupt" and not in_loop:
+            return False
+
+        children = node.children
+        if data in ("var_declaration", "const_declaration"):
+            declared.add(rune_name(children[-2]))
+        elif data == "range_expression":
+            declared.add(rune_name(children[0]))
+        elif data == "foreach_loop":
+            declared.add(rune_name(children[1]))
+        elif data in ("var_expr", "previous"):
+            used.add(str(children[0]))
+        elif data == "var_name":
+            used.add(rune_name(node))
+        elif data == "func_call":
+            callees.add(rune_name(children[1]))
+            children = children[2:]
+
+        in_loop = in_loop or data in LOOPS
+        return all(scan(child, in_loop) for child in children)
+
+    if not scan(declaration.children[-1], False):
+        return None
+    if not used <= params | declared:
+        return None
+    return declared - params, callees
+
+
+class IncantationCache:
+    """
+    A bounded, least recently used cache of the values pure incantations proclaimed.
+
+    Args:
+        size (int): The most results kept at once.
+    """
+    def __init__(self, size=DEFAULT_MEMO_SIZE):
+        self.size = size
+        self.pure = {}
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def learn(self, tree):
+        """Finds the pure incantations of the scroll about to be read."""
+        self.pure = find_pure_incantations(tree)
+        return self.pure
+
+    def key(self, name, args, variables):
+        """
+        The cache key for casting a pure incantation.
+
+        Args:
+            name (str): The name of the incantation.
+            args (list): The values it is cast with.
+            variables (dict): The runes currently written.
+
+        Returns:
+            tuple: The key, or None if this cast cannot use the cache.
+        """
+        for local_name in self.pure[name]:
+            if local_name in variables:
+                return None
+        key = (name, *[(arg.__class__, getattr(arg, "value", arg)) for arg in args])
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def lookup(self, key):
+        """Returns the cached result for a key, or MISSING."""
+        results = self.results
+        value = results.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            results.move_to_end(key)
+        return value
+
+    def store(self, key, value):
+        # A tome handed to every caster would be shared between them.
+        if getattr(value, "mutable", False):
+            return
+        results = self.results
+        results[key] = value
+        if len(results) > self.size:
+            results.popitem(last=False)
+
+    def report(self):
+        names = ", ".join(sorted(self.pure)) or "none"
+        return (f"Memoized incantations: {names}\n"
+                f"Hits: {self.hits}, misses: {self.misses}, cached: {len(self.results)}/{self.size}")
@@ -0,0 +1,188 @@
+"""
+Operator semantics shared by every ScrollScript engine.
+
+Each table maps an operator token to a function over already evaluated
+ScrollValues, so an engine can resolve an operator once and reuse it.
+"""
+import math
+from utils import is_number
+from datatypes import wrap_primitive, ScrollBool, ScrollInt, ScrollFloat, ScrollTome, SCROLL_TYPES, TRUTHSUNG, FALSEHOOD
+from exceptions import CarelessSpellError, UnknownSpellError
+import vectors
+
+# ----- Operator Tables ------
+
+ADD_OPERATORS = {
+    "+": lambda left, right: left + right,
+    "/+": lambda left, right: math.floor((left + right).value),
+    "^+": lambda left, right: math.ceil((left + right).value),
+    "~+": lambda left, right: round((left + right).value),
+    "-": lambda left, right: left - right,
+    "/-": lambda left, right: math.floor((left - right).value),
+    "^-": lambda left, right: math.ceil((left - right).value),
+    "~-": lambda left, right: round((left - right).value),
+}
+
+MUL_OPERATORS = {
+    "*": lambda left, right: left * right,
+    "/*": lambda left, right: math.floor((left * right).value),
+    "^*": lambda left, right: math.ceil((left * right).value),
+    "~*": lambda left, right: round((left * right).value),
+    "/": lambda left, right: left / right,
+    "//": lambda left, right: left // right,
+    "^/": lambda left, right: math.ceil((left / right).value),
+    "~/": lambda left, right: round((left / right).value),
+    "%": lambda left, right: left % right,
+    "/%": lambda left, right: math.floor((left % right).value),
+    "^%": lambda left, right: math.ceil((left % right).value),
+    "~%": lambda left, right: round((left % right).value),
+}
+
+def equal(left, right):
+    # A truth compared with anything else is compared by its value, so 1 == Truthsung
+    # holds in a scroll even though the two are different grimoire keys.
+    if left.__class__ is ScrollBool or right.__class__ is ScrollBool:
+        return wrap_primitive(left).value == wrap_primitive(right).value
+    return left == right
+
+def unequal(left, right):
+    return not equal(left, right)
+
+COMP_OPERATORS = {
+    "<": lambda left, right: left < right,
+    ">": lambda left, right: left > right,
+    "<=": lambda left, right: left <= right,
+    ">=": lambda left, right: left >= right,
+    "==": equal,
+    "!=": unequal,
+}
+
+ROUND_OPERATORS = {
+    "~": round,
+    "/": math.floor,
+    "^": math.ceil,
+}
+
+INCR_OPERATORS = {
+    "++": lambda current: current + 1,
+    "--": lambda current: current - 1,
+}
+
+# "^%=" has never been a valid spell, and "~%=" has always taken the ceiling.
+CMP_INCR_OPERATORS = {
+    "+=": lambda current, value: current + value,
+    "-=": lambda current, value: current - value,
+    "*=": lambda current, value: current * value,
+    "/=": lambda current, value: current / value,
+    "%=": lambda current, value: current % value,
+    "^=": lambda current, value: current ** value,
+    "/+=": lambda current, value: math.floor((current + value).value),
+    "/-=": lambda current, value: math.floor((current - value).value),
+    "/*=": lambda current, value: math.floor((current * value).value),
+    "//=": lambda current, value: current // value,
+    "/^=": lambda current, value: math.floor((current ** value).value),
+    "/%=": lambda current, value: math.floor((current % value).value),
+    "^+=": lambda current, value: math.ceil((current + value).value),
+    "^-=": lambda current, value: math.ceil((current - value).value),
+    "^*=": lambda current, value: math.ceil((current * value).value),
+    "^/=": lambda current, value: math.ceil((current / value).value),
+    "^^=": lambda current, value: math.ceil((current ** value).value),
+    "~%=": lambda current, value: math.ceil((current % value).value),
+    "~+=": lambda current, value: round((current + value).value),
+    "~-=": lambda current, value: round((current - value).value),
+    "~*=": lambda current, value: round((current * value).value),
+    "~/=": lambda current, value: round((current / value).value),
+    "~^=": lambda current, value: round((current ** value).value),
+}
+
+# The operator each operation was resolved from, so that tome arithmetic can find its kernel.
+SYMBOLS = {
+    operation: symbol
+    for table in (ADD_OPERATORS, MUL_OPERATORS, COMP_OPERATORS)
+    for symbol, operation in table.items()
+}
+
+
+def resolve(table, op):
+    """
+    Looks up the implementation of an operator.
+
+    Args:
+        table (dict): One of the operator tables above.
+        op (str): The operator token.
+
+    Returns:
+        callable: The function implementing the operator.
+    """
+    try:
+        return table[op]
+    except KeyError:
+        raise UnknownSpellError(op)
+
+
+# ----- Expression Semantics ------
+
+# Operands are nearly always ScrollValues already, so the functions below
+# only call wrap_primitive for the raw Python values (from listen, or from
+# the rounding operators) that actually need it.
+NUMBER_TYPES = (ScrollInt, ScrollFloat)
+
+def add_values(operation, left, right):
+    if left.__class__ not in NUMBER_TYPES or right.__class__ not in NUMBER_TYPES:
+        if left.__class__ is ScrollTome or right.__class__ is ScrollTome:
+            return vectors.elementwise(SYMBOLS[operation], lambda x, y: add_values(operation, x, y), left, right)
+        left, right = wrap_primitive(left), wrap_primitive(right)
+
+        if not (is_number(left) and is_number(right)):
+            raise CarelessSpellError(f"'{left.type_name}' + '{right.type_name}' is an invalid incantation.")
+
+    result = operation(left, right)
+    return result if result.__class__ in SCROLL_TYPES else wrap_primitive(result)
+
+def mul_values(operation, left, right):
+    if left.__class__ not in NUMBER_TYPES or right.__class__ not in NUMBER_TYPES:
+        if left.__class__ is ScrollTome or right.__class__ is ScrollTome:
+            return vectors.elementwise(SYMBOLS[operation], lambda x, y: mul_values(operation, x, y), left, right)
+        left, right = wrap_primitive(left), wrap_primitive(right)
+
+    result = operation(left, right)
+    return result if result.__class__ in SCROLL_TYPES else wrap_primitive(result)
+
+def pow_values(left, right):
+    if left.__class__ is ScrollTome or right.__class__ is ScrollTome:
+        return vectors.elementwise("^", pow_values, left, right)
+    left, right = wrap_primitive(left), wrap_primitive(right)
+    return left ** right
+
+def compare_values(operation, left, right):
+    if left.__class__ is ScrollTome or right.__class__ is ScrollTome:
+        return vectors.elementwise(SYMBOLS[operation], lambda x, y: compare_values(operation, x, y), left, right)
+    return TRUTHSUNG if operation(left, right) else FALSEHOOD
+
+def or_values(left, right):
+    left, right = wrap_primitive(left), wrap_primitive(right)
+    return ScrollBool(left or right)
+
+def and_values(left, right):
+    left, right = wrap_primitive(left), wrap_primitive(right)
+    return ScrollBool(left and right)
+
+def negate_value(value):
+    return -wrap_primitive(value)
+
+def round_value(operation, value):
+    return wrap_primitive(operation(value.value))
+
+def not_value(value):
+    return FALSEHOOD if wrap_primitive(value) else TRUTHSUNG
+
+def length_of(value):
+    return wrap_primitive(len(value))
+
+def reduce_values(keyword, value):
+    return vectors.reduce_tome(keyword, value)
+
+def chance(left, right):
+    if left < 0 or right < 0 or left + right == 0:
+        raise CarelessSpellError(f"'{left}' : '{right}' is an invalid incantation.")
+    return left / (left + right)
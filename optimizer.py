@@ -0,0 +1,223 @@
+"""
+An optional optimizing pass over ScrollScript parse trees.
+
+The optimizer rewrites the tree ahead of execution:
+
+* Expressions built only from literals are folded into `constant` nodes,
+  which hold the ScrollValue they evaluate to.
+* Reads of a sealed rune whose value is a constant are replaced by that
+  value, where the rune is certain to hold it.
+* Branches of `foretell` and `cycle (lest ...)` statements that can never
+  run are dropped, as are statements after a shatter, persist or proclaim
+  in the same block.
+
+Folding evaluates each expression with the tree-walking interpreter
+itself, so a folded value is exactly what the scroll would have computed.
+An expression that fails to evaluate, such as a division by zero, is left
+as it was and still raises at the point it would have run.
+"""
+from lark import Tree, Token
+import keywords
+from interpreter import ScrollScriptInterpreter
+from datatypes import ScrollString
+from exceptions import ScrollError
+
+LITERALS = {"INTEGER", "FLOAT", "BOOLEAN", "STRING"}
+
+# Expressions whose value depends on nothing but their operands.
+PURE_EXPRESSIONS = {
+    "bin_expr_add", "bin_expr_mul", "bin_expr_pow", "bin_expr_or", "bin_expr_and",
+    "bin_expr_comp", "group_expr", "un_expr_negate", "un_expr_round", "un_expr_not",
+    "length_expr", "value_cast",
+}
+
+# Statements that end their block unconditionally.
+INTERRUPTS = {"loop_interrupt", "return_statement"}
+
+
+def constant(value):
+    return Tree("constant", [value])
+
+def is_constant(node):
+    return isinstance(node, Tree) and node.data == "constant"
+
+def rune_name(node):
+    return str(node.children[0])
+
+
+class ScrollScriptOptimizer:
+    def __init__(self):
+        self.evaluator = ScrollScriptInterpreter()
+        self.sealed = {}
+        self.rebound = set()
+
+    def optimize(self, tree):
+        """
+        Optimizes a parsed scroll.
+
+        Args:
+            tree (Tree): The parse tree of a whole scroll.
+
+        Returns:
+            Tree: The optimized parse tree. The tree passed in is left untouched.
+        """
+        self.sealed = {}
+        self.rebound = self.rebound_runes(tree)
+
+        children = []
+        for node in tree.children:
+            if node.data == "func_declaration":
+                # An incantation may be cast before any sealed rune is written.
+                sealed, self.sealed = self.sealed, {}
+                children.append(self.visit(node))
+                self.sealed = sealed
+                continue
+
+            node = self.visit(node)
+            if node is not None:
+                children.append(node)
+                self.learn_sealed(node)
+        return Tree(tree.data, children, tree._meta)
+
+    def rebound_runes(self, tree):
+        """
+        Finds the runes written more than once, or written by anything but a declaration.
+
+        Args:
+            tree (Tree): The parse tree of a whole scroll.
+
+        Returns:
+            set: The names of runes whose binding may change while the scroll runs.
+        """
+        declared = set()
+        rebound = set()
+        for node in tree.iter_subtrees():
+            if node.data in ("var_declaration", "const_declaration"):
+                name = rune_name(node.children[-2])
+                if name in declared:
+                    rebound.add(name)
+                declared.add(name)
+            elif node.data == "deletion":
+                rebound.add(rune_name(node.children[1]))
+            elif node.data == "func_params":
+                rebound.update(rune_name(param) for param in node.children)
+            elif node.data == "range_expression":
+                rebound.add(rune_name(node.children[0]))
+            elif node.data == "foreach_loop":
+                rebound.add(rune_name(node.children[1]))
+        return rebound
+
+    def learn_sealed(self, node):
+        """Remembers a sealed rune written at the top level, once it holds a constant."""
+        if node.data != "const_declaration" or not is_constant(node.children[3]):
+            return
+        name = rune_name(node.children[2])
+        if name not in self.rebound:
+            self.sealed[name] = node.children[3]
+
+
+    # ----- Traversal ------
+
+    def visit(self, node):
+        if isinstance(node, Token):
+            return self.fold(node) if node.type in LITERALS else node
+        if node is None or is_constant(node) or node.data == "ratio":
+            return node
+
+        children = [self.visit(child) for child in node.children]
+        node = Tree(node.data, children, node._meta)
+
+        handler = getattr(self, node.data, None)
+        if handler is not None:
+            return handler(node)
+        if node.data in PURE_EXPRESSIONS and all(self.is_operand(child) for child in children):
+            return self.fold(node)
+        return node
+
+    def is_operand(self, child):
+        return child is None or isinstance(child, Token) or is_constant(child)
+
+    def fold(self, node):
+        """Evaluates a pure expression, keeping the node as it is if evaluation fails."""
+        try:
+            value = self.evaluator.execute(node)
+        except (ScrollError, ArithmeticError, ValueError, TypeError, IndexError):
+            return node
+        if value.__class__ is ScrollString:
+            # The tree may be read many times over, even at once, so a folded string
+            # has its pieces joined now and is never appended to in place.
+            value.value = value.value
+        return constant(value)
+
+    def truth(self, node):
+        """The truth of a constant condition, or None if it is unknown or cannot be decided without error."""
+        if not is_constant(node):
+            return None
+        try:
+            return bool(node.children[0])
+        except (ScrollError, ArithmeticError, ValueError, TypeError):
+            return None
+
+
+    # ----- Expressions ------
+
+    def interpolated_string(self, node):
+        parts = node.children[1:-1]
+        if all(len(part.children) == 1 or is_constant(part.children[1]) for part in parts):
+            return self.fold(node)
+        return node
+
+
+    # ----- Runes ------
+
+    def var_expr(self, node):
+        name = str(node.children[0])
+        if name in self.sealed:
+            return self.sealed[name]
+        return node
+
+
+    # ----- Control Flow ------
+
+    def block(self, node):
+        children = []
+        for child in node.children:
+            if child is None:
+                continue
+            children.append(child)
+            if child.data in INTERRUPTS:
+                break
+        return Tree("block", children, node._meta)
+
+    def if_statement(self, node):
+        children = node.children
+        branches = []
+        otherwise = None
+
+        i = 0
+        while i < len(children) and children[i] is not None:
+            if str(children[i]) == keywords.ELSE:
+                otherwise = children[i+1]
+                break
+
+            truth = self.truth(children[i+1])
+            if truth is True:
+                otherwise = children[i+2]
+                break
+            if truth is None:
+                branches.append((children[i+1], children[i+2]))
+            i += 3
+
+        if not branches:
+            return otherwise
+
+        kept = [Token("IF", keywords.IF), *branches[0]]
+        for condition, block in branches[1:]:
+            kept += [Token("ELIF", keywords.ELIF), condition, block]
+        kept += [Token("ELSE", keywords.ELSE), otherwise] if otherwise is not None else [None, None]
+        return Tree("if_statement", kept, node._meta)
+
+    def while_loop(self, node):
+        if self.truth(node.children[2]) is True:
+            return None
+        return node
@@ -1,20 +1,170 @@
+import os
+import glob
+import pickle
+import hashlib
+import threading
+import lark
 from lark import Lark
 from utils import load_file
 
+CACHE_DIR = "__scrollcache__"
+SCRIPT_CACHE_SUFFIX = ".sscc"
+SCRIPT_CACHE_MAGIC = b"SSCC1"
+
+# Setting this environment variable turns off every on-disk cache.
+NO_CACHE_ENV = "SCROLLSCRIPT_NO_CACHE"
+
+def cache_enabled(cache):
+    return cache and not os.environ.get(NO_CACHE_ENV)
+
+def digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def grammar_cache_path(grammar_path, grammar_version):
+    """
+    Finds where the parsing tables built from a grammar are cached.
+
+    The file name carries the grammar version, so editing the grammar or
+    upgrading Lark leads to a fresh cache file. Cache files left behind by
+    older grammars are removed.
+
+    Args:
+        grammar_path (str): The path the grammar was loaded from.
+        grammar_version (str): A hash of the grammar text and the Lark version.
+
+    Returns:
+        str: The path of the cache file, or None if the cache directory cannot be created.
+    """
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(grammar_path)), CACHE_DIR)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        return None
+
+    stem = os.path.splitext(os.path.basename(grammar_path))[0]
+    cache_path = os.path.join(cache_dir, f"{stem}-{grammar_version[:16]}.lalr")
+
+    for stale in glob.glob(os.path.join(cache_dir, f"{stem}-*.lalr")):
+        if stale != cache_path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    return cache_path
+
+def script_cache_path(program_path):
+    """
+    Finds where the parsed form of a scroll is cached.
+
+    Args:
+        program_path (str): The path to the .ssc scroll.
+
+    Returns:
+        str: The path of the .sscc file in the scroll's __scrollcache__ directory.
+    """
+    directory, name = os.path.split(os.path.abspath(program_path))
+    return os.path.join(directory, CACHE_DIR, os.path.splitext(name)[0] + SCRIPT_CACHE_SUFFIX)
+
+
 class ScrollScriptParser(Lark):
-    def __init__(self, grammar_path):
+    def __init__(self, grammar_path, cache=True):
         try:
             grammar = load_file(grammar_path)
+            if grammar is None:
+                raise FileNotFoundError(grammar_path)
         except Exception as e:
             raise RuntimeError(f"Failed to load grammar from {grammar_path}") from e
-        
-        super().__init__(grammar, parser="lalr")
-    
+
+        self.use_cache = cache_enabled(cache)
+        self.grammar_version = digest(grammar + lark.__version__)
+
+        cache_path = grammar_cache_path(grammar_path, self.grammar_version) if self.use_cache else None
+        super().__init__(grammar, parser="lalr", cache=cache_path or False)
+
     def parse(self, program_path):
+        program = self.load_program(program_path)
+        if not self.use_cache:
+            return super().parse(program)
+
+        header = self.cache_header(program)
+        tree = self.read_cache(program_path, header)
+        if tree is None:
+            tree = super().parse(program)
+            self.write_cache(program_path, header, tree)
+        return tree
+
+    def parse_source(self, program):
+        """
+        Parses the text of a scroll, without reading or writing any cache file.
+
+        Args:
+            program (str): The scroll's source.
+
+        Returns:
+            Tree: The scroll's parse tree.
+        """
+        return super().parse(program)
+
+    def precompile(self, program_path):
+        """
+        Parses a scroll and writes its .sscc cache file, whether or not one is already present.
+
+        Args:
+            program_path (str): The path to the .ssc scroll.
+
+        Returns:
+            bool: True if the cache file was written, False otherwise.
+        """
+        program = self.load_program(program_path)
+        tree = super().parse(program)
+        return self.write_cache(program_path, self.cache_header(program), tree)
+
+    def load_program(self, program_path):
         try:
             program = load_file(program_path)
+            if program is None:
+                raise FileNotFoundError(program_path)
         except Exception as e:
             raise RuntimeError(f"Failed to load program from {program_path}") from e
-        
-        return super().parse(program)
+        return program
+
+
+    # ----- Script Cache ------
 
+    def cache_header(self, program):
+        """The first line of a .sscc file, tying it to both the grammar and the exact source."""
+        return b" ".join([
+            SCRIPT_CACHE_MAGIC,
+            self.grammar_version.encode("ascii"),
+            digest(program).encode("ascii")
+        ]) + b"\n"
+
+    def read_cache(self, program_path, header):
+        try:
+            with open(script_cache_path(program_path), "rb") as file:
+                if file.readline() != header:
+                    return None
+                return pickle.load(file)
+        except Exception:
+            # A missing or damaged cache file just means parsing the scroll again.
+            return None
+
+    def write_cache(self, program_path, header, tree):
+        cache_path = script_cache_path(program_path)
+        # Threads of one process may write the same cache file, so each has its own temporary file.
+        temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(temp_path, "wb") as file:
+                file.write(header)
+                pickle.dump(tree, file, protocol=pickle.HIGHEST_PROTOCOL)
+            # Replacing the file in one step means readers never see half a cache.
+            os.replace(temp_path, cache_path)
+            return True
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
@@ -0,0 +1,226 @@
+"""
+Profiling of scrolls, by source line and by incantation.
+
+A scroll read with a profile is run by ProfilingInterpreter, a
+tree-walking interpreter that times every statement and every cast. The
+plain engines are untouched, so a scroll read without a profile pays
+nothing for it.
+
+Every statement is charged to the line it starts on, and every cast to
+the incantation cast. For each, the profile keeps how many times it ran,
+its self time (spent in it but not in a statement or cast nested inside
+it) and its inclusive time (spent in it and everything nested inside it,
+counted once however deeply it recurses). Memoization is left on, and a
+cast whose value is taken from the memo cache is counted as a call like
+any other, taking only the time of the lookup. A profile can be printed, or
+written for pstats and snakeviz, or for speedscope (https://speedscope.app).
+"""
+import json
+import marshal
+import os
+from time import perf_counter
+from lark import Token
+from utils import load_file
+from interpreter import ScrollScriptInterpreter
+from hooks import find_statements
+
+DEFAULT_REPORT_LIMIT = 20
+
+# Longest slice of a line's source kept in its name.
+SOURCE_WIDTH = 40
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+def first_line(node):
+    """The line a node starts on, from the first token in it, or 0 if it holds none."""
+    token = next(node.scan_values(lambda value: isinstance(value, Token)), None)
+    if token is None:
+        return 0
+    return token.line or 0
+
+
+class Profile:
+    """
+    The calls and times of the lines and incantations of a scroll.
+
+    Args:
+        program_path (str): The path to the scroll, used to name lines and incantations.
+    """
+    def __init__(self, program_path):
+        self.program_path = program_path
+        source = load_file(program_path)
+        self.source = source.splitlines() if source is not None else []
+
+        # Every line and incantation is a frame, numbered in the order it is first met.
+        self.frames = {}
+        self.labels = []
+        # Per frame: primitive (non-recursive) calls, calls, self time, inclusive time.
+        self.stats = []
+        self.active = []
+        # (caller, callee): the same four figures, for the callee cast from that caller alone.
+        self.callers = {}
+        # Self time of every distinct stack of frames.
+        self.stacks = {}
+
+        # Open frames: frame, start time, time spent in nested frames, the stack up to it.
+        self.open = []
+        self.incantation_lines = {}
+
+    def frame(self, line, name):
+        """The number of the frame for a line or incantation, making it if it is new."""
+        key = (line, name)
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.labels)
+            self.labels.append((self.program_path, line, name))
+            self.stats.append([0, 0, 0.0, 0.0])
+            self.active.append(0)
+        return index
+
+    def line_frame(self, line):
+        text = self.source[line - 1].strip() if 0 < line <= len(self.source) else ""
+        if len(text) > SOURCE_WIDTH:
+            text = text[:SOURCE_WIDTH - 3] + "..."
+        return self.frame(line, f"line {line}: {text}" if text else f"line {line}")
+
+    def incantation_frame(self, name):
+        return self.frame(self.incantation_lines.get(name, 0), f"incantation {name}")
+
+    def learn(self, tree):
+        """
+        Finds the statements of a scroll and the lines its incantations are declared on.
+
+        Returns:
+            dict: Maps the id of every statement node to the frame of its line.
+        """
+        for node in tree.iter_subtrees():
+            if node.data == "func_declaration":
+                self.incantation_lines[str(node.children[1].children[0])] = first_line(node)
+        return {id(statement): self.line_frame(first_line(statement)) for statement in find_statements(tree)}
+
+
+    # ----- Timing ------
+
+    def enter(self, index):
+        stack = self.open
+        path = stack[-1][3] + (index,) if stack else (index,)
+        stack.append([index, perf_counter(), 0.0, path])
+        self.active[index] += 1
+
+    def leave(self):
+        index, start, nested, path = self.open.pop()
+        elapsed = perf_counter() - start
+        own = elapsed - nested
+
+        self.active[index] -= 1
+        outermost = not self.active[index]
+        stats = self.stats[index]
+        stats[0] += outermost
+        stats[1] += 1
+        stats[2] += own
+        if outermost:
+            stats[3] += elapsed
+
+        if self.open:
+            parent = self.open[-1]
+            parent[2] += elapsed
+            edge = self.callers.get((parent[0], index))
+            if edge is None:
+                edge = self.callers[(parent[0], index)] = [0, 0, 0.0, 0.0]
+            edge[0] += outermost
+            edge[1] += 1
+            edge[2] += own
+            if outermost:
+                edge[3] += elapsed
+        self.stacks[path] = self.stacks.get(path, 0.0) + own
+
+    def total_time(self):
+        return sum(self.stacks.values())
+
+
+    # ----- Reports ------
+
+    def report(self, limit=DEFAULT_REPORT_LIMIT):
+        """The lines and incantations that took the most self time, as a table."""
+        order = sorted(range(len(self.labels)), key=lambda index: self.stats[index][2], reverse=True)
+        lines = [
+            f"Profile of {self.program_path}: {self.total_time():.3f}s",
+            f"{'calls':>10} {'self (s)':>10} {'incl (s)':>10}  where",
+        ]
+        for index in order[:limit]:
+            _, calls, own, inclusive = self.stats[index]
+            lines.append(f"{calls:>10} {own:>10.4f} {inclusive:>10.4f}  {self.labels[index][2]}")
+        return "\n".join(lines)
+
+    def write_pstats(self, path):
+        """Writes the profile in the format pstats.Stats loads, which snakeviz and gprof2dot also read."""
+        stats = {}
+        for index, label in enumerate(self.labels):
+            primitive, calls, own, inclusive = self.stats[index]
+            stats[label] = (primitive, calls, own, inclusive, {})
+        for (caller, callee), (primitive, calls, own, inclusive) in self.callers.items():
+            stats[self.labels[callee]][4][self.labels[caller]] = (primitive, calls, own, inclusive)
+        with open(path, "wb") as file:
+            marshal.dump(stats, file)
+
+    def write_speedscope(self, path):
+        """Writes the profile as a speedscope file, one weighted sample per distinct stack."""
+        name = os.path.basename(self.program_path)
+        document = {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "exporter": "scrollscript",
+            "name": name,
+            "activeProfileIndex": 0,
+            "shared": {
+                "frames": [{"name": label, "file": file, "line": line} for file, line, label in self.labels],
+            },
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.total_time(),
+                "samples": [list(path) for path in self.stacks],
+                "weights": list(self.stacks.values()),
+            }],
+        }
+        with open(path, "w") as file:
+            json.dump(document, file)
+
+
+class ProfilingInterpreter(ScrollScriptInterpreter):
+    """
+    A tree-walking interpreter that records every statement and cast in a profile.
+
+    Args:
+        profile (Profile): Where the calls and times are recorded.
+    """
+    def __init__(self, profile, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profile = profile
+        self.statements = {}
+
+    def start(self, tree):
+        self.statements = self.profile.learn(tree)
+        super().start(tree)
+
+    def execute(self, node):
+        index = self.statements.get(id(node))
+        if index is None:
+            return super().execute(node)
+
+        profile = self.profile
+        profile.enter(index)
+        try:
+            return super().execute(node)
+        finally:
+            profile.leave()
+
+    def invoke(self, name, func_info, args):
+        profile = self.profile
+        profile.enter(profile.incantation_frame(name))
+        try:
+            return super().invoke(name, func_info, args)
+        finally:
+            profile.leave()
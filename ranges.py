@@ -0,0 +1,82 @@
+"""
+Counting cycles whose rune only the cycle itself moves.
+
+A counting cycle re-reads its rune after every turn, compares it with the
+stop and adds the step to it, because the body may have written the rune
+in between. When nothing in the body can write the rune, the values it
+takes are known before the cycle starts. An int range with a positive step
+is then counted on a native range, and any other range by the same
+arithmetic the cycle would have done, with the rune set directly instead
+of being looked up again on every turn.
+"""
+from datatypes import ScrollInt
+
+# Statements that rebind a rune, with the position of its var_name among their children.
+REBINDING_STATEMENTS = {
+    "assignment": 0,
+    "simple_increment": 0,
+    "compound_increment": 0,
+    "deletion": 1,
+    "seal_statement": 1,
+}
+
+
+def written_runes(tree):
+    """The names of the runes any statement in a tree rebinds."""
+    names = set()
+    for node in tree.iter_subtrees():
+        position = REBINDING_STATEMENTS.get(node.data)
+        if position is not None:
+            names.add(str(node.children[position].children[0]))
+    return names
+
+def incantation_writes(tree):
+    """
+    The runes any incantation of a scroll rebinds.
+
+    Runes are dynamically scoped, so an incantation cast from a cycle's
+    body can write the cycle's rune as surely as the body itself.
+    """
+    names = set()
+    for node in tree.iter_subtrees():
+        if node.data == "func_declaration":
+            names |= written_runes(node.children[-1])
+    return names
+
+def is_steady(loop, incantation_writes):
+    """
+    Whether nothing in the body of a counting cycle can write its rune.
+
+    Args:
+        loop (Tree): A for_range node.
+        incantation_writes (set): The runes the scroll's incantations rebind.
+    """
+    name = str(loop.children[1].children[0].children[0])
+    body = loop.children[2]
+    if name in written_runes(body):
+        return False
+    if name in incantation_writes:
+        return not any(node.data == "func_call" for node in body.iter_subtrees())
+    return True
+
+def steady_loops(tree):
+    """The ids of the for_range nodes of a scroll whose rune is steady."""
+    writes = incantation_writes(tree)
+    return {id(node) for node in tree.iter_subtrees() if node.data == "for_range" and is_steady(node, writes)}
+
+def range_steps(start, stop, step):
+    """
+    The value a steady cycle's rune takes after each turn.
+
+    There is one value per turn, so the cycle runs once for every value
+    drawn, and the last is the value the rune would have gone past stop with.
+    """
+    if start.__class__ is ScrollInt and stop.__class__ is ScrollInt and step.__class__ is ScrollInt and step.value > 0:
+        step = step.value
+        return map(ScrollInt, range(start.value + step, stop.value + step + 1, step))
+    return counted_steps(start, stop, step)
+
+def counted_steps(current, stop, step):
+    while current <= stop:
+        current = current + step
+        yield current
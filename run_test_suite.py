@@ -1,10 +1,18 @@
 import traceback
-import sys
+import signal
+import time
 import os
 import io
 import random
 import glob
-from scrollscript import run_program
+import multiprocessing
+from argparse import ArgumentParser
+from parser import ScrollScriptParser
+from optimizer import ScrollScriptOptimizer
+from scrollscript import ENGINES, GRAMMAR_PATH
+from sinks import MemorySink
+from sources import BatchSource
+from vm import DEFAULT_MEMORY_LIMIT
 
 HEADER = '\033[95m'
 OKBLUE = '\033[94m'
@@ -12,69 +20,179 @@ OKGREEN = '\033[92m'
 FAIL = '\033[91m'
 ENDC = '\033[0m'
 
+DEFAULT_TIMEOUT = 30
+
+# How much longer than a test's own timeout the runner waits before giving up on its worker.
+TIMEOUT_GRACE = 5
+
+# Built once in every worker process by start_worker.
+parser = None
+
+class TestTimeout(BaseException):
+    """Raised in a worker when a test runs past its timeout. Not an Exception, so no scroll can catch it."""
+
 def main():
-    if len(sys.argv) < 2:
+    arg_parser = ArgumentParser(description="Run every scroll in a directory against its expected output.")
+    arg_parser.add_argument("path", nargs="?", help="directory of .ssc scrolls")
+    arg_parser.add_argument("--engine", choices=ENGINES, default="tree")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                            help="how many scrolls are run at once (default: one per CPU); 1 runs them in this process")
+    arg_parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, metavar="SECONDS",
+                            help="how long a scroll may run before it fails")
+    arg_parser.add_argument("-O", "--optimize", action="store_true",
+                            help="optimize every scroll before it is run")
+    arg_parser.add_argument("--memory-limit", type=int, default=DEFAULT_MEMORY_LIMIT // 2**20, metavar="MB",
+                            help="how much memory the vm engine's call stack may take")
+    args = arg_parser.parse_args()
+
+    if args.path is None:
         print("No directory provided.")
         return
-    
-    path = sys.argv[1]
-    test_files = sorted(glob.glob(f"{path}/*.ssc"))
-    max_len = max(len(f.split("\\")[-1].split(".")[0]) for f in test_files)
 
-    random.seed(42)
+    path = args.path
+    test_files = sorted(glob.glob(f"{path}/*.ssc"))
+    if not test_files:
+        print(f"No scrolls found in {path}.")
+        return
+    names = [os.path.splitext(os.path.basename(f))[0] for f in test_files]
+    max_len = max(len(name) for name in names)
 
     print(f"{HEADER}\n#--- Running Test Suite ---#\n{ENDC}")
-    
+
     passed = 0
     failed = 0
-    
-    for fpath in test_files:
-        fname = fpath.split("\\")[-1].split(".")[0]
-        print(fname.ljust(max_len), end="\t")
-        try:
-            if run_file(fpath):
-                print(OKGREEN + "Passed" + ENDC)
-                passed += 1
-            else:
-                print(FAIL + "Failed" + ENDC)
-                failed += 1
-        except Exception as e:
-            print(FAIL + f"Failed (error: {e})" + ENDC)
-    
+    start = time.perf_counter()
+
+    for name, (status, detail, duration) in zip(names, run_files(test_files, args.engine, args.jobs, args.timeout, args.optimize,
+                                                                        args.memory_limit * 2**20)):
+        print(name.ljust(max_len), end="\t")
+        if status == "passed":
+            print(OKGREEN + "Passed" + ENDC, end="")
+            passed += 1
+        elif status == "failed":
+            print(FAIL + "Failed" + ENDC, end="")
+            failed += 1
+        elif status == "timeout":
+            print(FAIL + f"Failed (timed out after {args.timeout:g}s)" + ENDC, end="")
+            failed += 1
+        else:
+            print(FAIL + f"Failed (error: {detail})" + ENDC, end="")
+            failed += 1
+        print(f"\t{duration:.2f}s" if duration is not None else "")
+
     print(f"{HEADER}\n\n#--- Summary ---#\n{ENDC}")
-    print(f"Total:\t{passed+failed}")
+    print(f"Total:\t{passed+failed}\t({time.perf_counter() - start:.2f}s)")
     print(f"{OKGREEN}Passed:\t{passed}")
     print(f"{FAIL}Failed:\t{failed}{ENDC}\n")
 
-def run_file(program_path):
+def run_files(test_files, engine="tree", jobs=1, timeout=DEFAULT_TIMEOUT, optimize=False,
+              memory_limit=DEFAULT_MEMORY_LIMIT):
+    """
+    Runs scrolls against their expected output, across a pool of worker processes.
+
+    Args:
+        test_files (list): The paths to the .ssc scrolls.
+        engine (str): The engine that reads the scrolls.
+        jobs (int): How many worker processes to run them on; 1 runs them in this process.
+        timeout (float): How many seconds each scroll may run.
+        optimize (bool): Whether the scrolls are optimized before they are run.
+        memory_limit (int): How many bytes the vm engine's call stack may take.
+
+    Yields:
+        tuple: For every scroll in order, its status ("passed", "failed", "timeout" or "error"),
+            the error if there was one, and how many seconds it ran, or None if it never finished.
+    """
+    if jobs <= 1:
+        start_worker()
+        for program_path in test_files:
+            yield run_test(program_path, engine, timeout, optimize, memory_limit)
+        return
+
+    pool = multiprocessing.Pool(min(jobs, len(test_files)), initializer=start_worker)
+    try:
+        pending = [pool.apply_async(run_test, (program_path, engine, timeout, optimize, memory_limit)) for program_path in test_files]
+        for result in pending:
+            try:
+                yield result.get(timeout + TIMEOUT_GRACE)
+            except multiprocessing.TimeoutError:
+                # The worker could not stop the scroll itself; it is killed with the pool at the end.
+                yield "timeout", None, None
+    finally:
+        pool.terminate()
+        pool.join()
+
+def start_worker():
+    """Builds the parser a worker process reads every scroll with."""
+    global parser
+    if parser is None:
+        parser = ScrollScriptParser(GRAMMAR_PATH)
+
+def run_test(program_path, engine="tree", timeout=DEFAULT_TIMEOUT, optimize=False, memory_limit=DEFAULT_MEMORY_LIMIT):
+    """Runs one scroll, catching whatever goes wrong, and reports how it went and how long it took."""
+    start = time.perf_counter()
+    try:
+        status = "passed" if run_file(program_path, engine, timeout, optimize, memory_limit) else "failed"
+        detail = None
+    except TestTimeout:
+        status, detail = "timeout", None
+    except Exception as e:
+        status, detail = "error", str(e)
+    return status, detail, time.perf_counter() - start
+
+def alarm(signum, frame):
+    raise TestTimeout()
+
+def run_file(program_path, engine="tree", timeout=None, optimize=False, memory_limit=DEFAULT_MEMORY_LIMIT):
+    """
+    Runs a scroll and checks what it reveals against its .out file.
 
-    # Capture printed output
-    captured_output = io.StringIO()
-    sys_stdout = sys.stdout
-    sys.stderr = io.StringIO()  # optional: capture stderr too
-    sys.stdout = captured_output
+    A scroll that fails passes if the expected output appears in its traceback.
+    The output is gathered by the interpreter's own sink, and listening reads
+    no input, so nothing global is touched and scrolls can run side by side.
 
+    Args:
+        program_path (str): The path to the .ssc scroll.
+        engine (str): The engine that reads it.
+        timeout (float): How many seconds it may run, or None for no limit.
+        optimize (bool): Whether it is optimized before it is run.
+        memory_limit (int): How many bytes the vm engine's call stack may take.
+
+    Returns:
+        bool: True if the scroll's output matches, False otherwise.
+    """
     expected_output_path = os.path.join(
         os.path.dirname(program_path),
         "output",
         os.path.basename(program_path).replace(".ssc", ".out")
     )
+    with open(expected_output_path) as f:
+        expected_output = f.read().strip()
 
-    try:
-        run_program(program_path)
-        sys.stdout = sys_stdout
-        actual_output = captured_output.getvalue().strip()
-
-        with open(expected_output_path) as f:
-            expected_output = f.read().strip()
-
-        return actual_output == expected_output
+    start_worker()
+    # Every scroll draws the same chances, however the scrolls are spread across workers.
+    random.seed(42)
+    sink = MemorySink()
+    if engine == "vm":
+        interpreter = ENGINES["vm"](memory_limit=memory_limit, sink=sink, source=BatchSource(io.StringIO()))
+    else:
+        interpreter = ENGINES[engine](sink=sink, source=BatchSource(io.StringIO()))
 
-    except Exception as e:
-        sys.stdout = sys_stdout
-        full_trace = traceback.format_exc()
-        with open(expected_output_path) as f:
-            expected_output = f.read().strip()
-        return expected_output in full_trace
+    # Scrolls are stopped by an interval timer where the platform has one.
+    timed = timeout is not None and hasattr(signal, "setitimer")
+    if timed:
+        previous = signal.signal(signal.SIGALRM, alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        tree = parser.parse(program_path)
+        if optimize:
+            tree = ScrollScriptOptimizer().optimize(tree)
+        interpreter.start(tree)
+        return sink.getvalue().strip() == expected_output
+    except Exception:
+        return expected_output in traceback.format_exc()
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
 
-if __name__ == '__main__': main()
\ No newline at end of file
+if __name__ == '__main__': main()
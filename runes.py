@@ -0,0 +1,25 @@
+"""
+The record kept for every rune a scroll writes.
+"""
+
+
+class Rune:
+    """
+    A rune's current value, its type, whether it is sealed, and the value it
+    held before its last assignment.
+
+    Runes are read and updated on nearly every instruction, so the record
+    is slotted: its fields are fixed attribute offsets rather than string
+    keys of a per-rune dict.
+    """
+    __slots__ = ("value", "type", "const", "previous")
+
+    def __init__(self, value, var_type, const=False, previous=None):
+        self.value = value
+        self.type = var_type
+        self.const = const
+        self.previous = previous
+
+    def __repr__(self):
+        sealed = "sealed " if self.const else ""
+        return f"<{sealed}Rune {self.type}: {self.value!r}>"
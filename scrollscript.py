@@ -1,23 +1,155 @@
-from sys import argv
+import os
+import sys
+import glob
+from argparse import ArgumentParser
 from interpreter import ScrollScriptInterpreter
+from closures import CompiledInterpreter
+from vm import ScrollScriptVM, DEFAULT_MEMORY_LIMIT
+from bytecode import BytecodeCompiler, disassemble
 from parser import ScrollScriptParser
+from optimizer import ScrollScriptOptimizer
+from memo import DEFAULT_MEMO_SIZE
+from profiler import Profile, ProfilingInterpreter
+from sinks import OutputSink, FileSink, DEFAULT_BUFFER_SIZE, FLUSH_POLICIES
+from sources import InteractiveSource, BatchSource
 
 GRAMMAR_PATH = "ScrollScript.gmr"
 
-def run_program(program_path):
-    parser = ScrollScriptParser(GRAMMAR_PATH)
+ENGINES = {
+    "tree": ScrollScriptInterpreter,
+    "closure": CompiledInterpreter,
+    "vm": ScrollScriptVM,
+}
+
+def run_program(program_path, engine="tree", cache=True, optimize=False,
+                memo_size=DEFAULT_MEMO_SIZE, memo_stats=False, memory_limit=DEFAULT_MEMORY_LIMIT, sink=None, source=None,
+                profile=None):
+    parser = ScrollScriptParser(GRAMMAR_PATH, cache)
+    parse_tree = parser.parse(program_path)
+    if optimize:
+        parse_tree = ScrollScriptOptimizer().optimize(parse_tree)
+    if profile is not None:
+        interpret = ProfilingInterpreter(profile, memo_size, sink=sink, source=source)
+    elif engine == "vm":
+        interpret = ScrollScriptVM(memo_size, memory_limit, sink=sink, source=source)
+    else:
+        interpret = ENGINES[engine](memo_size, sink=sink, source=source)
+    try:
+        interpret.start(parse_tree)
+    finally:
+        if memo_stats and interpret.memo is not None:
+            print(interpret.memo.report(), file=sys.stderr)
+
+def disassemble_program(program_path, cache=True, optimize=False):
+    parser = ScrollScriptParser(GRAMMAR_PATH, cache)
     parse_tree = parser.parse(program_path)
-    interpret = ScrollScriptInterpreter()
-    interpret.start(parse_tree)
+    if optimize:
+        parse_tree = ScrollScriptOptimizer().optimize(parse_tree)
+    print(disassemble(BytecodeCompiler().compile_program(parse_tree)))
+
+def precompile_directory(directory):
+    """
+    Writes the .sscc cache file of every scroll in a directory tree.
+
+    Args:
+        directory (str): The directory to search for .ssc scrolls.
+
+    Returns:
+        bool: True if every scroll was compiled, False otherwise.
+    """
+    parser = ScrollScriptParser(GRAMMAR_PATH)
+    success = True
+    for program_path in sorted(glob.glob(os.path.join(directory, "**", "*.ssc"), recursive=True)):
+        print(f"Compiling {program_path}")
+        try:
+            if not parser.precompile(program_path):
+                print(f"*** Could not write the cache for {program_path}")
+                success = False
+        except Exception as e:
+            print(f"*** {e.__class__.__name__}: {e}")
+            success = False
+    return success
 
 def main():
-    
-    if len(argv) < 2:
+    arg_parser = ArgumentParser(description="Read aloud a ScrollScript scroll.")
+    arg_parser.add_argument("program", nargs="?", help="path to the .ssc scroll")
+    arg_parser.add_argument("--engine", choices=ENGINES, default="tree",
+                            help="how the scroll is executed: walk the parse tree, compile it to closures, or run it as bytecode")
+    arg_parser.add_argument("--disassemble", action="store_true",
+                            help="print the scroll's bytecode instead of running it")
+    arg_parser.add_argument("--memory-limit", type=int, default=DEFAULT_MEMORY_LIMIT // 2**20, metavar="MB",
+                            help="how much memory the vm engine's call stack may take before casting fails")
+    arg_parser.add_argument("-O", "--optimize", action="store_true",
+                            help="fold constants and drop dead branches before running the scroll")
+    arg_parser.add_argument("--output", metavar="FILE",
+                            help="write what the scroll reveals to FILE instead of stdout")
+    arg_parser.add_argument("--buffer-size", type=int, default=DEFAULT_BUFFER_SIZE, metavar="N",
+                            help="how many characters of output are gathered before they are written")
+    arg_parser.add_argument("--flush", choices=FLUSH_POLICIES,
+                            help="when output is written: once the buffer is full, after every line, or after every reveal "
+                                 "(default: line when writing to a terminal, size otherwise)")
+    arg_parser.add_argument("--batch", action="store_true",
+                            help="read stdin in large blocks for listen, without showing prompts")
+    arg_parser.add_argument("--input", metavar="FILE",
+                            help="listen to the lines of FILE instead of stdin (implies --batch)")
+    arg_parser.add_argument("--memo-size", type=int, default=DEFAULT_MEMO_SIZE, metavar="N",
+                            help="how many results of pure incantations to remember; 0 turns memoization off")
+    arg_parser.add_argument("--memo-stats", action="store_true",
+                            help="report memoization hits and misses once the scroll ends")
+    arg_parser.add_argument("--profile", action="store_true",
+                            help="time every line and incantation with the tree engine, and report where the time went")
+    arg_parser.add_argument("--profile-pstats", metavar="FILE",
+                            help="write the profile to FILE for pstats or snakeviz (implies --profile)")
+    arg_parser.add_argument("--profile-speedscope", metavar="FILE",
+                            help="write the profile to FILE as speedscope JSON (implies --profile)")
+    arg_parser.add_argument("--no-cache", dest="cache", action="store_false",
+                            help="neither read nor write the __scrollcache__ files")
+    arg_parser.add_argument("--precompile", metavar="DIRECTORY",
+                            help="parse every scroll under DIRECTORY into __scrollcache__ ahead of time")
+    args = arg_parser.parse_args()
+
+    if args.precompile is not None:
+        if not precompile_directory(args.precompile):
+            sys.exit(1)
+        return
+
+    if args.program is None:
         print("The ancient scrolls were not provided.")
+        return
     
-    program_path = argv[1]
-    
-    run_program(program_path)
+    if args.disassemble:
+        disassemble_program(args.program, args.cache, args.optimize)
+        return
+
+    profile = None
+    if args.profile or args.profile_pstats or args.profile_speedscope:
+        if args.engine != "tree":
+            arg_parser.error("--profile reads the scroll with the tree engine")
+        profile = Profile(args.program)
+
+    if args.output is not None:
+        sink = FileSink(args.output, args.buffer_size, args.flush or "size")
+    else:
+        sink = OutputSink(None, args.buffer_size, args.flush or ("line" if sys.stdout.isatty() else "size"))
+    if args.input is not None:
+        source = BatchSource.from_file(args.input)
+    elif args.batch:
+        source = BatchSource()
+    else:
+        source = InteractiveSource()
+
+    try:
+        run_program(args.program, args.engine, args.cache, args.optimize, args.memo_size, args.memo_stats,
+                    args.memory_limit * 2**20, sink, source, profile)
+    finally:
+        sink.close()
+        source.close()
+        if profile is not None:
+            print(profile.report(), file=sys.stderr)
+            if args.profile_pstats:
+                profile.write_pstats(args.profile_pstats)
+            if args.profile_speedscope:
+                profile.write_speedscope(args.profile_speedscope)
 
 
-if __name__ == '__main__': main()
\ No newline at end of file
+if __name__ == '__main__': main()
@@ -0,0 +1,53 @@
+"""
+Completion signals for statements that leave a block early.
+
+Executing a statement normally completes with None. shatter, persist and
+proclaim instead complete with one of the signals below, which every
+enclosing block hands back to its caller until a loop or an incantation
+consumes it. Raising an exception for each of these was far slower,
+since it unwound the Python stack on every persist and every return.
+"""
+from exceptions import ShatterError, PersistenceError, ReturnValue
+
+
+class Signal:
+    __slots__ = ()
+
+
+class LoopSignal(Signal):
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+    def __repr__(self):
+        return f"<LoopSignal: {self.error.__name__}>"
+
+
+class Proclamation(Signal):
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+SHATTER = LoopSignal(ShatterError)
+PERSIST = LoopSignal(PersistenceError)
+
+SIGNAL_TYPES = (LoopSignal, Proclamation)
+
+
+def escape(signal):
+    """
+    Raises the error for a signal that reached a point where it cannot be consumed.
+
+    Outside of any loop, shatter and persist raise the errors they always
+    have. A loop signal escaping an incantation is raised too, so that it
+    still reaches the loop around the cast as it used to.
+
+    Args:
+        signal (Signal): The signal that could not be consumed.
+    """
+    if signal.__class__ is Proclamation:
+        raise ReturnValue(signal.value)
+    raise signal.error()
@@ -0,0 +1,107 @@
+"""
+Output sinks for reveal.
+
+Writing every reveal straight to stdout costs a write call apiece, which
+dominates scrolls that reveal inside loops. An interpreter instead hands
+revealed text to its sink, which gathers it and writes it out in larger
+pieces. Whatever a sink still holds is flushed before the scroll listens
+for input, and when the scroll ends, whether it succeeded or failed.
+"""
+import sys
+
+DEFAULT_BUFFER_SIZE = 8192
+
+# When a sink writes out what it has gathered.
+FLUSH_POLICIES = (
+    "size",     # once the buffer holds buffer_size characters
+    "line",     # after every reveal containing a newline, or once the buffer is full
+    "always",   # after every reveal
+)
+
+
+class OutputSink:
+    """
+    Buffers revealed text on its way to a stream.
+
+    Args:
+        stream (TextIO): Where the text is written. By default, whatever
+            sys.stdout is at the time of writing.
+        buffer_size (int): How many characters are gathered before they are
+            written under the "size" and "line" policies.
+        flush_policy (str): One of FLUSH_POLICIES.
+    """
+    def __init__(self, stream=None, buffer_size=DEFAULT_BUFFER_SIZE, flush_policy="size"):
+        if flush_policy not in FLUSH_POLICIES:
+            raise ValueError(f"Unknown flush policy '{flush_policy}'.")
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.flush_policy = flush_policy
+        self.parts = []
+        self.size = 0
+
+        if flush_policy == "always":
+            self.write = self.write_through
+        elif flush_policy == "line":
+            self.write = self.write_line
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def write_line(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if "\n" in text or self.size >= self.buffer_size:
+            self.flush()
+
+    def write_through(self, text):
+        self.parts.append(text)
+        self.flush()
+
+    def flush(self):
+        """Writes out everything gathered so far."""
+        if self.parts:
+            stream = self.stream or sys.stdout
+            stream.write("".join(self.parts))
+            stream.flush()
+            self.parts.clear()
+            self.size = 0
+
+    def close(self):
+        self.flush()
+
+
+class FileSink(OutputSink):
+    """
+    Writes revealed text straight to a file.
+
+    Args:
+        path (str): The file to write. It is replaced if it exists.
+        buffer_size (int): How many characters are gathered before they are written.
+        flush_policy (str): One of FLUSH_POLICIES.
+    """
+    def __init__(self, path, buffer_size=DEFAULT_BUFFER_SIZE, flush_policy="size"):
+        super().__init__(open(path, "w", encoding="utf-8"), buffer_size, flush_policy)
+
+    def close(self):
+        self.flush()
+        self.stream.close()
+
+
+class MemorySink(OutputSink):
+    """Keeps everything revealed in memory, to be read back with getvalue()."""
+
+    def __init__(self):
+        super().__init__()
+        self.write = self.parts.append
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return "".join(self.parts)
+
+    def clear(self):
+        self.parts.clear()
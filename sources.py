@@ -0,0 +1,77 @@
+"""
+Input sources for listen.
+
+By default listen asks for each line with input(), echoing its prompt.
+When a scroll is fed from a pipe or a file, a BatchSource reads the input
+in large blocks instead and serves every listen from the lines it has
+already read. Prompts are not shown in that mode, since nobody is there
+to read them.
+"""
+import sys
+from exceptions import SilenceError
+
+DEFAULT_BLOCK_SIZE = 65536
+
+
+class InteractiveSource:
+    """Reads each line as it is asked for, showing the prompt first."""
+
+    def read_line(self, prompt=None):
+        if prompt is None:
+            return input()
+        return input(str(prompt))
+
+    def close(self):
+        pass
+
+
+class BatchSource:
+    """
+    Reads input in blocks and serves it one line at a time.
+
+    Args:
+        stream (TextIO): Where input is read from. By default, whatever
+            sys.stdin is at the time of reading.
+        block_size (int): How many characters are read at once.
+    """
+    def __init__(self, stream=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.stream = stream
+        self.block_size = block_size
+        self.lines = []
+        self.position = 0
+        self.partial = ""
+        self.exhausted = False
+
+    @classmethod
+    def from_file(cls, path, block_size=DEFAULT_BLOCK_SIZE):
+        return cls(open(path, encoding="utf-8"), block_size)
+
+    def read_line(self, prompt=None):
+        while self.position >= len(self.lines):
+            if not self.fill():
+                raise SilenceError()
+        line = self.lines[self.position]
+        self.position += 1
+        return line
+
+    def fill(self):
+        """Reads the next block into the line buffer, returning False once input has run out."""
+        if self.exhausted:
+            return False
+
+        block = (self.stream or sys.stdin).read(self.block_size)
+        if not block:
+            self.exhausted = True
+            if not self.partial:
+                return False
+            self.lines, self.partial = [self.partial], ""
+        else:
+            lines = (self.partial + block).split("\n")
+            self.partial = lines.pop()
+            self.lines = lines
+        self.position = 0
+        return True
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
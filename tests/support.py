@@ -0,0 +1,72 @@
+"""Helpers shared by the tests of ScrollScript's Python modules."""
+import io
+import os
+import sys
+from unittest import mock
+from parser import ScrollScriptParser
+from embedding import DEFAULT_GRAMMAR_PATH
+import scrollscript
+from scrollscript import ENGINES
+from sinks import MemorySink
+from sources import BatchSource
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Built the first time a test parses a scroll.
+parser = None
+
+def parse(program):
+    """The parse tree of a scroll's source."""
+    global parser
+    if parser is None:
+        parser = ScrollScriptParser(DEFAULT_GRAMMAR_PATH)
+    return parser.parse_source(program)
+
+def run(program, engine="tree", input="", **options):
+    """
+    Reads a scroll on a fresh interpreter, gathering what it reveals.
+
+    Returns:
+        ScrollScriptInterpreter: The interpreter, once the scroll has ended. What the
+            scroll revealed is in interpreter.sink.getvalue().
+    """
+    interpreter = ENGINES[engine](sink=MemorySink(), source=BatchSource(io.StringIO(input)), **options)
+    interpreter.start(parse(program))
+    return interpreter
+
+
+class RecordingStream(io.StringIO):
+    """A text stream that remembers every piece of text written to it, one write at a time."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+        return super().write(text)
+
+
+def run_cli(*args, stdin="", stdout=None):
+    """
+    Runs scrollscript.py's main with the given command line arguments, from the repository root.
+
+    Args:
+        stdin (str): What the scroll reads from stdin.
+        stdout (RecordingStream): Where stdout is gathered, for callers expecting main to raise.
+
+    Returns:
+        RecordingStream: Everything written to stdout, one write at a time.
+    """
+    if stdout is None:
+        stdout = RecordingStream()
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        with mock.patch.object(sys, "argv", ["scrollscript.py", *args]), \
+             mock.patch.object(sys, "stdout", stdout), \
+             mock.patch.object(sys, "stdin", io.StringIO(stdin)):
+            scrollscript.main()
+    finally:
+        os.chdir(cwd)
+    return stdout
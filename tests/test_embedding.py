@@ -0,0 +1,184 @@
+import os
+import tempfile
+import threading
+import unittest
+from datatypes import ScrollInt, ScrollString
+from embedding import ScrollScriptEngine
+from exceptions import SilenceError, RuneNotWrittenError, UnknownSpellError
+from optimizer import ScrollScriptOptimizer
+from scrollscript import ENGINES
+from tests.support import ROOT, parse
+
+# The sealed rune's string is folded into the tree, and every read appends to it.
+FOLDED_APPENDS = """
+sealed rune root = "abra";
+sealed rune spell = $"{root}ca";
+rune words = "";
+cycle (i 1 -> 200) {
+    rune word = $"{spell}{i % 10}";
+    words = $"{words}{word}";
+    dispel word;
+}
+reveal measure words;
+"""
+
+
+class TreeCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.program_path = os.path.join(self.directory.name, "scroll.ssc")
+
+    def write(self, program):
+        with open(self.program_path, "w", encoding="utf-8") as file:
+            file.write(program)
+
+    def test_file_is_parsed_and_optimized_once(self):
+        self.write('reveal 6 * 7;')
+        engine = ScrollScriptEngine(optimize=True)
+        tree = engine.parse_file(self.program_path)
+        self.assertIs(engine.parse_file(self.program_path), tree)
+        self.assertEqual(engine.run_file(self.program_path).output, "42")
+        self.assertEqual(list(tree.find_data("constant"))[0].children[0].value, 42)
+
+    def test_changed_file_is_parsed_again(self):
+        engine = ScrollScriptEngine(optimize=True)
+        self.write('reveal 6 * 7;')
+        self.assertEqual(engine.run_file(self.program_path).output, "42")
+        self.write('reveal 6 * 70;')
+        self.assertEqual(engine.run_file(self.program_path).output, "420")
+
+    def test_folded_strings_are_joined(self):
+        tree = ScrollScriptOptimizer().optimize(parse(FOLDED_APPENDS))
+        strings = [node.children[0] for node in tree.find_data("constant")
+                   if node.children[0].__class__ is ScrollString]
+        self.assertTrue(strings)
+        self.assertTrue(all(string.pieces is None for string in strings))
+
+    def test_shared_trees_are_read_safely_by_many_threads(self):
+        for engine_name in ENGINES:
+            with self.subTest(engine=engine_name):
+                engine = ScrollScriptEngine(engine_name, optimize=True)
+                outputs = []
+
+                def read():
+                    for _ in range(5):
+                        outputs.append(engine.run_source(FOLDED_APPENDS).output)
+
+                threads = [threading.Thread(target=read) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertEqual(outputs, ["1400"] * 40)
+
+
+class RunTest(unittest.TestCase):
+    def test_run_source(self):
+        for engine_name in ENGINES:
+            with self.subTest(engine=engine_name):
+                result = ScrollScriptEngine(engine_name).run_source("rune total = 6 * 7; reveal total;")
+                self.assertTrue(result.ok)
+                self.assertIsNone(result.error)
+                self.assertEqual(result.output, "42")
+                self.assertEqual(result.runes, {"total": ScrollInt(42)})
+                self.assertGreaterEqual(result.total_time, result.run_time)
+
+    def test_runes_are_written_before_the_scroll_starts(self):
+        for engine_name in ENGINES:
+            with self.subTest(engine=engine_name):
+                result = ScrollScriptEngine(engine_name).run_source(
+                    'reveal $"{name} is {age + 1}";', runes={"name": "Merlin", "age": ScrollInt(999)})
+                self.assertEqual(result.output, "Merlin is 1000")
+                self.assertEqual(result.runes["name"], ScrollString("Merlin"))
+
+    def test_input_is_what_listen_reads(self):
+        for engine_name in ENGINES:
+            with self.subTest(engine=engine_name):
+                result = ScrollScriptEngine(engine_name).run_source(
+                    'rune first = listen "ignored"; rune second = listen; reveal $"{second} {first}";',
+                    input="one\ntwo\n")
+                self.assertEqual(result.output, "two one")
+
+    def test_running_out_of_input_is_an_error(self):
+        result = ScrollScriptEngine().run_source("rune word = listen;")
+        self.assertIsInstance(result.error, SilenceError)
+        self.assertFalse(result.ok)
+
+    def test_run_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            program_path = os.path.join(directory, "greeting.ssc")
+            with open(program_path, "w", encoding="utf-8") as file:
+                file.write('rune reply = listen; reveal $"{greeting}, {reply}!";')
+            for engine_name in ENGINES:
+                with self.subTest(engine=engine_name):
+                    result = ScrollScriptEngine(engine_name).run_file(
+                        program_path, input="Morgana", runes={"greeting": "Hail"})
+                    self.assertEqual(result.output, "Hail, Morgana!")
+                    self.assertEqual(result.runes["reply"], ScrollString("Morgana"))
+
+    def test_missing_file_is_an_error(self):
+        result = ScrollScriptEngine().run_file(os.path.join(ROOT, "no such scroll.ssc"))
+        self.assertIsInstance(result.error, FileNotFoundError)
+        self.assertEqual(result.output, "")
+
+    def test_failing_scroll_keeps_what_it_revealed(self):
+        result = ScrollScriptEngine().run_source('rune before = 1; reveal "so far"; reveal 1 / 0;')
+        self.assertIsInstance(result.error, ZeroDivisionError)
+        self.assertEqual(result.output, "so far")
+        self.assertEqual(result.runes, {"before": ScrollInt(1)})
+
+    def test_unparsable_scroll_is_an_error(self):
+        result = ScrollScriptEngine().run_source("reveal (;")
+        self.assertIsNotNone(result.error)
+        self.assertEqual(result.run_time, 0.0)
+
+    def test_unknown_engine_is_refused(self):
+        with self.assertRaises(ValueError):
+            ScrollScriptEngine("quantum")
+
+
+class PoolTest(unittest.TestCase):
+    def test_nothing_carries_over_between_scrolls(self):
+        for engine_name in ENGINES:
+            with self.subTest(engine=engine_name):
+                engine = ScrollScriptEngine(engine_name, pool_size=1)
+                first = engine.run_source(
+                    'rune secret = 7; incantation hidden { proclaim 1; } reveal secret;',
+                    input="unread\n", runes={"given": 1})
+                self.assertEqual(first.output, "7")
+                interpreter = engine.idle[0]
+
+                second = engine.run_source('reveal "next";')
+                self.assertIs(engine.idle[0], interpreter)
+                self.assertEqual(second.output, "next")
+                self.assertEqual(second.runes, {})
+
+                # The runes, incantations and input of the first scroll are all gone.
+                for program, error in (("reveal secret;", RuneNotWrittenError),
+                                       ("reveal given;", RuneNotWrittenError),
+                                       ("cast hidden ~::~;", UnknownSpellError),
+                                       ("rune line = listen;", SilenceError)):
+                    self.assertIsInstance(engine.run_source(program).error, error, program)
+
+                # A rune may be declared again by the next scroll.
+                self.assertTrue(engine.run_source("rune secret = 8; reveal secret;").ok)
+
+    def test_pool_keeps_at_most_pool_size_interpreters(self):
+        engine = ScrollScriptEngine(pool_size=2)
+        interpreters = [engine.acquire() for _ in range(3)]
+        for interpreter in interpreters:
+            engine.release(interpreter)
+        self.assertEqual(len(engine.idle), 2)
+
+    def test_source_trees_are_remembered(self):
+        engine = ScrollScriptEngine(tree_cache_size=1)
+        tree = engine.parse_source("reveal 1;")
+        self.assertIs(engine.parse_source("reveal 1;"), tree)
+        engine.parse_source("reveal 2;")
+        self.assertIsNot(engine.parse_source("reveal 1;"), tree)
+        self.assertEqual(len(engine.trees), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
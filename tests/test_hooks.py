@@ -0,0 +1,139 @@
+import unittest
+from hooks import EVENTS, INSTRUMENTED, find_statements
+from interpreter import ScrollScriptInterpreter
+from profiler import first_line
+from scrollscript import ENGINES
+from sinks import MemorySink
+from tests.support import parse
+
+DOUBLES = """incantation double ~n {
+    proclaim n * 2;
+}
+rune total = 0;
+cycle (i 1 -> 2) {
+    total += cast double ~:i:~;
+}
+reveal total;
+"""
+
+SQUARES = """incantation sq ~n {
+    proclaim n * n;
+}
+cycle (i 1 -> 5) {
+    reveal cast sq ~:3:~;
+}
+"""
+
+FAILING_CAST = """incantation broken ~n {
+    proclaim n / 0;
+}
+rune result = cast broken ~:1:~;
+"""
+
+
+class HookTest(unittest.TestCase):
+    def setUp(self):
+        self.interpreter = ScrollScriptInterpreter(0, sink=MemorySink())
+        self.events = []
+
+    def record(self):
+        """Registers a hook for every event, each recording what it was given."""
+        events = self.events
+        hooks = {
+            "before_instruction": lambda node: events.append(("before", first_line(node))),
+            "after_instruction": lambda node: events.append(("after", first_line(node))),
+            "incantation_enter": lambda name, args: events.append(("enter", name, [arg.value for arg in args])),
+            "incantation_exit": lambda name, value: events.append(
+                ("exit", name, None if value is None else value.value)),
+            "rune_assignment": lambda name, value: events.append(("rune", name, value.value)),
+            "loop_iteration": lambda node: events.append(("turn", first_line(node))),
+        }
+        for event, hook in hooks.items():
+            self.interpreter.add_hook(event, hook)
+        return hooks
+
+    def test_events_fire_in_order(self):
+        self.record()
+        self.interpreter.start(parse(DOUBLES))
+        self.assertEqual(self.interpreter.sink.getvalue(), "6")
+        self.assertEqual(self.events, [
+            ("before", 4), ("rune", "total", 0), ("after", 4),
+            ("before", 5),
+            ("turn", 5),
+            ("before", 6), ("enter", "double", [1]), ("before", 2), ("after", 2), ("exit", "double", 2),
+            ("rune", "total", 2), ("after", 6),
+            ("turn", 5),
+            ("before", 6), ("enter", "double", [2]), ("before", 2), ("after", 2), ("exit", "double", 4),
+            ("rune", "total", 6), ("after", 6),
+            ("after", 5),
+            ("before", 8), ("after", 8),
+        ])
+
+    def test_exit_fires_when_a_cast_fails(self):
+        self.record()
+        with self.assertRaises(ZeroDivisionError):
+            self.interpreter.start(parse(FAILING_CAST))
+        self.assertEqual(self.events, [
+            ("before", 4), ("enter", "broken", [1]), ("before", 2), ("exit", "broken", None),
+        ])
+
+    def test_casts_served_from_the_memo_cache_fire_enter_and_exit(self):
+        interpreter = ScrollScriptInterpreter(sink=MemorySink())
+        interpreter.add_hook("incantation_enter", lambda name, args: self.events.append(("enter", name)))
+        interpreter.add_hook("incantation_exit", lambda name, value: self.events.append(("exit", name, value.value)))
+        interpreter.add_hook("before_instruction", lambda node: self.events.append(("before", first_line(node))))
+        interpreter.start(parse(SQUARES))
+
+        self.assertEqual(interpreter.sink.getvalue(), "99999")
+        self.assertEqual((interpreter.memo.misses, interpreter.memo.hits), (1, 4))
+        casts = [event for event in self.events if event[0] != "before"]
+        self.assertEqual(casts, [("enter", "sq"), ("exit", "sq", 9)] * 5)
+        # Only the first cast runs the incantation's statement.
+        self.assertEqual(self.events.count(("before", 2)), 1)
+
+    def test_hooks_of_one_event_fire_in_the_order_they_were_added(self):
+        self.interpreter.add_hook("rune_assignment", lambda name, value: self.events.append(("first", name)))
+        self.interpreter.add_hook("rune_assignment", lambda name, value: self.events.append(("second", name)))
+        self.interpreter.start(parse("rune a = 1;"))
+        self.assertEqual(self.events, [("first", "a"), ("second", "a")])
+
+    def test_removing_the_last_hook_restores_the_plain_methods(self):
+        hooks = self.record()
+        self.assertTrue(all(name in vars(self.interpreter) for name in INSTRUMENTED))
+        for event, hook in hooks.items():
+            self.interpreter.remove_hook(event, hook)
+        self.assertFalse(any(name in vars(self.interpreter) for name in INSTRUMENTED))
+
+        self.interpreter.start(parse(DOUBLES))
+        self.assertEqual(self.events, [])
+        self.assertEqual(self.interpreter.sink.getvalue(), "6")
+
+    def test_unknown_event_is_refused(self):
+        with self.assertRaises(ValueError):
+            self.interpreter.add_hook("on_reveal", print)
+        with self.assertRaises(ValueError):
+            self.interpreter.remove_hook("on_reveal", print)
+
+    def test_only_the_tree_engine_fires_hooks(self):
+        for engine in ENGINES:
+            if engine == "tree":
+                continue
+            with self.subTest(engine=engine):
+                with self.assertRaises(ValueError):
+                    ENGINES[engine](sink=MemorySink()).add_hook("rune_assignment", print)
+
+    def test_every_event_is_recorded(self):
+        self.assertEqual(set(self.record()), set(EVENTS))
+
+
+class FindStatementsTest(unittest.TestCase):
+    def test_statements_of_the_scroll_and_its_blocks(self):
+        lines = [(statement.data, first_line(statement)) for statement in find_statements(parse(DOUBLES))]
+        self.assertEqual(sorted(lines, key=lambda item: item[1]), [
+            ("return_statement", 2), ("var_declaration", 4), ("for_range", 5),
+            ("compound_increment", 6), ("print_statement", 8),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
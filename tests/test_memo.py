@@ -0,0 +1,114 @@
+import unittest
+from memo import find_pure_incantations, IncantationCache
+from scrollscript import ENGINES
+from tests.support import parse, run
+
+FIB = """
+incantation fib ~n {
+    foretell (n <= 1) {
+        proclaim n;
+    }
+    proclaim cast fib ~:n - 1:~ + cast fib ~:n - 2:~;
+}
+reveal cast fib ~:20:~;
+"""
+
+REVEALING = """
+incantation shout ~n {
+    reveal $"{n}\\n";
+    proclaim n;
+}
+rune total = cast shout ~:1:~ + cast shout ~:1:~;
+"""
+
+WRITING = """
+rune total = 0;
+incantation add ~n {
+    total += n;
+    proclaim total;
+}
+cast add ~:5:~;
+rune last = cast add ~:5:~;
+"""
+
+READING = """
+rune scale = 2;
+incantation grow ~n {
+    proclaim n * scale;
+}
+rune first = cast grow ~:3:~;
+scale = 10;
+rune second = cast grow ~:3:~;
+"""
+
+CALLING_IMPURE = """
+incantation shout ~n {
+    reveal n;
+    proclaim n;
+}
+incantation twice ~n {
+    proclaim cast shout ~:n:~ * 2;
+}
+"""
+
+
+class FindPureIncantationsTest(unittest.TestCase):
+    def test_pure_incantation_is_found(self):
+        self.assertEqual(find_pure_incantations(parse(FIB)), {"fib": ()})
+
+    def test_revealing_incantation_is_impure(self):
+        self.assertEqual(find_pure_incantations(parse(REVEALING)), {})
+
+    def test_incantation_writing_an_outer_rune_is_impure(self):
+        self.assertEqual(find_pure_incantations(parse(WRITING)), {})
+
+    def test_incantation_reading_an_outer_rune_is_impure(self):
+        self.assertEqual(find_pure_incantations(parse(READING)), {})
+
+    def test_incantation_casting_an_impure_one_is_impure(self):
+        self.assertEqual(find_pure_incantations(parse(CALLING_IMPURE)), {})
+
+
+class MemoizedCastTest(unittest.TestCase):
+    def test_pure_casts_are_served_from_the_cache(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interpreter = run(FIB, engine)
+                self.assertEqual(interpreter.sink.getvalue(), "6765")
+                # Every fib(n) is computed once and then found again by its second caster.
+                self.assertEqual(interpreter.memo.misses, 21)
+                self.assertGreater(interpreter.memo.hits, 0)
+
+    def test_impure_casts_are_never_memoized(self):
+        for engine in ENGINES:
+            for program in (REVEALING, WRITING, READING):
+                with self.subTest(engine=engine, program=program):
+                    interpreter = run(program, engine)
+                    self.assertEqual(interpreter.memo.hits + interpreter.memo.misses, 0)
+                    self.assertEqual(len(interpreter.memo.results), 0)
+
+    def test_impure_casts_run_every_time(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(run(REVEALING, engine).sink.getvalue(), "1\n1\n")
+                self.assertEqual(run(WRITING, engine).variables["last"].value.value, 10)
+                self.assertEqual(run(READING, engine).variables["second"].value.value, 30)
+
+    def test_no_cache_when_memoization_is_off(self):
+        interpreter = run(FIB, memo_size=0)
+        self.assertIsNone(interpreter.memo)
+        self.assertEqual(interpreter.sink.getvalue(), "6765")
+
+
+class IncantationCacheTest(unittest.TestCase):
+    def test_least_recently_used_result_is_dropped(self):
+        cache = IncantationCache(size=2)
+        cache.store(("a",), 1)
+        cache.store(("b",), 2)
+        cache.lookup(("a",))
+        cache.store(("c",), 3)
+        self.assertEqual(list(cache.results), [("a",), ("c",)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import io
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from profiler import Profile, ProfilingInterpreter
+from sinks import MemorySink
+from tests.support import parse, run_cli
+
+FACTORIALS = """incantation fact ~n {
+    foretell (n <= 1) {
+        proclaim 1;
+    }
+    proclaim n * cast fact ~:n - 1:~;
+}
+rune total = 0;
+cycle (i 1 -> 3) {
+    total += cast fact ~:i:~;
+}
+reveal total;
+"""
+
+SQUARES = """incantation sq ~n {
+    proclaim n * n;
+}
+cycle (i 1 -> 5) {
+    reveal cast sq ~:3:~;
+}
+"""
+
+
+class ProfileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.program_path = os.path.join(self.directory.name, "factorials.ssc")
+        with open(self.program_path, "w", encoding="utf-8") as file:
+            file.write(FACTORIALS)
+
+        # Memoization is off, so every cast is made and counted.
+        self.profile = Profile(self.program_path)
+        self.interpreter = ProfilingInterpreter(self.profile, 0, sink=MemorySink())
+        self.interpreter.start(parse(FACTORIALS))
+
+    def stats(self, name):
+        """The primitive calls, calls, self time and inclusive time of the frame with a given name."""
+        for label, stats in zip(self.profile.labels, self.profile.stats):
+            if label[2] == name:
+                return stats
+        self.fail(f"No frame named {name!r}")
+
+    def test_scroll_still_runs(self):
+        self.assertEqual(self.interpreter.sink.getvalue(), "9")
+
+    def test_lines_are_counted(self):
+        self.assertEqual(self.stats("line 7: rune total = 0;")[:2], [1, 1])
+        self.assertEqual(self.stats("line 9: total += cast fact ~:i:~;")[:2], [3, 3])
+        self.assertEqual(self.stats("line 2: foretell (n <= 1) {")[:2], [6, 6])
+        # fact(3) proclaims on line 5 while fact(2) is still open below it.
+        self.assertEqual(self.stats("line 5: proclaim n * cast fact ~:n - 1:~;")[:2], [2, 3])
+
+    def test_recursive_casts_are_counted_once_inclusively(self):
+        primitive, calls, own, inclusive = self.stats("incantation fact")
+        self.assertEqual((primitive, calls), (3, 6))
+        self.assertLessEqual(own, inclusive)
+        self.assertEqual(self.profile.labels[self.profile.frames[(1, "incantation fact")]][1], 1)
+
+    def test_self_times_add_up_to_the_total(self):
+        total = sum(stats[2] for stats in self.profile.stats)
+        self.assertAlmostEqual(total, self.profile.total_time())
+
+    def test_report(self):
+        report = self.profile.report().splitlines()
+        self.assertTrue(report[0].startswith(f"Profile of {self.program_path}: "))
+        self.assertEqual(report[1].split(), ["calls", "self", "(s)", "incl", "(s)", "where"])
+        self.assertEqual(len(report), 2 + len(self.profile.labels))
+        self.assertTrue(any(line.endswith("  incantation fact") for line in report))
+        self.assertEqual(len(self.profile.report(limit=2).splitlines()), 4)
+
+    def test_write_pstats(self):
+        path = os.path.join(self.directory.name, "profile.pstats")
+        self.profile.write_pstats(path)
+        stats = pstats.Stats(path).stats
+
+        fact = (self.program_path, 1, "incantation fact")
+        primitive, calls, _, _, callers = stats[fact]
+        self.assertEqual((primitive, calls), (3, 6))
+        self.assertEqual(set(callers), {
+            (self.program_path, 9, "line 9: total += cast fact ~:i:~;"),
+            (self.program_path, 5, "line 5: proclaim n * cast fact ~:n - 1:~;"),
+        })
+
+    def test_write_speedscope(self):
+        path = os.path.join(self.directory.name, "profile.speedscope.json")
+        self.profile.write_speedscope(path)
+        with open(path) as file:
+            document = json.load(file)
+
+        frames = document["shared"]["frames"]
+        self.assertEqual([frame["name"] for frame in frames], [label[2] for label in self.profile.labels])
+        profile = document["profiles"][0]
+        self.assertEqual(profile["type"], "sampled")
+        self.assertEqual(len(profile["samples"]), len(profile["weights"]))
+        self.assertAlmostEqual(sum(profile["weights"]), profile["endValue"])
+        self.assertTrue(all(0 <= index < len(frames) for sample in profile["samples"] for index in sample))
+        fact = self.profile.frames[(1, "incantation fact")]
+        self.assertIn([self.profile.frames[(8, "line 8: cycle (i 1 -> 3) {")],
+                       self.profile.frames[(9, "line 9: total += cast fact ~:i:~;")], fact],
+                      [sample[:3] for sample in profile["samples"]])
+
+
+class MemoizedProfileTest(unittest.TestCase):
+    def test_casts_served_from_the_memo_cache_are_counted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            program_path = os.path.join(directory, "squares.ssc")
+            with open(program_path, "w", encoding="utf-8") as file:
+                file.write(SQUARES)
+            profile = Profile(program_path)
+            interpreter = ProfilingInterpreter(profile, sink=MemorySink())
+            interpreter.start(parse(SQUARES))
+
+        self.assertEqual(interpreter.sink.getvalue(), "99999")
+        self.assertEqual(interpreter.memo.hits, 4)
+        sq = profile.stats[profile.frames[(1, "incantation sq")]]
+        self.assertEqual(sq[:2], [5, 5])
+        # Only the first cast runs the incantation's statement.
+        self.assertEqual(profile.stats[profile.frames[(2, "line 2: proclaim n * n;")]][:2], [1, 1])
+
+
+class CommandLineTest(unittest.TestCase):
+    def test_profile_is_reported_and_written(self):
+        with tempfile.TemporaryDirectory() as directory:
+            program_path = os.path.join(directory, "factorials.ssc")
+            with open(program_path, "w", encoding="utf-8") as file:
+                file.write(FACTORIALS)
+            pstats_path = os.path.join(directory, "profile.pstats")
+            speedscope_path = os.path.join(directory, "profile.json")
+
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                stdout = run_cli(program_path, "--no-cache", "--memo-size", "0",
+                                 "--profile-pstats", pstats_path, "--profile-speedscope", speedscope_path)
+
+            self.assertEqual(stdout.getvalue(), "9")
+            self.assertIn(f"Profile of {program_path}", stderr.getvalue())
+            self.assertIn((program_path, 1, "incantation fact"), pstats.Stats(pstats_path).stats)
+            with open(speedscope_path) as file:
+                self.assertEqual(json.load(file)["name"], "factorials.ssc")
+
+    def test_profile_needs_the_tree_engine(self):
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            run_cli("Example Scripts/grimoire.ssc", "--profile", "--engine", "vm")
+
+
+if __name__ == "__main__":
+    unittest.main()
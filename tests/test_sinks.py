@@ -0,0 +1,144 @@
+import os
+import tempfile
+import unittest
+from scrollscript import ENGINES
+from sinks import OutputSink, FileSink, MemorySink
+from tests.support import parse, run_cli, RecordingStream
+
+REVEALS = 'reveal "a"; reveal "b\\n"; reveal "c"; reveal "d\\n";'
+
+FAILING = 'reveal "before the failure\\n"; reveal 1 / 0;'
+
+LISTENING = 'reveal "name? "; rune name = listen; reveal $"hello {name}\\n";'
+
+
+class OutputSinkTest(unittest.TestCase):
+    def reveal_all(self, sink, texts):
+        for text in texts:
+            sink.write(text)
+
+    def test_size_policy_writes_once_the_buffer_is_full(self):
+        stream = RecordingStream()
+        sink = OutputSink(stream, buffer_size=4)
+        self.reveal_all(sink, ["ab", "c", "de", "f"])
+        self.assertEqual(stream.writes, ["abcde"])
+        sink.close()
+        self.assertEqual(stream.writes, ["abcde", "f"])
+
+    def test_line_policy_writes_after_every_newline(self):
+        stream = RecordingStream()
+        sink = OutputSink(stream, flush_policy="line")
+        self.reveal_all(sink, ["a", "b\n", "c", "d\n", "e"])
+        self.assertEqual(stream.writes, ["ab\n", "cd\n"])
+
+    def test_line_policy_writes_a_long_line_once_the_buffer_is_full(self):
+        stream = RecordingStream()
+        sink = OutputSink(stream, buffer_size=4, flush_policy="line")
+        self.reveal_all(sink, ["ab", "cd", "e", "f\n", "g"])
+        self.assertEqual(stream.writes, ["abcd", "ef\n"])
+
+    def test_always_policy_writes_every_reveal(self):
+        stream = RecordingStream()
+        sink = OutputSink(stream, flush_policy="always")
+        self.reveal_all(sink, ["a", "b\n", "c"])
+        self.assertEqual(stream.writes, ["a", "b\n", "c"])
+
+    def test_unknown_policy_is_refused(self):
+        with self.assertRaises(ValueError):
+            OutputSink(flush_policy="never")
+
+    def test_file_sink_writes_its_file_when_closed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "out.txt")
+            sink = FileSink(path)
+            sink.write("written\n")
+            sink.close()
+            with open(path, encoding="utf-8") as file:
+                self.assertEqual(file.read(), "written\n")
+
+    def test_memory_sink_keeps_everything(self):
+        sink = MemorySink()
+        self.reveal_all(sink, ["a", "b"])
+        sink.flush()
+        self.assertEqual(sink.getvalue(), "ab")
+        sink.clear()
+        self.assertEqual(sink.getvalue(), "")
+
+
+class InterpreterFlushTest(unittest.TestCase):
+    def test_output_is_flushed_when_a_scroll_fails(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                stream = RecordingStream()
+                interpreter = ENGINES[engine](sink=OutputSink(stream))
+                with self.assertRaises(ZeroDivisionError):
+                    interpreter.start(parse(FAILING))
+                self.assertEqual(stream.getvalue(), "before the failure\n")
+
+    def test_output_is_flushed_before_listening(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                stream = RecordingStream()
+                shown = []
+
+                class Source:
+                    def read_line(self, prompt=None):
+                        shown.append(stream.getvalue())
+                        return "Merlin"
+
+                interpreter = ENGINES[engine](sink=OutputSink(stream), source=Source())
+                interpreter.start(parse(LISTENING))
+                self.assertEqual(shown, ["name? "])
+                self.assertEqual(stream.getvalue(), "name? hello Merlin\n")
+
+
+class CommandLineTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def scroll(self, program):
+        path = os.path.join(self.directory.name, "scroll.ssc")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(program)
+        return path
+
+    def test_output_writes_to_a_file_instead_of_stdout(self):
+        path = os.path.join(self.directory.name, "revealed.txt")
+        stdout = run_cli(self.scroll(REVEALS), "--no-cache", "--output", path)
+        self.assertEqual(stdout.getvalue(), "")
+        with open(path, encoding="utf-8") as file:
+            self.assertEqual(file.read(), "ab\ncd\n")
+
+    def test_output_file_is_written_when_the_scroll_fails(self):
+        path = os.path.join(self.directory.name, "revealed.txt")
+        with self.assertRaises(ZeroDivisionError):
+            run_cli(self.scroll(FAILING), "--no-cache", "--output", path)
+        with open(path, encoding="utf-8") as file:
+            self.assertEqual(file.read(), "before the failure\n")
+
+    def test_output_is_written_in_one_piece_by_default(self):
+        stdout = run_cli(self.scroll(REVEALS), "--no-cache")
+        self.assertEqual(stdout.writes, ["ab\ncd\n"])
+
+    def test_flush_line(self):
+        stdout = run_cli(self.scroll(REVEALS), "--no-cache", "--flush", "line")
+        self.assertEqual(stdout.writes, ["ab\n", "cd\n"])
+
+    def test_flush_always(self):
+        stdout = run_cli(self.scroll(REVEALS), "--no-cache", "--flush", "always")
+        self.assertEqual(stdout.writes, ["a", "b\n", "c", "d\n"])
+
+    def test_stdout_is_flushed_when_the_scroll_fails(self):
+        stdout = RecordingStream()
+        with self.assertRaises(ZeroDivisionError):
+            run_cli(self.scroll(FAILING), "--no-cache", stdout=stdout)
+        self.assertEqual(stdout.getvalue(), "before the failure\n")
+
+    def test_prompt_is_flushed_before_listening(self):
+        stdout = run_cli(self.scroll(LISTENING), "--no-cache", "--batch", stdin="Merlin\n")
+        self.assertEqual(stdout.writes, ["name? ", "hello Merlin\n"])
+
+
+if __name__ == "__main__":
+    unittest.main()
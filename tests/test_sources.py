@@ -0,0 +1,87 @@
+import io
+import os
+import tempfile
+import unittest
+from exceptions import SilenceError
+from scrollscript import ENGINES
+from sources import BatchSource
+from tests.support import run, run_cli
+
+ECHO = 'cycle (line betwixt listen ad infinitum) { reveal $"[{line}]"; }'
+
+TWO_LINES = 'rune first = listen "first? "; rune second = listen "second? "; reveal $"{first} {second}\\n";'
+
+
+class BatchSourceTest(unittest.TestCase):
+    def test_lines_are_served_in_order(self):
+        source = BatchSource(io.StringIO("one\ntwo\nthree\n"))
+        self.assertEqual([source.read_line() for _ in range(3)], ["one", "two", "three"])
+
+    def test_lines_split_across_blocks_are_joined(self):
+        source = BatchSource(io.StringIO("alpha\nbeta\ngamma"), block_size=3)
+        self.assertEqual([source.read_line() for _ in range(3)], ["alpha", "beta", "gamma"])
+
+    def test_silence_once_input_runs_out(self):
+        source = BatchSource(io.StringIO("only\n"))
+        source.read_line()
+        with self.assertRaises(SilenceError):
+            source.read_line()
+        with self.assertRaises(SilenceError):
+            source.read_line()
+
+    def test_prompts_are_not_shown(self):
+        source = BatchSource(io.StringIO("answer\n"))
+        self.assertEqual(source.read_line("question? "), "answer")
+
+
+class ListeningTest(unittest.TestCase):
+    def test_listen_reads_from_the_source(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                interpreter = run(TWO_LINES, engine, input="Morgana\nMerlin\n")
+                self.assertEqual(interpreter.sink.getvalue(), "Morgana Merlin\n")
+
+    def test_listen_raises_silence_once_input_runs_out(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                with self.assertRaises(SilenceError):
+                    run(TWO_LINES, engine, input="Morgana\n")
+
+    def test_listening_ad_infinitum_ends_with_the_input(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(run(ECHO, engine, input="a\nb\nc").sink.getvalue(), "[a][b][c]")
+
+
+class CommandLineTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+        return path
+
+    def test_batch_reads_stdin_without_prompts(self):
+        stdout = run_cli(self.write("scroll.ssc", TWO_LINES), "--no-cache", "--batch", stdin="Morgana\nMerlin\n")
+        self.assertEqual(stdout.getvalue(), "Morgana Merlin\n")
+
+    def test_prompts_are_shown_without_batch(self):
+        stdout = run_cli(self.write("scroll.ssc", TWO_LINES), "--no-cache", stdin="Morgana\nMerlin\n")
+        self.assertEqual(stdout.getvalue(), "first? second? Morgana Merlin\n")
+
+    def test_input_reads_a_file_instead_of_stdin(self):
+        input_path = self.write("input.txt", "a\nb\n")
+        stdout = run_cli(self.write("scroll.ssc", ECHO), "--no-cache", "--input", input_path, stdin="ignored\n")
+        self.assertEqual(stdout.getvalue(), "[a][b]")
+
+    def test_silence_once_the_input_file_runs_out(self):
+        input_path = self.write("input.txt", "Morgana\n")
+        with self.assertRaises(SilenceError):
+            run_cli(self.write("scroll.ssc", TWO_LINES), "--no-cache", "--input", input_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -44,3 +44,15 @@ def load_file(file_path):
     except Exception as e:
         print(f"An error occurred: {e}")
         return None
+
+def unescape(raw):
+    """
+    Decodes the escape sequences written in a string literal.
+
+    Args:
+        raw (str): The literal text, without its surrounding quotes.
+
+    Returns:
+        str: The text with escape sequences such as '\\n' resolved.
+    """
+    return bytes(raw, "utf-8").decode("unicode_escape")
@@ -0,0 +1,263 @@
+"""
+Whole-tome arithmetic and reductions.
+
+When either operand of an arithmetic or comparison operator is a tome, the
+operator is applied to every page in a single pass, and a lone value is
+used against every page. A tome holding only ints or only floats is worked
+on unboxed, in NumPy when it is installed and in a plain Python loop
+otherwise. Each page comes out exactly as the operator would give it on
+its own: an int page stays an int, and dividing by zero still fails.
+"""
+import math
+import operator
+from array import array
+from itertools import repeat
+import keywords
+from datatypes import wrap_primitive, ScrollTome, ScrollInt, ScrollFloat, TRUTHSUNG, FALSEHOOD
+from exceptions import CarelessSpellError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# ----- Kernels ------
+
+BASE_OPERATIONS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "//": operator.floordiv,
+    "%": operator.mod,
+    "^": operator.pow,
+    "<": operator.lt,
+    ">": operator.gt,
+    "<=": operator.le,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+COMPARISONS = {"<", ">", "<=", ">=", "==", "!="}
+
+# Any other operator is a rounding prefix, such as the "/" of "/+", followed by its base.
+ROUNDINGS = {
+    "/": math.floor,
+    "^": math.ceil,
+    "~": round,
+}
+
+# Powers are left out: NumPy's can differ from Python's in the last digit.
+NUMPY_OPERATIONS = {
+    "+": "add",
+    "-": "subtract",
+    "*": "multiply",
+    "/": "true_divide",
+    "//": "floor_divide",
+    "%": "mod",
+    "<": "less",
+    ">": "greater",
+    "<=": "less_equal",
+    ">=": "greater_equal",
+    "==": "equal",
+    "!=": "not_equal",
+}
+
+NUMPY_ROUNDINGS = {
+    "/": "floor",
+    "^": "ceil",
+    "~": "rint",
+}
+
+NUMPY_TYPES = {"q": "int64", "d": "float64"}
+
+# Below this many pages, handing a tome to NumPy costs more than it saves.
+NUMPY_MIN_PAGES = 32
+
+# Ints NumPy may work on without any result overflowing or losing precision as a float.
+NUMPY_INT_LIMIT = 2 ** 31
+
+# Results NumPy may turn into ints without leaving the range of its int64.
+NUMPY_RESULT_LIMIT = 2 ** 62
+
+ZERO_DIVISION = "The arcane winds forbid division by zero."
+
+
+def split(symbol):
+    """Splits an operator into its base and its rounding prefix, if it has one."""
+    if symbol in BASE_OPERATIONS:
+        return symbol, None
+    return symbol[1:], symbol[0]
+
+def base_typecode(base, left_typecode):
+    """The typecode of the pages an operator gives before any rounding, or None for bools."""
+    if base in COMPARISONS:
+        return None
+    if base == "/":
+        return "d"
+    if base == "//":
+        return "q"
+    # An int on the left keeps the result an int, as it does for lone values.
+    return left_typecode
+
+def unboxed_operand(value):
+    """The typecode and raw values of an operand that can be worked on unboxed, or None."""
+    if value.__class__ is ScrollTome:
+        items = value.value
+        return None if items.__class__ is list else (items.typecode, items)
+    if value.__class__ is ScrollInt:
+        return "q", value.value
+    if value.__class__ is ScrollFloat:
+        return "d", value.value
+    return None
+
+
+# ----- Elementwise Operations ------
+
+def elementwise(symbol, scalar, left, right):
+    """
+    Applies an operator to every page of one or two tomes.
+
+    Args:
+        symbol (str): The operator, as written.
+        scalar (callable): Applies the operator to two lone values.
+        left: The left operand. At least one operand is a tome.
+        right: The right operand.
+
+    Returns:
+        ScrollTome: A new tome holding the result for every page.
+    """
+    left_is_tome = left.__class__ is ScrollTome
+    right_is_tome = right.__class__ is ScrollTome
+    if not left_is_tome:
+        left = wrap_primitive(left)
+    if not right_is_tome:
+        right = wrap_primitive(right)
+
+    length = len(left) if left_is_tome else len(right)
+    if left_is_tome and right_is_tome and len(right) != length:
+        raise CarelessSpellError(
+            f"A tome of {length} pages {symbol} a tome of {len(right)} pages is an invalid incantation."
+        )
+
+    left_operand, right_operand = unboxed_operand(left), unboxed_operand(right)
+    if left_operand is not None and right_operand is not None:
+        return unboxed_pass(symbol, left_operand, right_operand, left_is_tome, right_is_tome, length)
+
+    lefts = left if left_is_tome else repeat(left, length)
+    rights = right if right_is_tome else repeat(right, length)
+    return ScrollTome([scalar(x, y) for x, y in zip(lefts, rights)])
+
+def unboxed_pass(symbol, left_operand, right_operand, left_is_tome, right_is_tome, length):
+    base, rounding = split(symbol)
+    typecode = base_typecode(base, left_operand[0])
+    lefts, rights = left_operand[1], right_operand[1]
+
+    if base in ("/", "//") and (0 in rights if right_is_tome else rights == 0):
+        raise ZeroDivisionError(ZERO_DIVISION)
+
+    if numpy is not None and length >= NUMPY_MIN_PAGES:
+        result = numpy_pass(base, rounding, typecode, left_operand, right_operand)
+        if result is not None:
+            return result
+
+    values = map(
+        BASE_OPERATIONS[base],
+        lefts if left_is_tome else repeat(lefts, length),
+        rights if right_is_tome else repeat(rights, length),
+    )
+    if typecode is None:
+        return ScrollTome([TRUTHSUNG if value else FALSEHOOD for value in values])
+    values = map(int if typecode == "q" else float, values)
+    if rounding is not None:
+        values = map(ROUNDINGS[rounding], values)
+        typecode = "q"
+    return ScrollTome.unboxed(typecode, list(values))
+
+def numpy_pass(base, rounding, typecode, left_operand, right_operand):
+    """
+    Works out an operator in NumPy.
+
+    Returns None whenever NumPy could give a different answer than Python
+    would, such as for ints large enough to overflow, divisors of zero or
+    results that do not come out finite, leaving the Python loop to decide.
+    """
+    if base not in NUMPY_OPERATIONS:
+        return None
+    left, right = as_numpy(left_operand), as_numpy(right_operand)
+    if left is None or right is None:
+        return None
+    if base in ("%", "//") and not numpy.all(right != 0):
+        return None
+
+    with numpy.errstate(all="ignore"):
+        result = getattr(numpy, NUMPY_OPERATIONS[base])(left, right)
+    if typecode is None:
+        return ScrollTome([TRUTHSUNG if value else FALSEHOOD for value in result.tolist()])
+
+    if result.dtype.kind == "f":
+        if not numpy.all(numpy.isfinite(result)):
+            return None
+        if typecode == "q":
+            result = numpy.trunc(result)
+        elif rounding is not None:
+            result = getattr(numpy, NUMPY_ROUNDINGS[rounding])(result)
+            typecode = "q"
+        if typecode == "q" and numpy.any(numpy.abs(result) > NUMPY_RESULT_LIMIT):
+            return None
+    elif rounding is not None:
+        typecode = "q"
+
+    tome = ScrollTome.unboxed(typecode, ())
+    tome.value.frombytes(result.astype(NUMPY_TYPES[typecode]).tobytes())
+    return tome
+
+def as_numpy(operand):
+    """An operand as a NumPy array or scalar, or None if its ints are too large to trust NumPy with."""
+    typecode, values = operand
+    if values.__class__ is array:
+        values = numpy.frombuffer(values, dtype=NUMPY_TYPES[typecode])
+        if typecode == "q" and len(values) and (values.min() < -NUMPY_INT_LIMIT or values.max() > NUMPY_INT_LIMIT):
+            return None
+    elif typecode == "q" and not -NUMPY_INT_LIMIT <= values <= NUMPY_INT_LIMIT:
+        return None
+    return values
+
+
+# ----- Reductions ------
+
+REDUCTIONS = {
+    keywords.SUM: sum,
+    keywords.MIN: min,
+    keywords.MAX: max,
+    keywords.MEAN: lambda numbers: sum(numbers) / len(numbers),
+}
+
+def reduce_tome(keyword, value):
+    """
+    Reduces a tome of numbers to a single value.
+
+    Args:
+        keyword (str): One of the reduction keywords.
+        value: The tome to reduce.
+
+    Returns:
+        ScrollValue: The sum, least, greatest or average page of the tome.
+    """
+    value = wrap_primitive(value)
+    if value.__class__ is not ScrollTome:
+        raise CarelessSpellError(f"'{keyword}' '{value.type_name}' is an invalid incantation.")
+
+    numbers = value.value
+    if numbers.__class__ is list:
+        for item in numbers:
+            if item.__class__ is not ScrollInt and item.__class__ is not ScrollFloat:
+                raise CarelessSpellError(f"'{keyword}' of a tome holding '{item.type_name}' is an invalid incantation.")
+        numbers = [item.value for item in numbers]
+
+    if not numbers:
+        if keyword == keywords.SUM:
+            return ScrollInt(0)
+        raise CarelessSpellError(f"'{keyword}' of an empty tome is an invalid incantation.")
+    return wrap_primitive(REDUCTIONS[keyword](numbers))
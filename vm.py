@@ -0,0 +1,326 @@
+"""
+A stack-based virtual machine for ScrollScript bytecode.
+
+The VM shares its runes, incantations and rune semantics with
+ScrollScriptInterpreter, but runs the flat bytecode from bytecode.py in a
+single loop. Casting an incantation pushes a frame onto the VM's own call
+stack instead of recursing in Python, and a proclaimed cast reuses the
+frame of the incantation proclaiming it, so tail recursion runs in
+constant space. The depth of the call stack is bounded only by a memory
+limit.
+"""
+import random
+from bytecode import *
+from datatypes import wrap_primitive, ScrollTome, ScrollGrimoire, ScrollRange, ScrollStream
+from interpreter import ScrollScriptInterpreter
+from memo import DEFAULT_MEMO_SIZE, MISSING
+from exceptions import ShatterError, PersistenceError, ReturnValue, RuneAlreadyWrittenError, ManaExhaustedError
+import operators
+import ranges
+from operators import (
+    ADD_OPERATORS, MUL_OPERATORS, COMP_OPERATORS, ROUND_OPERATORS,
+    INCR_OPERATORS, CMP_INCR_OPERATORS
+)
+
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+
+# Roughly what one nested cast costs: its frame, shadowed runes and parameters.
+FRAME_SIZE = 512
+
+
+class ScrollScriptVM(ScrollScriptInterpreter):
+    hookable = False
+
+    def __init__(self, memo_size=DEFAULT_MEMO_SIZE, memory_limit=DEFAULT_MEMORY_LIMIT, sink=None, source=None):
+        super().__init__(memo_size, sink, source)
+        self.decoded = {}
+        self.max_depth = max(memory_limit // FRAME_SIZE, 1)
+
+    def start(self, tree):
+        try:
+            self.learn_incantations(tree)
+            self.run(BytecodeCompiler().compile_program(tree))
+        finally:
+            self.sink.flush()
+
+    def reset(self):
+        super().reset()
+        self.decoded.clear()
+
+    def decode(self, code):
+        """Pairs every opcode with its resolved argument, once per CodeObject."""
+        if code not in self.decoded:
+            constants = code.constants
+            self.decoded[code] = [
+                (opcode, arg if opcode in JUMP_OPS or opcode in COUNT_OPS or opcode in NO_ARG_OPS else constants[arg])
+                for opcode, arg in code.instructions()
+            ]
+        return self.decoded[code]
+
+    def run(self, code):
+        stack = []
+        push, pop = stack.append, stack.pop
+        frames = []
+        blocks = []
+        max_depth = self.max_depth
+        instructions = self.decode(code)
+        pc = 0
+
+        try:
+            while True:
+                opcode, arg = instructions[pc]
+                pc += 1
+
+                # ----- Hot Path -----
+                # Opcodes are tested in the order of how often they run, so the
+                # loop, jump, cast and reveal opcodes are found in a few comparisons.
+                if opcode == LOAD_RUNE:
+                    push(self.read_rune(arg))
+                elif opcode == LOAD_CONST:
+                    push(arg)
+                elif opcode == POP_JUMP_IF_FALSE:
+                    if not pop():
+                        pc = arg
+                elif opcode == JUMP:
+                    pc = arg
+                elif opcode == SETUP_LOOP:
+                    blocks.append((arg, len(stack)))
+                elif opcode == POP_BLOCK:
+                    blocks.pop()
+                elif opcode == STEADY_RANGE_NEXT:
+                    state = stack[-1]
+                    value = state[2]
+                    if value is not None:
+                        rune = state[0]
+                        rune.previous = rune.value
+                        rune.value = value
+                    value = state[2] = next(state[1], None)
+                    push(value is not None)
+                elif opcode == CHECK_MUTABLE:
+                    self.check_mutable(arg)
+                elif opcode == COMPOUND:
+                    name, symbol = arg
+                    self.compound_rune(name, symbol, CMP_INCR_OPERATORS[symbol], pop())
+                elif opcode == COMPARE:
+                    right = pop()
+                    push(operators.compare_values(COMP_OPERATORS[arg], pop(), right))
+                elif opcode == BINARY_ADD:
+                    right = pop()
+                    push(operators.add_values(ADD_OPERATORS[arg], pop(), right))
+                elif opcode == BINARY_MUL:
+                    right = pop()
+                    push(operators.mul_values(MUL_OPERATORS[arg], pop(), right))
+                elif opcode == INTERPOLATE:
+                    parts = stack[len(stack) - arg.slots:]
+                    del stack[len(stack) - arg.slots:]
+                    push(arg.fill(parts))
+                elif opcode == REVEAL:
+                    self.reveal(pop())
+                elif opcode == FIND_FUNCTION:
+                    push(self.find_function(arg))
+                elif opcode == CALL:
+                    name, argc = arg
+                    args = stack[len(stack) - argc:]
+                    del stack[len(stack) - argc:]
+                    func_info = pop()
+                    key = None
+                    if name in self.pure:
+                        key = self.memo.key(name, args, self.variables)
+                        if key is not None:
+                            value = self.memo.lookup(key)
+                            if value is not MISSING:
+                                push(value)
+                                continue
+                    if len(frames) >= max_depth:
+                        raise ManaExhaustedError(len(frames))
+                    self.enter_incantation(name, func_info, args)
+                    frames.append((instructions, pc, blocks, len(stack), key))
+                    instructions, pc, blocks = self.decode(func_info["block"]), 0, []
+                elif opcode == RETURN:
+                    if not frames:
+                        raise ReturnValue(pop())
+                    value = pop()
+                    instructions, pc, blocks, height, key = frames.pop()
+                    self.leave_incantation()
+                    if key is not None:
+                        self.memo.store(key, value)
+                    del stack[height:]
+                    push(value)
+                elif opcode == TAIL_CALL:
+                    name, argc = arg
+                    args = stack[len(stack) - argc:]
+                    del stack[len(stack) - argc:]
+                    func_info = pop()
+                    if frames:
+                        # The RETURN after this cast would only hand its value
+                        # on, so the cast replaces the current frame.
+                        self.enter_incantation(name, func_info, args, tail=True)
+                        del stack[frames[-1][3]:]
+                    else:
+                        self.enter_incantation(name, func_info, args)
+                        frames.append((instructions, pc, blocks, len(stack), None))
+                    instructions, pc, blocks = self.decode(func_info["block"]), 0, []
+                elif opcode == POP_JUMP_IF_TRUE:
+                    if pop():
+                        pc = arg
+                elif opcode == INCREMENT:
+                    name, symbol = arg
+                    self.increment_rune(name, symbol, INCR_OPERATORS[symbol])
+                elif opcode == ASSIGN:
+                    self.assign_rune(arg, pop())
+                elif opcode == FOREACH_NEXT:
+                    state = stack[-1]
+                    item = None
+                    if state is not None:
+                        item = state[1]
+                        if item is not None:
+                            state[1] = None
+                        else:
+                            item = next(state[0], None)
+                    if item is None:
+                        push(False)
+                    else:
+                        rune = self.variables[arg]
+                        rune.previous = rune.value
+                        rune.value = item
+                        push(True)
+                elif opcode == RANGE_CHECK:
+                    push(self.variables[arg].value <= stack[-1][0])
+                elif opcode == RANGE_STEP:
+                    rune = self.variables[arg]
+                    rune.previous = rune.value
+                    rune.value += stack[-1][1]
+
+                # ----- Runes -----
+                elif opcode == LOAD_PREVIOUS:
+                    push(self.read_previous(arg))
+                elif opcode == CHECK_UNWRITTEN:
+                    self.check_unwritten(arg)
+                elif opcode == DECLARE_RUNE:
+                    self.write_rune(arg, pop(), False)
+                elif opcode == DECLARE_SEALED:
+                    self.write_rune(arg, pop(), True)
+                elif opcode == DISPEL:
+                    self.dispel_rune(arg)
+                elif opcode == SEAL:
+                    self.seal_rune(arg)
+
+                # ----- Expressions -----
+                elif opcode == BINARY_POW:
+                    right = pop()
+                    push(operators.pow_values(pop(), right))
+                elif opcode == BINARY_OR:
+                    right = pop()
+                    push(operators.or_values(pop(), right))
+                elif opcode == BINARY_AND:
+                    right = pop()
+                    push(operators.and_values(pop(), right))
+                elif opcode == NEGATE:
+                    push(operators.negate_value(pop()))
+                elif opcode == ROUND:
+                    push(operators.round_value(ROUND_OPERATORS[arg], pop()))
+                elif opcode == NOT:
+                    push(operators.not_value(pop()))
+                elif opcode == WRAP:
+                    push(wrap_primitive(pop()))
+                elif opcode == LENGTH:
+                    push(operators.length_of(pop()))
+                elif opcode == REDUCE:
+                    push(operators.reduce_values(arg, pop()))
+                elif opcode == INDEX:
+                    push(self.index_rune(arg, pop()))
+                elif opcode == TRANSMUTE:
+                    push(self.cast_value(pop(), arg))
+
+                # ----- Collections -----
+                elif opcode == BUILD_TOME:
+                    items = stack[len(stack) - arg:]
+                    del stack[len(stack) - arg:]
+                    push(ScrollTome([wrap_primitive(item) for item in items]))
+                elif opcode == STORE_INDEX:
+                    value, index = pop(), pop()
+                    self.store_index(arg, index, value)
+                elif opcode == APPEND:
+                    self.append_rune(arg, pop())
+                elif opcode == BUILD_GRIMOIRE:
+                    items = stack[len(stack) - 2 * arg:]
+                    del stack[len(stack) - 2 * arg:]
+                    push(ScrollGrimoire([
+                        (wrap_primitive(items[i]), wrap_primitive(items[i + 1]))
+                        for i in range(0, len(items), 2)
+                    ]))
+                elif opcode == DISPEL_ENTRY:
+                    self.dispel_entry(arg, pop())
+
+                # ----- Input & Output -----
+                elif opcode == LISTEN:
+                    push(self.listen())
+                elif opcode == LISTEN_PROMPT:
+                    push(self.listen(pop()))
+                elif opcode == POP:
+                    pop()
+
+                # ----- Control Flow -----
+                elif opcode == CHANCE:
+                    push(random.uniform(0, 1) < arg)
+                elif opcode == FAIL:
+                    raise arg.with_traceback(None)
+                elif opcode == BREAK or opcode == CONTINUE:
+                    # A loop may be interrupted from inside an incantation cast
+                    # within it, so unwind call frames until a loop is found.
+                    while not blocks:
+                        if not frames:
+                            raise ShatterError() if opcode == BREAK else PersistenceError()
+                        instructions, pc, blocks, height, _ = frames.pop()
+                        self.leave_incantation()
+                    exit_pc, height = blocks.pop()
+                    del stack[height:]
+                    pc = exit_pc if opcode == BREAK else exit_pc - 1
+                elif opcode == RANGE_BEGIN:
+                    step, stop, start = pop(), pop(), pop()
+                    var_name, var_type, start, stop, step = self.range_bounds(arg, start, stop, step)
+                    self.bind_rune(var_name, start, var_type, False)
+                    push((stop, step))
+                elif opcode == RANGE_END:
+                    self.unbind_rune(arg)
+                elif opcode == STEADY_RANGE_BEGIN:
+                    step, stop, start = pop(), pop(), pop()
+                    var_name, var_type, start, stop, step = self.range_bounds(arg, start, stop, step)
+                    self.bind_rune(var_name, start, var_type, False)
+                    # The rune, the values it takes after each turn, and the
+                    # value drawn for the turn under way.
+                    push([self.variables[var_name], ranges.range_steps(start, stop, step), None])
+                elif opcode == FOREACH_BEGIN:
+                    expr = pop()
+                    if arg in self.variables:
+                        raise RuneAlreadyWrittenError(arg)
+                    # The loop keeps the iterator and the first item, which
+                    # was drawn early to learn the rune's type.
+                    items = iter(wrap_primitive(expr))
+                    item = next(items, None)
+                    if item is None:
+                        push(None)
+                    else:
+                        self.bind_rune(arg, None, item.type_name, False)
+                        push([items, item])
+                elif opcode == BUILD_RANGE:
+                    step, stop, start = pop(), pop(), pop()
+                    push(ScrollRange(*self.check_bounds(start, stop, step)))
+                elif opcode == INPUT_STREAM:
+                    push(ScrollStream(self.listen))
+
+                # ----- Incantations -----
+                elif opcode == DEFINE_FUNCTION:
+                    name, params, body = arg
+                    self.define_function(name, list(params), body)
+                elif opcode == HALT:
+                    return
+
+                else:
+                    raise RuntimeError(f"Unknown opcode {opcode}")
+        except BaseException:
+            # Incantations restore the runes they shadowed, even on failure.
+            while frames:
+                frames.pop()
+                self.leave_incantation()
+            raise